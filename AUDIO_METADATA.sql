@@ -0,0 +1,69 @@
+-- ===============================================
+-- HERHZZ 音频元数据
+-- 为 audio_access_control 增加文件大小、码率、采样参数和内容摘要，
+-- 由后端索引命令（backend/index_audio.py）批量填写
+-- ===============================================
+--
+-- 使用方法：
+-- 1. 复制整个文件内容到 Supabase SQL 编辑器
+-- 2. 点击 "Run" 执行
+-- 3. 在 backend 目录运行 python index_audio.py 填写元数据
+--
+-- 索引命令读取一遍音频文件（解析帧头，不解码），与表中已有的值比较后，
+-- 只把有变化的行通过 update_audio_metadata 一次提交；
+-- 函数内同样用 IS DISTINCT FROM 过滤，没有变化的行不会产生更新和 WAL
+--
+
+-- 1. 元数据字段（duration_seconds 已存在）
+ALTER TABLE public.audio_access_control
+    ADD COLUMN IF NOT EXISTS file_size_bytes BIGINT,
+    ADD COLUMN IF NOT EXISTS bitrate_kbps INTEGER,
+    ADD COLUMN IF NOT EXISTS sample_rate INTEGER,
+    ADD COLUMN IF NOT EXISTS channels SMALLINT,
+    ADD COLUMN IF NOT EXISTS codec VARCHAR(10),
+    ADD COLUMN IF NOT EXISTS content_sha256 CHAR(64),
+    ADD COLUMN IF NOT EXISTS metadata_indexed_at TIMESTAMP WITH TIME ZONE;
+
+-- 2. 批量更新函数，返回实际更新的行数（SETOF，PostgREST 响应为数组）
+--    p_rows 为 JSON 数组，每项包含 audio_name 和上面的元数据字段；目录中不存在的音频忽略
+CREATE OR REPLACE FUNCTION update_audio_metadata(p_rows JSONB)
+RETURNS SETOF INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    UPDATE public.audio_access_control a
+    SET duration_seconds = r.duration_seconds,
+        file_size_bytes = r.file_size_bytes,
+        bitrate_kbps = r.bitrate_kbps,
+        sample_rate = r.sample_rate,
+        channels = r.channels,
+        codec = r.codec,
+        content_sha256 = r.content_sha256,
+        metadata_indexed_at = NOW()
+    FROM jsonb_to_recordset(p_rows) AS r(
+        audio_name VARCHAR(100),
+        duration_seconds INTEGER,
+        file_size_bytes BIGINT,
+        bitrate_kbps INTEGER,
+        sample_rate INTEGER,
+        channels SMALLINT,
+        codec VARCHAR(10),
+        content_sha256 CHAR(64)
+    )
+    WHERE a.audio_name = r.audio_name
+      AND (a.duration_seconds, a.file_size_bytes, a.bitrate_kbps, a.sample_rate,
+           a.channels, a.codec, a.content_sha256)
+          IS DISTINCT FROM
+          (r.duration_seconds, r.file_size_bytes, r.bitrate_kbps, r.sample_rate,
+           r.channels, r.codec, r.content_sha256);
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN NEXT v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- 只允许服务端（service_role）调用
+REVOKE ALL ON FUNCTION update_audio_metadata(JSONB) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION update_audio_metadata(JSONB) TO service_role;
+
+SELECT '🎉 音频元数据字段和更新函数已创建' as status;
@@ -43,7 +43,7 @@ CREATE TABLE IF NOT EXISTS public.orders (
     
     -- 订单状态
     status VARCHAR(20) DEFAULT 'pending' NOT NULL 
-        CHECK (status IN ('pending', 'paid', 'failed', 'cancelled', 'refunded')),
+        CHECK (status IN ('pending', 'paid', 'failed', 'cancelled', 'refunded', 'expired')),
     
     -- 订单类型（支付 或 订阅）
     order_type VARCHAR(20) DEFAULT 'payment' 
@@ -71,6 +71,9 @@ CREATE TABLE IF NOT EXISTS public.orders (
     -- 支付完成时间
     paid_at TIMESTAMP WITH TIME ZONE,
     
+    -- 对账命令向 ZPay 确认过期订单未支付的时间（每个过期订单只回查一次）
+    reconciled_at TIMESTAMP WITH TIME ZONE,
+    
     -- 时间戳
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
@@ -79,9 +82,10 @@ CREATE TABLE IF NOT EXISTS public.orders (
 -- 创建订单表索引
 CREATE INDEX IF NOT EXISTS idx_orders_user_id ON public.orders(user_id);
 CREATE INDEX IF NOT EXISTS idx_orders_out_trade_no ON public.orders(out_trade_no);
-CREATE INDEX IF NOT EXISTS idx_orders_status ON public.orders(status);
 CREATE INDEX IF NOT EXISTS idx_orders_created_at ON public.orders(created_at DESC);
-CREATE INDEX IF NOT EXISTS idx_orders_user_status ON public.orders(user_id, status);
+CREATE INDEX IF NOT EXISTS idx_orders_user_created_id ON public.orders(user_id, created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_orders_pending_created ON public.orders(created_at, id) WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_orders_expired_unreconciled ON public.orders(created_at, id) WHERE status = 'expired' AND reconciled_at IS NULL;
 CREATE INDEX IF NOT EXISTS idx_orders_subscription_type ON public.orders(subscription_type);
 
 -- ===============================================
@@ -167,6 +171,15 @@ CREATE TABLE IF NOT EXISTS public.audio_access_control (
     -- 音频时长（秒）
     duration_seconds INTEGER,
     
+    -- 音频文件元数据（由 backend/index_audio.py 填写）
+    file_size_bytes BIGINT,
+    bitrate_kbps INTEGER,
+    sample_rate INTEGER,
+    channels SMALLINT,
+    codec VARCHAR(10),
+    content_sha256 CHAR(64),
+    metadata_indexed_at TIMESTAMP WITH TIME ZONE,
+    
     -- 创建时间
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
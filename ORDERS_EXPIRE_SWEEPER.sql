@@ -0,0 +1,67 @@
+-- ===============================================
+-- HERHZZ 过期待支付订单清理
+-- 把超时未支付的订单分批标记为 expired，待支付订单只保留最近一段时间
+-- ===============================================
+--
+-- 使用方法：
+-- 1. 先执行 ORDERS_RECONCILE.sql（expired 状态、待支付订单部分索引和 reconciled_at 列）
+-- 2. 复制整个文件内容到 Supabase SQL 编辑器
+-- 3. 点击 "Run" 执行
+--
+-- 后端 OrderSweeper（backend/order_sweeper.py）定时调用 expire_stale_orders，
+-- 每次最多更新 p_batch_size 行，直到没有可清理的订单：
+--   - 通过 idx_orders_pending_created 按创建时间读取最老的待支付订单
+--   - SKIP LOCKED：正在结算的订单行（settle_order 持有行锁）直接跳过，多实例同时清理互不阻塞
+--   - 每批单独提交，锁持有时间和 WAL 写入都是有界的
+-- 每次扫码都会创建一个待支付订单，被放弃的订单及时过期后，
+-- 待支付订单的部分索引只包含最近的订单，对账和清理扫描的都是这部分小集合
+-- 过期时不向 ZPay 核对：支付通知丢失的已支付订单由对账命令（reconcile_orders.py）
+-- 回查最近过期的订单补结算（settle_order 允许从 expired 结算）
+--
+
+-- 1. 分批过期函数，返回本批更新的行数（SETOF，PostgREST 响应为数组）
+CREATE OR REPLACE FUNCTION expire_stale_orders(p_older_than_seconds INTEGER, p_batch_size INTEGER)
+RETURNS SETOF INTEGER AS $$
+DECLARE
+    v_count INTEGER;
+BEGIN
+    WITH batch AS (
+        SELECT id FROM public.orders
+        WHERE status = 'pending'
+          AND created_at < NOW() - make_interval(secs => p_older_than_seconds)
+        ORDER BY created_at, id
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    )
+    UPDATE public.orders o
+    SET status = 'expired'
+    FROM batch
+    WHERE o.id = batch.id;
+
+    GET DIAGNOSTICS v_count = ROW_COUNT;
+    RETURN NEXT v_count;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- 只允许服务端（service_role）调用
+REVOKE ALL ON FUNCTION expire_stale_orders(INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION expire_stale_orders(INTEGER, INTEGER) TO service_role;
+
+-- 2. 待回查的过期订单部分索引
+--    对账命令回查最近过期、还没有确认未支付的订单：
+--      WHERE status = 'expired' AND reconciled_at IS NULL AND created_at > $1 AND created_at < $2
+--      ORDER BY created_at, id
+--    确认后写入 reconciled_at 并移出索引，索引只包含清理后还没回查过的少量订单，
+--    不需要按 created_at 扫描并过滤最近 24 小时的全部订单
+CREATE INDEX IF NOT EXISTS idx_orders_expired_unreconciled
+    ON public.orders(created_at, id)
+    WHERE status = 'expired' AND reconciled_at IS NULL;
+
+-- 3. 删除按状态的全表索引
+--    后端按 status 查询的只有对账和清理，都由上面的部分索引支持
+DROP INDEX IF EXISTS public.idx_orders_status;
+DROP INDEX IF EXISTS public.idx_orders_user_status;
+-- 早期版本创建过、没有查询使用的索引
+DROP INDEX IF EXISTS public.idx_orders_user_pending;
+
+SELECT '🎉 过期订单清理函数已创建' as status;
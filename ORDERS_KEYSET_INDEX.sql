@@ -0,0 +1,20 @@
+-- ===============================================
+-- HERHZZ 订单列表游标分页索引
+-- 支持 /api/orders 按 (created_at, id) 倒序的游标分页
+-- ===============================================
+--
+-- 使用方法：
+-- 1. 已执行过 COMPLETE_DATABASE_INIT.sql 的数据库执行本文件即可（新库的初始化脚本已包含该索引）
+-- 2. 复制整个文件内容到 Supabase SQL 编辑器
+-- 3. 点击 "Run" 执行
+--
+-- 查询形如：
+--   WHERE user_id = $1 AND (created_at < $2 OR (created_at = $2 AND id < $3))
+--   ORDER BY created_at DESC, id DESC LIMIT $4
+-- 每页都从索引上的游标位置开始读取，翻页深度不影响耗时
+--
+
+CREATE INDEX IF NOT EXISTS idx_orders_user_created_id
+    ON public.orders(user_id, created_at DESC, id DESC);
+
+SELECT '🎉 订单分页索引已创建' as status;
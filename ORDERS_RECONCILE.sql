@@ -0,0 +1,35 @@
+-- ===============================================
+-- HERHZZ 待支付订单对账
+-- 新增 expired 订单状态、待支付订单部分索引和过期订单回查标记
+-- ===============================================
+--
+-- 使用方法：
+-- 1. 已执行过 COMPLETE_DATABASE_INIT.sql 的数据库执行本文件即可（新库的初始化脚本已包含以下变更）
+-- 2. 复制整个文件内容到 Supabase SQL 编辑器
+-- 3. 点击 "Run" 执行
+-- 4. 重新执行 SETTLE_ORDER_FUNCTION.sql（过期订单收到迟到的支付通知时仍可结算）
+--
+-- 对账命令 backend/reconcile_orders.py 的查询形如：
+--   WHERE status = 'pending' AND created_at < $1
+--     AND (created_at > $2 OR (created_at = $2 AND id > $3))
+--   ORDER BY created_at, id LIMIT $4
+-- 部分索引只包含待支付订单，每页都从索引上的游标位置开始读取
+--
+-- 对账命令还会回查最近过期的订单（OrderSweeper 不向 ZPay 核对就标记过期）；
+-- 确认未支付后（包括对账命令自己标记过期的订单）写入 reconciled_at，之后的对账不再向 ZPay 查询同一个订单
+--
+
+-- 1. 订单状态增加 expired（超时未支付）
+ALTER TABLE public.orders DROP CONSTRAINT IF EXISTS orders_status_check;
+ALTER TABLE public.orders ADD CONSTRAINT orders_status_check
+    CHECK (status IN ('pending', 'paid', 'failed', 'cancelled', 'refunded', 'expired'));
+
+-- 2. 待支付订单部分索引
+CREATE INDEX IF NOT EXISTS idx_orders_pending_created
+    ON public.orders(created_at, id)
+    WHERE status = 'pending';
+
+-- 3. 过期订单回查标记
+ALTER TABLE public.orders ADD COLUMN IF NOT EXISTS reconciled_at TIMESTAMP WITH TIME ZONE;
+
+SELECT '🎉 订单对账索引已创建' as status;
@@ -0,0 +1,201 @@
+-- ===============================================
+-- HERHZZ 支付后续任务队列 (payment_outbox)
+-- 支付通知只记录订单 pending→paid，会员发放由后台 worker 异步完成
+-- ===============================================
+--
+-- 使用方法：
+-- 1. 先执行 COMPLETE_DATABASE_INIT.sql
+-- 2. 执行本文件，再执行 SETTLE_ORDER_FUNCTION.sql（settle_order 会写入本队列）
+-- 3. 复制文件内容到 Supabase SQL 编辑器，点击 "Run" 执行
+--
+-- 流程：
+--   settle_order 在同一事务内把订单改为 paid 并写入 grant_membership 任务，
+--   任务与支付状态一起提交，worker 崩溃也不会丢失。
+--   worker 通过 claim_payment_outbox 领取一批任务（SKIP LOCKED + 租约），
+--   逐个调用 grant_membership，成功的批量 complete，失败的按退避时间重试，
+--   超过最大次数标记为 dead 等待人工处理。租约过期的任务会被重新领取。
+--   grant_membership 以 orders.membership_granted_at 保证同一订单只发放一次。
+--
+
+-- 订单的会员发放时间（幂等标记）
+ALTER TABLE public.orders ADD COLUMN IF NOT EXISTS membership_granted_at TIMESTAMP WITH TIME ZONE;
+
+CREATE TABLE IF NOT EXISTS public.payment_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    
+    -- 关联订单
+    order_id UUID NOT NULL REFERENCES public.orders(id) ON DELETE CASCADE,
+    
+    -- 任务类型
+    kind VARCHAR(30) NOT NULL DEFAULT 'grant_membership'
+        CHECK (kind IN ('grant_membership')),
+    
+    -- 任务状态：pending（待处理）、done（完成）、dead（超过重试次数）
+    status VARCHAR(10) NOT NULL DEFAULT 'pending'
+        CHECK (status IN ('pending', 'done', 'dead')),
+    
+    -- 重试信息
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW(),
+    locked_until TIMESTAMP WITH TIME ZONE,
+    last_error TEXT,
+    
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    processed_at TIMESTAMP WITH TIME ZONE,
+    
+    -- 同一订单的同类任务只入队一次
+    UNIQUE (order_id, kind)
+);
+
+-- 只索引待处理任务，已完成的任务不影响领取速度
+CREATE INDEX IF NOT EXISTS idx_payment_outbox_pending
+    ON public.payment_outbox(next_attempt_at)
+    WHERE status = 'pending';
+
+-- 只允许服务端访问
+ALTER TABLE public.payment_outbox ENABLE ROW LEVEL SECURITY;
+
+-- 领取一批到期任务（并发 worker 互不重复）
+CREATE OR REPLACE FUNCTION claim_payment_outbox(p_limit INTEGER, p_lease_seconds INTEGER)
+RETURNS SETOF public.payment_outbox AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE public.payment_outbox o
+    SET locked_until = NOW() + make_interval(secs => p_lease_seconds),
+        attempts = o.attempts + 1
+    WHERE o.id IN (
+        SELECT id FROM public.payment_outbox
+        WHERE status = 'pending'
+          AND next_attempt_at <= NOW()
+          AND (locked_until IS NULL OR locked_until < NOW())
+        ORDER BY next_attempt_at
+        LIMIT p_limit
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING o.*;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- 批量标记任务完成
+CREATE OR REPLACE FUNCTION complete_payment_outbox(p_ids BIGINT[])
+RETURNS SETOF BIGINT AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE public.payment_outbox
+    SET status = 'done', processed_at = NOW(), locked_until = NULL, last_error = NULL
+    WHERE id = ANY(p_ids)
+    RETURNING id;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- 记录任务失败：到达最大次数标记为 dead，否则延后重试
+CREATE OR REPLACE FUNCTION fail_payment_outbox(
+    p_id BIGINT,
+    p_error TEXT,
+    p_retry_seconds INTEGER,
+    p_max_attempts INTEGER
+)
+RETURNS SETOF public.payment_outbox AS $$
+BEGIN
+    RETURN QUERY
+    UPDATE public.payment_outbox
+    SET status = CASE WHEN attempts >= p_max_attempts THEN 'dead' ELSE 'pending' END,
+        next_attempt_at = NOW() + make_interval(secs => p_retry_seconds),
+        locked_until = NULL,
+        last_error = LEFT(p_error, 1000)
+    WHERE id = p_id
+    RETURNING *;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- 为已支付的订阅订单发放或延长会员（幂等）
+CREATE OR REPLACE FUNCTION grant_membership(p_order_id UUID)
+RETURNS SETOF JSONB AS $$
+DECLARE
+    v_order public.orders%ROWTYPE;
+    v_membership public.user_memberships%ROWTYPE;
+    v_new_expires_at TIMESTAMP WITH TIME ZONE;
+BEGIN
+    SELECT * INTO v_order
+    FROM public.orders
+    WHERE id = p_order_id
+    FOR UPDATE;
+    
+    IF NOT FOUND OR v_order.status <> 'paid' OR v_order.order_type <> 'subscription' THEN
+        RETURN NEXT jsonb_build_object('outcome', 'skipped', 'order_id', p_order_id);
+        RETURN;
+    END IF;
+    
+    IF v_order.membership_granted_at IS NOT NULL THEN
+        RETURN NEXT jsonb_build_object(
+            'outcome', 'already_granted',
+            'order_id', v_order.id,
+            'user_id', v_order.user_id
+        );
+        RETURN;
+    END IF;
+    
+    SELECT * INTO v_membership
+    FROM public.user_memberships
+    WHERE user_id = v_order.user_id
+    FOR UPDATE;
+    
+    IF v_order.subscription_type = 'lifetime' OR COALESCE(v_membership.is_lifetime_member, FALSE) THEN
+        -- 永久会员（已是永久会员的用户不会被降级）
+        INSERT INTO public.user_memberships (
+            user_id, membership_type, membership_expires_at, is_lifetime_member,
+            membership_started_at, last_subscription_order_id
+        ) VALUES (
+            v_order.user_id, 'lifetime', NULL, TRUE,
+            NOW(), v_order.id
+        )
+        ON CONFLICT (user_id) DO UPDATE SET
+            membership_type = 'lifetime',
+            membership_expires_at = NULL,
+            is_lifetime_member = TRUE,
+            membership_started_at = COALESCE(public.user_memberships.membership_started_at, NOW()),
+            last_subscription_order_id = EXCLUDED.last_subscription_order_id;
+    ELSE
+        -- 未到期从当前到期时间延期，已到期或新会员从现在开始
+        v_new_expires_at := GREATEST(COALESCE(v_membership.membership_expires_at, NOW()), NOW())
+            + make_interval(days => v_order.subscription_duration_days);
+        
+        INSERT INTO public.user_memberships (
+            user_id, membership_type, membership_expires_at, is_lifetime_member,
+            membership_started_at, last_subscription_order_id
+        ) VALUES (
+            v_order.user_id, v_order.subscription_type, v_new_expires_at, FALSE,
+            NOW(), v_order.id
+        )
+        ON CONFLICT (user_id) DO UPDATE SET
+            membership_type = EXCLUDED.membership_type,
+            membership_expires_at = EXCLUDED.membership_expires_at,
+            is_lifetime_member = FALSE,
+            membership_started_at = COALESCE(public.user_memberships.membership_started_at, NOW()),
+            last_subscription_order_id = EXCLUDED.last_subscription_order_id;
+    END IF;
+    
+    UPDATE public.orders SET membership_granted_at = NOW() WHERE id = v_order.id;
+    
+    RETURN NEXT jsonb_build_object(
+        'outcome', 'granted',
+        'order_id', v_order.id,
+        'user_id', v_order.user_id,
+        'subscription_type', v_order.subscription_type,
+        'membership_expires_at', v_new_expires_at
+    );
+    RETURN;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- 队列函数只允许服务端（service_role）调用
+REVOKE ALL ON FUNCTION claim_payment_outbox(INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION complete_payment_outbox(BIGINT[]) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION fail_payment_outbox(BIGINT, TEXT, INTEGER, INTEGER) FROM PUBLIC, anon, authenticated;
+REVOKE ALL ON FUNCTION grant_membership(UUID) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION claim_payment_outbox(INTEGER, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION complete_payment_outbox(BIGINT[]) TO service_role;
+GRANT EXECUTE ON FUNCTION fail_payment_outbox(BIGINT, TEXT, INTEGER, INTEGER) TO service_role;
+GRANT EXECUTE ON FUNCTION grant_membership(UUID) TO service_role;
+
+SELECT '🎉 支付后续任务队列已创建' as status;
@@ -0,0 +1,68 @@
+-- ===============================================
+-- HERHZZ 共享令牌桶限流
+-- 多 worker / 多实例部署时，下单和支付通知接口的限流状态放在数据库中共享
+-- ===============================================
+--
+-- 使用方法：
+-- 1. 复制整个文件内容到 Supabase SQL 编辑器
+-- 2. 点击 "Run" 执行
+-- 3. 后端设置 RATE_LIMIT_BACKEND=supabase
+--
+-- 每个键（例如 order:user:<用户ID>、order:ip:<IP>）一行 (令牌数, 更新时间)，
+-- rate_limit_take 在一次调用中锁定该行、按经过的时间补充令牌并尝试扣减一个：
+--   - 主键查找，每次检查的开销与键的数量无关
+--   - UNLOGGED 表：每次请求都会写入，不产生 WAL；数据库崩溃后桶被清空，相当于全部回满，可以接受
+--   - 空闲超过补满时间的行与满桶等价，可以随时删除，例如定时执行：
+--     DELETE FROM public.rate_limit_buckets WHERE updated_at < NOW() - INTERVAL '1 day';
+--
+
+-- 1. 令牌桶表（只允许 service_role 访问）
+CREATE UNLOGGED TABLE IF NOT EXISTS public.rate_limit_buckets (
+    key TEXT PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT NOW()
+);
+
+ALTER TABLE public.rate_limit_buckets ENABLE ROW LEVEL SECURITY;
+
+-- 2. 取令牌函数，返回是否放行和需要等待的秒数
+CREATE OR REPLACE FUNCTION rate_limit_take(
+    p_key TEXT,
+    p_capacity DOUBLE PRECISION,
+    p_refill_per_second DOUBLE PRECISION
+)
+RETURNS TABLE(allowed BOOLEAN, retry_after DOUBLE PRECISION) AS $$
+DECLARE
+    v_now TIMESTAMP WITH TIME ZONE := clock_timestamp();
+    v_tokens DOUBLE PRECISION;
+    v_updated_at TIMESTAMP WITH TIME ZONE;
+BEGIN
+    INSERT INTO public.rate_limit_buckets (key, tokens, updated_at)
+    VALUES (p_key, p_capacity, v_now)
+    ON CONFLICT (key) DO NOTHING;
+
+    SELECT b.tokens, b.updated_at INTO v_tokens, v_updated_at
+    FROM public.rate_limit_buckets b
+    WHERE b.key = p_key
+    FOR UPDATE;
+
+    v_tokens := LEAST(
+        p_capacity,
+        v_tokens + GREATEST(EXTRACT(EPOCH FROM (v_now - v_updated_at)), 0) * p_refill_per_second
+    );
+
+    IF v_tokens >= 1 THEN
+        UPDATE public.rate_limit_buckets SET tokens = v_tokens - 1, updated_at = v_now WHERE key = p_key;
+        RETURN QUERY SELECT TRUE, 0::DOUBLE PRECISION;
+    ELSE
+        UPDATE public.rate_limit_buckets SET tokens = v_tokens, updated_at = v_now WHERE key = p_key;
+        RETURN QUERY SELECT FALSE, (1 - v_tokens) / p_refill_per_second;
+    END IF;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- 只允许服务端（service_role）调用
+REVOKE ALL ON FUNCTION rate_limit_take(TEXT, DOUBLE PRECISION, DOUBLE PRECISION) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION rate_limit_take(TEXT, DOUBLE PRECISION, DOUBLE PRECISION) TO service_role;
+
+SELECT '🎉 共享限流表和函数已创建' as status;
@@ -0,0 +1,118 @@
+-- ===============================================
+-- HERHZZ 订单结算函数 (settle_order)
+-- 在一个事务内完成支付通知的全部数据库操作
+-- ===============================================
+--
+-- 使用方法：
+-- 1. 先执行 COMPLETE_DATABASE_INIT.sql、PAYMENT_OUTBOX.sql 和 ORDERS_RECONCILE.sql
+-- 2. 复制整个文件内容到 Supabase SQL 编辑器
+-- 3. 点击 "Run" 执行
+--
+-- 后端通过 DatabaseService.settle_order 调用，一次 RPC 完成：
+--   校验金额 → 订单 pending→paid → 订阅订单写入会员发放任务 → 返回结算结果
+-- 会员发放任务与支付状态在同一事务提交，由后台 worker 调用 grant_membership 完成
+-- 订单行加行锁，重复通知并发到达时只有一个能完成结算
+-- ZPay 交易号唯一：同一笔交易的通知不可能结算到两个订单上
+-- （后端各 worker 的已结算缓存只是加速，幂等性由行锁和这两个唯一约束保证）
+--
+-- 返回单行 JSONB 集合（SETOF，PostgREST 响应为数组，supabase-py 才能正确解析）：
+--   outcome: paid | already_paid | not_found | amount_mismatch | invalid_status
+--   order_id, user_id, order_type, subscription_type, order_status, membership_pending
+--
+
+-- 同一个 ZPay 交易号只能对应一个订单（out_trade_no 已有唯一约束）
+CREATE UNIQUE INDEX IF NOT EXISTS idx_orders_zpay_trade_no_unique
+    ON public.orders(zpay_trade_no)
+    WHERE zpay_trade_no IS NOT NULL;
+
+-- 返回类型变更时 CREATE OR REPLACE 会失败，先删除旧函数
+DROP FUNCTION IF EXISTS settle_order(TEXT, NUMERIC, TEXT);
+
+CREATE OR REPLACE FUNCTION settle_order(
+    p_out_trade_no TEXT,
+    p_amount NUMERIC,
+    p_zpay_trade_no TEXT DEFAULT NULL
+)
+RETURNS SETOF JSONB AS $$
+DECLARE
+    v_order public.orders%ROWTYPE;
+BEGIN
+    -- 1. 锁定订单行
+    SELECT * INTO v_order
+    FROM public.orders
+    WHERE out_trade_no = p_out_trade_no
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RETURN NEXT jsonb_build_object('outcome', 'not_found');
+        RETURN;
+    END IF;
+
+    -- 2. 幂等：已支付订单直接返回
+    IF v_order.status = 'paid' THEN
+        RETURN NEXT jsonb_build_object(
+            'outcome', 'already_paid',
+            'order_id', v_order.id,
+            'user_id', v_order.user_id,
+            'order_type', v_order.order_type,
+            'subscription_type', v_order.subscription_type,
+            'order_status', v_order.status
+        );
+        RETURN;
+    END IF;
+
+    -- 3. 只允许从待支付/失败/已过期状态结算（已取消、已退款的订单不再变更）
+    --    过期订单的用户仍可能在过期后完成扫码支付，迟到的通知照常结算
+    IF v_order.status NOT IN ('pending', 'failed', 'expired') THEN
+        RETURN NEXT jsonb_build_object(
+            'outcome', 'invalid_status',
+            'order_id', v_order.id,
+            'user_id', v_order.user_id,
+            'order_status', v_order.status
+        );
+        RETURN;
+    END IF;
+
+    -- 4. 校验金额（防止金额篡改）
+    IF ABS(v_order.amount - p_amount) > 0.01 THEN
+        RETURN NEXT jsonb_build_object(
+            'outcome', 'amount_mismatch',
+            'order_id', v_order.id,
+            'user_id', v_order.user_id,
+            'order_status', v_order.status
+        );
+        RETURN;
+    END IF;
+
+    -- 5. 更新订单状态为已支付
+    UPDATE public.orders
+    SET status = 'paid',
+        paid_at = NOW(),
+        zpay_trade_no = COALESCE(p_zpay_trade_no, zpay_trade_no)
+    WHERE id = v_order.id;
+
+    -- 6. 订阅订单：写入会员发放任务（与支付状态一起提交）
+    IF v_order.order_type = 'subscription' THEN
+        INSERT INTO public.payment_outbox (order_id, kind)
+        VALUES (v_order.id, 'grant_membership')
+        ON CONFLICT (order_id, kind) DO NOTHING;
+    END IF;
+
+    RETURN NEXT jsonb_build_object(
+        'outcome', 'paid',
+        'order_id', v_order.id,
+        'user_id', v_order.user_id,
+        'order_type', v_order.order_type,
+        'subscription_type', v_order.subscription_type,
+        'order_status', 'paid',
+        'membership_pending', v_order.order_type = 'subscription'
+    );
+    RETURN;
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- 结算函数只允许服务端（service_role）调用
+REVOKE ALL ON FUNCTION settle_order(TEXT, NUMERIC, TEXT) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION settle_order(TEXT, NUMERIC, TEXT) TO service_role;
+
+SELECT '🎉 settle_order 结算函数已创建' as status;
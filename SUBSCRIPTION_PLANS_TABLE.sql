@@ -0,0 +1,74 @@
+-- ===============================================
+-- HERHZZ 订阅套餐表 (subscription_plans)
+-- 套餐名称、价格、时长和展示信息的唯一来源
+-- ===============================================
+--
+-- 使用方法：
+-- 1. 先执行 COMPLETE_DATABASE_INIT.sql
+-- 2. 复制整个文件内容到 Supabase SQL 编辑器
+-- 3. 点击 "Run" 执行
+--
+-- 后端启动时加载启用的套餐，之后每 PLAN_REGISTRY_TTL 秒重新读取；
+-- 修改价格后无需重启，内容变化时 /api/subscription/pricing 的 ETag 随之变化。
+-- plan_type 与 orders.subscription_type 的取值一致。
+--
+
+CREATE TABLE IF NOT EXISTS public.subscription_plans (
+    -- 订阅类型（monthly_3 / yearly / lifetime）
+    plan_type VARCHAR(20) PRIMARY KEY
+        CHECK (plan_type IN ('monthly_3', 'yearly', 'lifetime')),
+    
+    -- 套餐名称（同时作为订单名称）
+    name VARCHAR(100) NOT NULL,
+    
+    -- 价格（元）
+    price DECIMAL(10,2) NOT NULL CHECK (price > 0),
+    
+    -- 会员时长（天），永久会员为 NULL
+    duration_days INTEGER CHECK (duration_days IS NULL OR duration_days > 0),
+    
+    -- 展示信息
+    description TEXT,
+    features JSONB DEFAULT '[]'::jsonb NOT NULL,
+    savings VARCHAR(100),
+    display_order INTEGER DEFAULT 0 NOT NULL,
+    
+    -- 是否在售
+    is_active BOOLEAN DEFAULT TRUE NOT NULL,
+    
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+-- 更新时间触发器
+CREATE OR REPLACE FUNCTION update_subscription_plans_updated_at_column()
+RETURNS TRIGGER AS $$
+BEGIN
+    NEW.updated_at = NOW();
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS update_subscription_plans_updated_at ON public.subscription_plans;
+CREATE TRIGGER update_subscription_plans_updated_at 
+    BEFORE UPDATE ON public.subscription_plans 
+    FOR EACH ROW EXECUTE FUNCTION update_subscription_plans_updated_at_column();
+
+-- 初始套餐
+INSERT INTO public.subscription_plans (plan_type, name, price, duration_days, description, features, savings, display_order) VALUES
+('monthly_3', 'HERHZZZ 3个月会员', 29.99, 90, '3个月畅享全部高品质睡眠音频',
+ '["解锁全部周期音频", "高品质音频体验", "个性化推荐", "无广告畅听"]', NULL, 1),
+('yearly', 'HERHZZZ 1年会员', 99.99, 365, '1年畅享全部高品质睡眠音频，更超值',
+ '["解锁全部周期音频", "高品质音频体验", "个性化推荐", "无广告畅听", "优先客服支持", "新功能抢先体验"]', '相比3个月会员节省17%', 2),
+('lifetime', 'HERHZZZ 永久会员', 299.99, NULL, '一次购买，终身畅享所有功能',
+ '["永久解锁全部音频", "高品质音频体验", "个性化推荐", "无广告畅听", "优先客服支持", "新功能抢先体验", "终身免费更新", "专属会员标识"]', '相比年费会员节省75%', 3)
+ON CONFLICT (plan_type) DO NOTHING;
+
+-- 所有用户都可以查看套餐，修改只通过 SQL 编辑器或 service_role
+ALTER TABLE public.subscription_plans ENABLE ROW LEVEL SECURITY;
+
+DROP POLICY IF EXISTS "all_users_can_view_plans" ON public.subscription_plans;
+CREATE POLICY "all_users_can_view_plans" ON public.subscription_plans 
+    FOR SELECT USING (true);
+
+SELECT '🎉 订阅套餐表已创建' as status;
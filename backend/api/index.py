@@ -3,12 +3,17 @@ Vercel 部署入口文件
 
 这个文件是专门为 Vercel 部署创建的入口点
 它导入并暴露 FastAPI 应用实例供 Vercel 使用
+
+冷启动导入耗时见 bench_cold_start.py
 """
 
 import sys
 import os
+import time
 import importlib.util
 
+_import_started = time.perf_counter()
+
 # 添加当前目录到 Python 路径
 current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.dirname(current_dir)  # 获取父目录
@@ -24,7 +29,8 @@ try:
     main = importlib.util.module_from_spec(spec)
     spec.loader.exec_module(main)
     app = main.app
-    print("✅ 成功导入 FastAPI 应用实例")
+    # 冷启动时导入耗时（supabase、httpx 在第一次使用时才导入，不计入这里）
+    print(f"✅ 成功导入 FastAPI 应用实例（{(time.perf_counter() - _import_started) * 1000:.0f}ms）")
 except Exception as e:
     print(f"❌ 导入 FastAPI 应用实例失败: {str(e)}")
     raise 
\ No newline at end of file
@@ -0,0 +1,150 @@
+"""
+音频目录快照 - 预先分组排序的 audio_access_control 只读副本
+
+表中的 access_level（'free' / 'paid'）和 audio_title 在快照中转换为接口使用的
+is_free 和 audio_display_name。
+"""
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from snapshot_store import SnapshotStore
+
+# 周期阶段显示名称
+PHASE_DISPLAY_NAMES = {
+    "menstrual": "月经期",
+    "follicular": "卵泡期",
+    "ovulation": "排卵期",
+    "luteal": "黄体期"
+}
+
+
+def _is_free_row(row: Dict[str, Any]) -> bool:
+    """audio_access_control 行是否为免费音频"""
+    return row["access_level"] == "free"
+
+
+class AudioCatalogSnapshot:
+    """
+    音频目录快照
+
+    构建时完成分组、排序和计数。由于 is_accessible 只取决于「是否免费」和
+    「是否会员」，快照直接预先生成会员/非会员两份阶段列表，请求时只需按会员状态选取。
+    快照生成后不再修改，调用方也不应修改返回的列表。
+    """
+
+    __slots__ = (
+        "version", "digest", "loaded_at",
+        "total_audio_count", "free_audio_count",
+        "_member_phases", "_free_phases", "_is_free"
+    )
+
+    def __init__(self, rows: List[Dict[str, Any]], version: int, digest: str):
+        """
+        根据数据库行构建快照
+
+        Args:
+            rows: audio_access_control 表的行（已按 cycle_phase, display_order 排序）
+            version: 快照版本号
+            digest: 行内容摘要，用于判断目录是否变化
+        """
+        self.version = version
+        self.digest = digest
+        self.loaded_at = time.time()
+        self.total_audio_count = len(rows)
+        self.free_audio_count = sum(1 for row in rows if _is_free_row(row))
+        self._member_phases = self._build_phases(rows, is_member=True)
+        self._free_phases = self._build_phases(rows, is_member=False)
+        self._is_free: Dict[str, bool] = {row["audio_name"]: _is_free_row(row) for row in rows}
+
+    @staticmethod
+    def _build_phases(rows: List[Dict[str, Any]], is_member: bool) -> List[Dict[str, Any]]:
+        """
+        按周期阶段分组音频
+
+        Args:
+            rows: audio_access_control 表的行
+            is_member: 是否按会员身份计算 is_accessible
+
+        Returns:
+            List[Dict[str, Any]]: 阶段列表
+        """
+        phases_data: Dict[str, Dict[str, Any]] = {}
+
+        for audio in rows:
+            phase = audio["cycle_phase"]
+            if phase not in phases_data:
+                phases_data[phase] = {
+                    "cycle_phase": phase,
+                    "phase_display_name": PHASE_DISPLAY_NAMES.get(phase, phase),
+                    "audios": [],
+                    "free_audio_count": 0,
+                    "total_audio_count": 0
+                }
+
+            is_free = _is_free_row(audio)
+            if is_free:
+                phases_data[phase]["free_audio_count"] += 1
+
+            phases_data[phase]["audios"].append({
+                "audio_name": audio["audio_name"],
+                "audio_display_name": audio["audio_title"],
+                "cycle_phase": audio["cycle_phase"],
+                "is_free": is_free,
+                "is_accessible": is_free or is_member,
+                "display_order": audio["display_order"],
+                "description": audio.get("description"),
+                "duration_seconds": audio.get("duration_seconds")
+            })
+            phases_data[phase]["total_audio_count"] += 1
+
+        return list(phases_data.values())
+
+    def phases_for(self, is_member: bool) -> List[Dict[str, Any]]:
+        """
+        获取指定会员状态下的阶段列表
+
+        Args:
+            is_member: 用户是否为会员
+
+        Returns:
+            List[Dict[str, Any]]: 带 is_accessible 标记的阶段列表（共享对象，只读）
+        """
+        return self._member_phases if is_member else self._free_phases
+
+    def is_free(self, audio_name: str) -> Optional[bool]:
+        """
+        查询音频是否免费
+
+        Args:
+            audio_name: 音频文件名
+
+        Returns:
+            Optional[bool]: 是否免费，音频不在目录中时返回 None
+        """
+        return self._is_free.get(audio_name)
+
+    def accessible_count(self, is_member: bool) -> int:
+        """
+        获取指定会员状态下可访问的音频数量
+
+        Args:
+            is_member: 用户是否为会员
+
+        Returns:
+            int: 可访问音频数量
+        """
+        return self.total_audio_count if is_member else self.free_audio_count
+
+
+class AudioCatalog(SnapshotStore):
+    """audio_access_control 目录快照（AudioCatalogSnapshot）"""
+
+    def __init__(self, loader: Callable[[], Awaitable[List[Dict[str, Any]]]], ttl: float = 300.0):
+        """
+        初始化目录管理器
+
+        Args:
+            loader: 从数据库读取目录行的异步函数
+            ttl: 快照刷新间隔（秒）
+        """
+        super().__init__(loader, AudioCatalogSnapshot, ttl=ttl, name="音频目录")
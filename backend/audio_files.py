@@ -0,0 +1,175 @@
+"""
+音频文件传输 - 鉴权后的音频流式响应
+
+在 Starlette FileResponse（单段/多段 Range、ETag、Last-Modified、HEAD）的基础上：
+    - 支持条件请求：If-None-Match / If-Modified-Since 命中时返回 304
+    - 在线程中按 AUDIO_STREAM_CHUNK_SIZE 分块读取（默认 256KB，比 FileResponse 的 64KB 少切换线程）
+    - 文件 stat 结果短时间缓存，拖动进度条产生的连续 Range 请求不重复访问文件系统
+    - Content-Type 按文件头判断实际容器（部分 .mp3 文件实际是 MP4/AAC），不按扩展名
+"""
+import os
+import re
+import stat
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request
+from fastapi.responses import FileResponse, Response
+
+from cache import TTLCache
+
+# 允许的音频文件名（只允许目录下的文件，不允许路径分隔符和 ..）
+AUDIO_NAME_PATTERN = re.compile(r"[A-Za-z0-9][A-Za-z0-9_\-]*\.mp3")
+
+# 默认音频目录：backend/media/audio（随后端一起部署，不在前端 public 下，只能通过鉴权或签名接口访问）
+DEFAULT_AUDIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "media", "audio")
+
+# 无法识别文件头时使用的 Content-Type
+DEFAULT_AUDIO_MEDIA_TYPE = "audio/mpeg"
+
+def sniff_media_type(path: str) -> str:
+    """
+    按文件头判断音频的 Content-Type
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        str: Content-Type，无法识别时返回 DEFAULT_AUDIO_MEDIA_TYPE
+    """
+    try:
+        with open(path, "rb") as file:
+            header = file.read(12)
+    except OSError:
+        return DEFAULT_AUDIO_MEDIA_TYPE
+
+    if header[4:8] == b"ftyp":
+        return "audio/mp4"
+    if header[:3] == b"ID3":
+        return "audio/mpeg"
+    if header[:4] == b"OggS":
+        return "audio/ogg"
+    if header[:4] == b"fLaC":
+        return "audio/flac"
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "audio/wav"
+    if len(header) >= 2 and header[0] == 0xFF and header[1] & 0xF6 == 0xF0:
+        # 帧同步后层位为 0：AAC ADTS
+        return "audio/aac"
+    return DEFAULT_AUDIO_MEDIA_TYPE
+
+
+class AudioFileResponse(FileResponse):
+    """音频文件响应（在线程中按 AUDIO_STREAM_CHUNK_SIZE 分块读取）"""
+
+    chunk_size = int(os.getenv("AUDIO_STREAM_CHUNK_SIZE", str(256 * 1024)))
+
+
+class AudioFile:
+    """已解析的音频文件"""
+
+    __slots__ = ("name", "path", "stat_result", "media_type")
+
+    def __init__(self, name: str, path: str, stat_result: os.stat_result, media_type: Optional[str] = None):
+        self.name = name
+        self.path = path
+        self.stat_result = stat_result
+        self.media_type = media_type
+
+
+class AudioFileStore:
+    """音频文件目录"""
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        初始化音频文件目录（参数从环境变量读取）
+
+        Args:
+            directory: 音频目录，默认使用 AUDIO_FILES_DIR 或 backend/media/audio
+        """
+        self.directory = os.path.abspath(directory or os.getenv("AUDIO_FILES_DIR") or DEFAULT_AUDIO_DIR)
+        self.max_age = int(os.getenv("AUDIO_STREAM_MAX_AGE", "86400"))
+        self._stats = TTLCache(
+            max_size=1000,
+            default_ttl=float(os.getenv("AUDIO_STAT_CACHE_TTL", "30"))
+        )
+
+    def resolve(self, audio_name: str) -> Optional[AudioFile]:
+        """
+        查找音频文件
+
+        Args:
+            audio_name: 音频文件名
+
+        Returns:
+            Optional[AudioFile]: 音频文件，文件名不合法或文件不存在时返回 None
+        """
+        if not AUDIO_NAME_PATTERN.fullmatch(audio_name):
+            return None
+
+        cached = self._stats.get(audio_name)
+        if cached is not None:
+            return cached
+
+        path = os.path.join(self.directory, audio_name)
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        if not stat.S_ISREG(stat_result.st_mode):
+            return None
+
+        audio_file = AudioFile(audio_name, path, stat_result, sniff_media_type(path))
+        self._stats.set(audio_name, audio_file)
+        return audio_file
+
+    def response(
+        self,
+        audio_file: AudioFile,
+        request: Request,
+        cache_control: Optional[str] = None,
+        media_type: Optional[str] = None
+    ) -> Response:
+        """
+        生成音频响应
+
+        Args:
+            audio_file: resolve() 返回的音频文件
+            request: 当前请求（读取条件请求头）
+            cache_control: Cache-Control 响应头，默认只允许浏览器缓存
+            media_type: Content-Type，默认使用 resolve() 按文件头判断的类型
+
+        Returns:
+            Response: 304（客户端缓存仍有效）或音频文件响应（200 / 206 / 416）
+        """
+        response = AudioFileResponse(
+            audio_file.path,
+            media_type=media_type or audio_file.media_type or DEFAULT_AUDIO_MEDIA_TYPE,
+            stat_result=audio_file.stat_result,
+            # 付费内容需要鉴权，默认只允许浏览器缓存，不允许共享缓存
+            headers={"Cache-Control": cache_control or f"private, max-age={self.max_age}"}
+        )
+
+        # Range 请求按 If-Range 语义由 FileResponse 处理
+        if "range" not in request.headers and self._not_modified(request, response, audio_file.stat_result):
+            return Response(status_code=304, headers={
+                "ETag": response.headers["etag"],
+                "Last-Modified": response.headers["last-modified"],
+                "Cache-Control": response.headers["cache-control"]
+            })
+        return response
+
+    @staticmethod
+    def _not_modified(request: Request, response: Response, stat_result: os.stat_result) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            etag = response.headers["etag"]
+            return any(tag.strip() in (etag, f"W/{etag}", "*") for tag in if_none_match.split(","))
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since:
+            try:
+                return int(stat_result.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+        return False
@@ -0,0 +1,243 @@
+"""
+多码率 HLS 音频 - 打包产物的读取、码率选择和播放列表改写
+
+package_audio.py 离线把每个音频转成几档码率的 AAC（fMP4 分片）和 HLS 播放列表，目录结构：
+    AUDIO_HLS_DIR/
+        manifest.json               每个音频的源文件摘要、时长和各码率的大小
+        segments/<sha256前20位>.m4s  分片和初始化分片按内容命名，内容不变则名称不变，可永久缓存
+        <音频名>/<码率>.m3u8         媒体播放列表（分片使用相对路径）
+        <音频名>/master.m3u8         多码率主播放列表
+
+接口返回播放列表时把相对路径改写成签名链接（见 audio_signing.py），
+分片链接在同一签名时间窗口内保持不变，整晚循环播放时浏览器和 CDN 都可以直接命中缓存。
+"""
+import os
+import re
+import json
+import logging
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class Rendition(NamedTuple):
+    """一档码率"""
+
+    name: str
+    bitrate_kbps: int
+    channels: int
+
+
+# 码率档位（由低到高）。源文件为 256kbps MP3，助眠音频以环境声为主，低码率下音质损失不明显
+RENDITIONS: Tuple[Rendition, ...] = (
+    Rendition("low", 48, 2),
+    Rendition("mid", 96, 2),
+    Rendition("high", 160, 2),
+)
+RENDITIONS_BY_NAME = {rendition.name: rendition for rendition in RENDITIONS}
+RENDITION_ORDER = {rendition.name: index for index, rendition in enumerate(RENDITIONS)}
+
+# 各设备默认使用的码率：移动网络下整晚播放优先省流量
+DEVICE_RENDITIONS = {"mobile": "mid", "pc": "high"}
+
+# 分片名：内容 SHA-256 前 20 位十六进制 + 扩展名
+SEGMENT_NAME_PATTERN = re.compile(r"[0-9a-f]{20}\.(?:m4s|mp4)")
+
+# 默认打包目录：backend/media/hls（与音频一起随后端部署，不在 public 下，只能通过签名链接访问）
+DEFAULT_HLS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "media", "hls")
+
+MANIFEST_FILE = "manifest.json"
+PLAYLIST_MEDIA_TYPE = "application/vnd.apple.mpegurl"
+SEGMENT_MEDIA_TYPE = "audio/mp4"
+
+_URI_ATTRIBUTE = re.compile(r'URI="([^"]+)"')
+
+
+def track_stem(audio_name: str) -> str:
+    """音频文件名去掉扩展名（打包目录名）"""
+    return os.path.splitext(audio_name)[0]
+
+
+def choose_rendition(
+    available: Dict[str, Any],
+    device: str,
+    save_data: bool = False,
+    requested: Optional[str] = None
+) -> Optional[str]:
+    """
+    选择码率
+
+    优先使用客户端指定的码率；开启省流量（Save-Data）时使用最低档；
+    否则按设备类型选择，该档未打包时退到不高于它的最高一档
+
+    Args:
+        available: 已打包的码率（名称 → 信息）
+        device: 设备类型（mobile / pc）
+        save_data: 客户端是否请求省流量
+        requested: 客户端指定的码率名称
+
+    Returns:
+        Optional[str]: 码率名称，没有任何已打包的码率时返回 None
+    """
+    if not available:
+        return None
+    if requested in available:
+        return requested
+
+    ordered = sorted(
+        (name for name in available if name in RENDITION_ORDER),
+        key=RENDITION_ORDER.__getitem__
+    )
+    if not ordered:
+        return None
+    if save_data:
+        return ordered[0]
+
+    limit = RENDITION_ORDER[DEVICE_RENDITIONS.get(device, DEVICE_RENDITIONS["pc"])]
+    candidates = [name for name in ordered if RENDITION_ORDER[name] <= limit]
+    return candidates[-1] if candidates else ordered[0]
+
+
+def rewrite_playlist(text: str, url_for: Callable[[str], str]) -> str:
+    """
+    把播放列表中的相对路径改写成链接
+
+    Args:
+        text: m3u8 内容
+        url_for: 根据路径最后一段（分片名或子播放列表名）生成链接
+
+    Returns:
+        str: 改写后的 m3u8
+    """
+    lines = []
+    for line in text.splitlines():
+        if line.startswith("#"):
+            line = _URI_ATTRIBUTE.sub(lambda match: f'URI="{url_for(os.path.basename(match.group(1)))}"', line)
+        elif line.strip():
+            line = url_for(os.path.basename(line.strip()))
+        lines.append(line)
+    return "\n".join(lines) + "\n"
+
+
+def build_master_playlist(renditions: Dict[str, Dict[str, Any]]) -> str:
+    """
+    生成多码率主播放列表（子播放列表使用相对路径）
+
+    Args:
+        renditions: manifest 中某个音频的码率信息
+
+    Returns:
+        str: master.m3u8 内容
+    """
+    lines = ["#EXTM3U", "#EXT-X-VERSION:7", "#EXT-X-INDEPENDENT-SEGMENTS"]
+    for rendition in RENDITIONS:
+        info = renditions.get(rendition.name)
+        if info is None:
+            continue
+        lines.append(
+            f'#EXT-X-STREAM-INF:BANDWIDTH={info["peak_bandwidth"]},'
+            f'AVERAGE-BANDWIDTH={info["average_bandwidth"]},CODECS="mp4a.40.2"'
+        )
+        lines.append(f"{rendition.name}.m3u8")
+    return "\n".join(lines) + "\n"
+
+
+class HlsStore:
+    """打包产物目录（manifest 和播放列表按文件修改时间缓存）"""
+
+    def __init__(self, directory: Optional[str] = None):
+        """
+        初始化打包目录（参数从环境变量读取）
+
+        Args:
+            directory: 打包目录，默认使用 AUDIO_HLS_DIR 或 backend/media/hls
+        """
+        self.directory = os.path.abspath(directory or os.getenv("AUDIO_HLS_DIR") or DEFAULT_HLS_DIR)
+        self.segments_dir = os.path.join(self.directory, "segments")
+        self._manifest: Dict[str, Any] = {}
+        self._manifest_mtime: Optional[float] = None
+        self._playlists = TTLCache(max_size=1000, default_ttl=float(os.getenv("AUDIO_HLS_CACHE_TTL", "60")))
+
+    def manifest(self) -> Dict[str, Any]:
+        """
+        读取 manifest（文件未变化时返回缓存）
+
+        Returns:
+            Dict[str, Any]: manifest 内容，未打包时为空字典
+        """
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return {}
+        if mtime != self._manifest_mtime:
+            try:
+                with open(path, encoding="utf-8") as file:
+                    self._manifest = json.load(file)
+                self._manifest_mtime = mtime
+                self._playlists.clear()
+            except (OSError, ValueError) as e:
+                logger.error("读取 HLS manifest 失败", extra={"path": path, "error": str(e)})
+        return self._manifest
+
+    def renditions(self, audio_name: str) -> Dict[str, Dict[str, Any]]:
+        """
+        获取音频已打包的码率
+
+        Args:
+            audio_name: 音频文件名
+
+        Returns:
+            Dict[str, Dict[str, Any]]: 码率名称 → 码率信息（码率、时长、大小、带宽）
+        """
+        track = self.manifest().get("tracks", {}).get(audio_name)
+        return track["renditions"] if track else {}
+
+    def playlist(self, audio_name: str, name: str) -> Optional[str]:
+        """
+        读取播放列表
+
+        Args:
+            audio_name: 音频文件名
+            name: master 或码率名称
+
+        Returns:
+            Optional[str]: m3u8 内容（相对路径），不存在时返回 None
+        """
+        renditions = self.renditions(audio_name)
+        if name != "master" and name not in renditions:
+            return None
+        if name == "master" and not renditions:
+            return None
+
+        key = (audio_name, name)
+        cached = self._playlists.get(key)
+        if cached is not None:
+            return cached
+        try:
+            with open(os.path.join(self.directory, track_stem(audio_name), f"{name}.m3u8"), encoding="utf-8") as file:
+                text = file.read()
+        except OSError:
+            return None
+        self._playlists.set(key, text)
+        return text
+
+    def segment(self, segment_name: str) -> Optional[Tuple[str, os.stat_result]]:
+        """
+        查找分片文件
+
+        Args:
+            segment_name: 分片名
+
+        Returns:
+            Optional[Tuple[str, os.stat_result]]: (路径, stat)，名称不合法或文件不存在时返回 None
+        """
+        if not SEGMENT_NAME_PATTERN.fullmatch(segment_name):
+            return None
+        path = os.path.join(self.segments_dir, segment_name)
+        try:
+            return path, os.stat(path)
+        except OSError:
+            return None
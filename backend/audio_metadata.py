@@ -0,0 +1,389 @@
+"""
+音频元数据读取 - 不解码音频，流式解析 MP3 帧头和 Xing/Info/VBRI 标签
+
+文件按块读取一遍，同时计算 SHA-256 和解析帧头：
+    - 跳过开头的 ID3v2 标签
+    - 第一帧是 Xing/Info（LAME）或 VBRI 标签帧时，直接使用标签中的总帧数和音频字节数
+    - 否则逐帧累计帧数和字节数（只读 4 字节帧头，按帧长跳过帧数据）
+时长 = 帧数 × 每帧采样数 / 采样率，平均码率 = 音频字节数 × 8 / 时长。
+
+扩展名为 .mp3 但实际是 MP4 容器（AAC，ftyp M4A）的文件，哈希读取完成后再按 box 头跳读
+moov 中的 mvhd（时长）和 mp4a 采样描述（声道数、采样率）。
+"""
+import os
+import hashlib
+from typing import Any, BinaryIO, Dict, NamedTuple, Optional, Set
+
+# audio_access_control 中由索引命令维护的字段
+AUDIO_METADATA_COLUMNS = (
+    "duration_seconds", "file_size_bytes", "bitrate_kbps", "sample_rate", "channels", "codec", "content_sha256"
+)
+
+# 每次读取的块大小
+READ_CHUNK_SIZE = 1024 * 1024
+
+# 版本位 → 版本（1 为保留值）
+_VERSIONS = {3: "1", 2: "2", 0: "2.5"}
+# 层位 → 层（0 为保留值）
+_LAYERS = {3: 1, 2: 2, 1: 3}
+
+_BITRATES = {
+    ("1", 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    ("1", 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    ("1", 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    ("2", 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    ("2", 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    ("2", 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+_SAMPLE_RATES = {
+    "1": (44100, 48000, 32000),
+    "2": (22050, 24000, 16000),
+    "2.5": (11025, 12000, 8000),
+}
+
+
+class FrameHeader(NamedTuple):
+    """MPEG 音频帧头"""
+
+    version: str
+    layer: int
+    bitrate_kbps: int
+    sample_rate: int
+    channels: int
+    length: int
+    samples: int
+    side_info_size: int
+
+    @property
+    def signature(self) -> tuple:
+        """同一个文件内所有帧相同的字段"""
+        return self.version, self.layer, self.sample_rate
+
+
+class AudioInfo(NamedTuple):
+    """音频元数据"""
+
+    duration_seconds: float
+    bitrate_kbps: int
+    sample_rate: int
+    channels: int
+    codec: str
+    is_vbr: bool
+
+
+def parse_frame_header(header: int) -> Optional[FrameHeader]:
+    """
+    解析 4 字节帧头
+
+    Args:
+        header: 帧头（大端整数）
+
+    Returns:
+        Optional[FrameHeader]: 帧头，不是合法帧头时返回 None（包括自由码率）
+    """
+    if (header >> 21) & 0x7FF != 0x7FF:
+        return None
+    version = _VERSIONS.get((header >> 19) & 0x3)
+    layer = _LAYERS.get((header >> 17) & 0x3)
+    bitrate_index = (header >> 12) & 0xF
+    sample_rate_index = (header >> 10) & 0x3
+    if version is None or layer is None or bitrate_index in (0, 15) or sample_rate_index == 3:
+        return None
+
+    bitrate_kbps = _BITRATES[("1" if version == "1" else "2", layer)][bitrate_index]
+    sample_rate = _SAMPLE_RATES[version][sample_rate_index]
+    padding = (header >> 9) & 0x1
+    mono = (header >> 6) & 0x3 == 3
+
+    if layer == 1:
+        samples = 384
+        length = (12 * bitrate_kbps * 1000 // sample_rate + padding) * 4
+    elif layer == 2 or version == "1":
+        samples = 1152
+        length = 144 * bitrate_kbps * 1000 // sample_rate + padding
+    else:
+        samples = 576
+        length = 72 * bitrate_kbps * 1000 // sample_rate + padding
+
+    if version == "1":
+        side_info_size = 17 if mono else 32
+    else:
+        side_info_size = 9 if mono else 17
+
+    return FrameHeader(
+        version, layer, bitrate_kbps, sample_rate, 1 if mono else 2, length, samples, side_info_size
+    )
+
+
+class Mp3Scanner:
+    """
+    流式 MP3 解析器
+
+    按任意大小的块调用 feed()，最后调用 finish() 取得结果；
+    缓冲区只保留未解析完的帧头附近的字节，帧数据直接跳过。
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._skip = 0
+        self._started = False
+        self._signature: Optional[tuple] = None
+        self._first: Optional[FrameHeader] = None
+        self._bitrates: Set[int] = set()
+        self.frames = 0
+        self.audio_bytes = 0
+        self.tag: Optional[str] = None
+        self.tag_frames: Optional[int] = None
+        self.tag_bytes: Optional[int] = None
+
+    def feed(self, data: bytes) -> None:
+        """
+        输入一块数据
+
+        Args:
+            data: 文件中紧接上一块的数据
+        """
+        if self._skip >= len(data):
+            self._skip -= len(data)
+            return
+        self._buffer += memoryview(data)[self._skip:]
+        self._skip = 0
+        self._parse(final=False)
+
+    def finish(self) -> Optional[AudioInfo]:
+        """
+        结束解析
+
+        Returns:
+            Optional[AudioInfo]: 元数据，没有找到任何音频帧时返回 None
+        """
+        self._parse(final=True)
+        first = self._first
+        if first is None:
+            return None
+
+        frames = self.tag_frames or self.frames
+        audio_bytes = self.tag_bytes or self.audio_bytes
+        duration = frames * first.samples / first.sample_rate
+        return AudioInfo(
+            duration_seconds=duration,
+            bitrate_kbps=round(audio_bytes * 8 / duration / 1000) if duration else first.bitrate_kbps,
+            sample_rate=first.sample_rate,
+            channels=first.channels,
+            codec="mp3",
+            # LAME 对 CBR 文件写 Info 标签，VBR/ABR 写 Xing 标签
+            is_vbr=self.tag in ("Xing", "VBRI") or len(self._bitrates) > 1
+        )
+
+    def _parse(self, final: bool) -> None:
+        buffer = self._buffer
+        size = len(buffer)
+        position = 0
+
+        if not self._started:
+            if size < 10 and not final:
+                return
+            self._started = True
+            if buffer[:3] == b"ID3" and size >= 10:
+                # ID3v2 标签大小为 4 个 7 位字节（syncsafe），不含 10 字节标签头和可选的 10 字节标签尾
+                tag_size = 0
+                for byte in buffer[6:10]:
+                    tag_size = (tag_size << 7) | (byte & 0x7F)
+                tag_size += 20 if buffer[5] & 0x10 else 10
+                if tag_size > size:
+                    self._skip = tag_size - size
+                    position = size
+                else:
+                    position = tag_size
+
+        while size - position >= 4:
+            if buffer[position] != 0xFF:
+                next_sync = buffer.find(b"\xff", position + 1)
+                position = size if next_sync < 0 else next_sync
+                continue
+
+            frame = parse_frame_header(int.from_bytes(buffer[position:position + 4], "big"))
+            if frame is None or (self._signature is not None and frame.signature != self._signature):
+                position += 1
+                continue
+
+            if self._signature is None:
+                # 第一帧：要求下一帧帧头也合法，避免把 ID3 填充或封面数据中的 0xFF 误认为帧同步
+                if size - position < frame.length + 4:
+                    if not final:
+                        break
+                else:
+                    following = parse_frame_header(
+                        int.from_bytes(buffer[position + frame.length:position + frame.length + 4], "big")
+                    )
+                    if following is None or following.signature != frame.signature:
+                        position += 1
+                        continue
+                self._signature = frame.signature
+                self._first = frame
+                if self._read_tag(buffer, position, frame):
+                    position += frame.length
+                    continue
+
+            self.frames += 1
+            self.audio_bytes += frame.length
+            self._bitrates.add(frame.bitrate_kbps)
+            position += frame.length
+            if position > size:
+                self._skip = position - size
+                position = size
+
+        del buffer[:position]
+
+    def _read_tag(self, buffer: bytearray, position: int, frame: FrameHeader) -> bool:
+        """读取第一帧中的 Xing/Info 或 VBRI 标签，返回该帧是否为标签帧（不计入音频帧）"""
+        offset = position + 4 + frame.side_info_size
+        marker = bytes(buffer[offset:offset + 4])
+        if marker in (b"Xing", b"Info"):
+            flags = int.from_bytes(buffer[offset + 4:offset + 8], "big")
+            cursor = offset + 8
+            if flags & 0x1:
+                self.tag_frames = int.from_bytes(buffer[cursor:cursor + 4], "big") or None
+                cursor += 4
+            if flags & 0x2:
+                self.tag_bytes = int.from_bytes(buffer[cursor:cursor + 4], "big") or None
+            self.tag = marker.decode("ascii")
+            return True
+
+        # VBRI（Fraunhofer 编码器）固定位于帧头后 32 字节
+        offset = position + 36
+        if bytes(buffer[offset:offset + 4]) == b"VBRI":
+            self.tag_bytes = int.from_bytes(buffer[offset + 10:offset + 14], "big") or None
+            self.tag_frames = int.from_bytes(buffer[offset + 14:offset + 18], "big") or None
+            self.tag = "VBRI"
+            return True
+        return False
+
+
+# 需要进入的 MP4 容器 box（到 mp4a 采样描述的路径）
+_MP4_CONTAINERS = {b"trak", b"mdia", b"minf", b"stbl"}
+
+
+def _iter_boxes(data: bytes, start: int = 0, end: Optional[int] = None):
+    """遍历内存中的 MP4 box，返回 (类型, 内容起点, 内容终点)"""
+    end = len(data) if end is None else end
+    position = start
+    while end - position >= 8:
+        size = int.from_bytes(data[position:position + 4], "big")
+        box_type = data[position + 4:position + 8]
+        header = 8
+        if size == 1:
+            size = int.from_bytes(data[position + 8:position + 16], "big")
+            header = 16
+        elif size == 0:
+            size = end - position
+        if size < header or position + size > end:
+            return
+        yield box_type, position + header, position + size
+        position += size
+
+
+def read_mp4_info(file: BinaryIO, file_size: int) -> Optional[AudioInfo]:
+    """
+    读取 MP4 容器的时长和音频参数（只读取顶层 box 头和 moov box）
+
+    Args:
+        file: 已打开的文件
+        file_size: 文件大小
+
+    Returns:
+        Optional[AudioInfo]: 元数据，不是 MP4 或缺少 mvhd 时返回 None
+    """
+    position = 0
+    moov = None
+    while position + 8 <= file_size:
+        file.seek(position)
+        header = file.read(16)
+        size = int.from_bytes(header[:4], "big")
+        box_type = header[4:8]
+        if size == 1:
+            size = int.from_bytes(header[8:16], "big")
+        elif size == 0:
+            size = file_size - position
+        if size < 8:
+            return None
+        if position == 0 and box_type != b"ftyp":
+            return None
+        if box_type == b"moov":
+            file.seek(position)
+            moov = file.read(size)
+            break
+        position += size
+    if moov is None:
+        return None
+
+    duration = None
+    sample_rate = 0
+    channels = 0
+    pending = [(0, len(moov))]
+    while pending:
+        start, end = pending.pop()
+        for box_type, body, box_end in _iter_boxes(moov, start, end):
+            if box_type == b"moov":
+                pending.append((body, box_end))
+            elif box_type == b"mvhd":
+                if moov[body] == 1:
+                    timescale = int.from_bytes(moov[body + 20:body + 24], "big")
+                    length = int.from_bytes(moov[body + 24:body + 32], "big")
+                else:
+                    timescale = int.from_bytes(moov[body + 12:body + 16], "big")
+                    length = int.from_bytes(moov[body + 16:body + 20], "big")
+                duration = length / timescale if timescale else None
+            elif box_type in _MP4_CONTAINERS:
+                pending.append((body, box_end))
+            elif box_type == b"stsd" and not sample_rate:
+                # stsd：版本/标志 4 字节 + 条目数 4 字节，之后是采样描述 box
+                for entry_type, entry, _ in _iter_boxes(moov, body + 8, box_end):
+                    if entry_type == b"mp4a":
+                        # 通用采样描述 8 字节 + 保留 8 字节，之后是声道数、采样位数、保留、16.16 采样率
+                        channels = int.from_bytes(moov[entry + 16:entry + 18], "big")
+                        sample_rate = int.from_bytes(moov[entry + 24:entry + 26], "big")
+                        break
+
+    if not duration:
+        return None
+    return AudioInfo(
+        duration_seconds=duration,
+        bitrate_kbps=round(file_size * 8 / duration / 1000),
+        sample_rate=sample_rate,
+        channels=channels,
+        codec="aac" if sample_rate else "mp4",
+        is_vbr=False
+    )
+
+
+def scan_file(path: str) -> Dict[str, Any]:
+    """
+    读取一遍文件，计算 SHA-256 并解析音频元数据（可在子进程中运行）
+
+    Args:
+        path: 文件路径
+
+    Returns:
+        Dict[str, Any]: 文件大小、SHA-256 和音频元数据（无法识别时 info 为 None）
+    """
+    digest = hashlib.sha256()
+    scanner = Mp3Scanner()
+    file_size = 0
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(READ_CHUNK_SIZE), b""):
+            digest.update(chunk)
+            scanner.feed(chunk)
+            file_size += len(chunk)
+
+        info = scanner.finish()
+        if info is None:
+            info = read_mp4_info(file, file_size)
+
+    return {
+        "audio_name": os.path.basename(path),
+        "file_size_bytes": file_size,
+        "content_sha256": digest.hexdigest(),
+        "info": info._asdict() if info else None
+    }
@@ -0,0 +1,341 @@
+"""
+音频波形峰值 - 离线计算、二进制存储和读取
+
+批处理命令用 ffmpeg 把每个音频解码一次（单声道 s16le，PEAKS_SAMPLE_RATE），
+流式按 BLOCK_SAMPLES 个采样一块求最小/最大值，再合并成 PEAK_RESOLUTIONS 中每种分辨率的峰值，
+以 int8 存放在音频旁边的 <音频名去掉扩展名>.<分辨率>.peaks 文件中（4096 个点约 8KB）。
+播放器按需要的宽度请求一种分辨率，不需要在客户端下载和解码整个音频。
+
+文件格式（小端）：
+    4s  魔数 b"HZPK"
+    B   格式版本（1）
+    B   声道数（1，混合为单声道）
+    H   保留
+    I   解码采样率
+    I   时长（毫秒）
+    I   峰值点数 N
+    N×2 int8：每个点的 (最小值, 最大值)，由 int16 采样右移 8 位得到
+
+安装了 NumPy（requirements-tools.txt）时分块和合并都是向量化的，否则回退到标准库 array。
+
+Vercel 构建环境没有 ffmpeg，峰值文件在本地生成后提交到仓库，随 backend/media/audio 一起部署；
+新增或替换音频后重新运行本命令并提交生成的 .peaks 文件。
+没有系统 ffmpeg 时可以用 requirements-tools.txt 中 imageio-ffmpeg 附带的二进制文件：
+    FFMPEG_BIN=$(python -c "import imageio_ffmpeg; print(imageio_ffmpeg.get_ffmpeg_exe())") python audio_peaks.py
+
+用法：
+    python audio_peaks.py
+    python audio_peaks.py --tracks a.mp3 --force
+"""
+import os
+import sys
+import time
+import shutil
+import struct
+import argparse
+import tempfile
+import subprocess
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Sequence, Tuple
+
+from cache import TTLCache
+from audio_files import AUDIO_NAME_PATTERN, AudioFile, AudioFileStore
+
+# 支持的分辨率（峰值点数），都由同一组块级峰值合并得到
+PEAK_RESOLUTIONS = (256, 1024, 4096)
+DEFAULT_PEAK_BINS = 1024
+
+# 解码采样率：只用于绘制波形，不需要完整带宽
+PEAKS_SAMPLE_RATE = 11025
+# 流式处理时每块的采样数
+BLOCK_SAMPLES = 32
+
+PEAKS_MAGIC = b"HZPK"
+PEAKS_VERSION = 1
+_HEADER = struct.Struct("<4sBBHIII")
+
+PEAKS_MEDIA_TYPE = "application/octet-stream"
+
+
+def _numpy():
+    """按需导入 NumPy（可选依赖，服务进程读取峰值文件时不需要）"""
+    try:
+        import numpy
+    except ImportError:  # pragma: no cover - 可选依赖
+        return None
+    return numpy
+
+
+def peaks_file_name(audio_name: str, bins: int) -> str:
+    """峰值文件名"""
+    return f"{os.path.splitext(audio_name)[0]}.{bins}.peaks"
+
+
+class PeakAccumulator:
+    """流式计算块级最小/最大值（输入为单声道 s16le PCM）"""
+
+    def __init__(self, block_samples: int = BLOCK_SAMPLES):
+        self.block_samples = block_samples
+        self.samples = 0
+        self._np = _numpy()
+        self._carry = b""
+        self._mins: list = []
+        self._maxs: list = []
+
+    def feed(self, pcm: bytes) -> None:
+        """
+        输入一段 PCM
+
+        Args:
+            pcm: 紧接上一段的 s16le 数据（长度可以不是块大小的整数倍）
+        """
+        data = self._carry + pcm
+        usable = len(data) - len(data) % (self.block_samples * 2)
+        self._carry = data[usable:]
+        if usable:
+            self._reduce(data[:usable])
+
+    def _reduce(self, data: bytes) -> None:
+        self.samples += len(data) // 2
+        if self._np is not None:
+            blocks = self._np.frombuffer(data, dtype="<i2").reshape(-1, self.block_samples)
+            self._mins.append(blocks.min(axis=1))
+            self._maxs.append(blocks.max(axis=1))
+            return
+
+        samples = array("h", data)
+        if sys.byteorder == "big":
+            samples.byteswap()
+        step = self.block_samples
+        for start in range(0, len(samples), step):
+            block = samples[start:start + step]
+            self._mins.append(min(block))
+            self._maxs.append(max(block))
+
+    def finish(self, resolutions: Sequence[int] = PEAK_RESOLUTIONS) -> List[bytes]:
+        """
+        结束输入并合并成各分辨率的峰值
+
+        Args:
+            resolutions: 分辨率（峰值点数）
+
+        Returns:
+            List[bytes]: 与 resolutions 对应的 int8 峰值（最小值、最大值交替）；
+                块数少于分辨率时点数等于块数
+        """
+        if self._carry:
+            self._reduce(self._carry + b"\x00" * (self.block_samples * 2 - len(self._carry)))
+            self._carry = b""
+
+        np = self._np
+        if np is not None:
+            mins = np.concatenate(self._mins) if self._mins else np.zeros(0, dtype="<i2")
+            maxs = np.concatenate(self._maxs) if self._maxs else np.zeros(0, dtype="<i2")
+        else:
+            mins, maxs = self._mins, self._maxs
+
+        return [self._merge(mins, maxs, min(bins, len(mins))) for bins in resolutions]
+
+    def _merge(self, mins, maxs, bins: int) -> bytes:
+        """把块级峰值按 bins 个等宽区间合并，并缩放为 int8"""
+        if bins == 0:
+            return b""
+        count = len(mins)
+        np = self._np
+        if np is not None:
+            starts = np.arange(bins, dtype=np.int64) * count // bins
+            low = np.right_shift(np.minimum.reduceat(mins, starts), 8).astype(np.int8)
+            high = np.right_shift(np.maximum.reduceat(maxs, starts), 8).astype(np.int8)
+            return np.column_stack((low, high)).tobytes()
+
+        merged = array("b")
+        for index in range(bins):
+            start = index * count // bins
+            end = (index + 1) * count // bins
+            merged.append(min(mins[start:end]) >> 8)
+            merged.append(max(maxs[start:end]) >> 8)
+        return merged.tobytes()
+
+
+def encode_peaks(peaks: bytes, sample_rate: int, samples: int) -> bytes:
+    """
+    生成峰值文件内容
+
+    Args:
+        peaks: int8 峰值（最小值、最大值交替）
+        sample_rate: 解码采样率
+        samples: 解码得到的采样数
+
+    Returns:
+        bytes: 文件头 + 峰值
+    """
+    duration_ms = samples * 1000 // sample_rate if sample_rate else 0
+    return _HEADER.pack(PEAKS_MAGIC, PEAKS_VERSION, 1, 0, sample_rate, duration_ms, len(peaks) // 2) + peaks
+
+
+def decode_peaks(data: bytes) -> Tuple[int, int, List[Tuple[int, int]]]:
+    """
+    解析峰值文件
+
+    Args:
+        data: 文件内容
+
+    Returns:
+        Tuple[int, int, List[Tuple[int, int]]]: (采样率, 时长毫秒, [(最小值, 最大值)])
+
+    Raises:
+        ValueError: 不是峰值文件时抛出
+    """
+    magic, version, _, _, sample_rate, duration_ms, bins = _HEADER.unpack_from(data)
+    if magic != PEAKS_MAGIC or version != PEAKS_VERSION:
+        raise ValueError("不是波形峰值文件")
+    values = array("b", data[_HEADER.size:_HEADER.size + bins * 2])
+    return sample_rate, duration_ms, list(zip(values[0::2], values[1::2]))
+
+
+class PeaksStore:
+    """音频目录中的峰值文件（stat 结果短时间缓存）"""
+
+    def __init__(self, directory: str):
+        """
+        初始化峰值文件目录（参数从环境变量读取）
+
+        Args:
+            directory: 音频目录（峰值文件与音频放在一起）
+        """
+        self.directory = directory
+        self.max_age = int(os.getenv("AUDIO_PEAKS_MAX_AGE", "86400"))
+        self._stats = TTLCache(max_size=1000, default_ttl=float(os.getenv("AUDIO_STAT_CACHE_TTL", "30")))
+
+    def resolve(self, audio_name: str, bins: int) -> Optional[AudioFile]:
+        """
+        查找峰值文件
+
+        Args:
+            audio_name: 音频文件名
+            bins: 分辨率
+
+        Returns:
+            Optional[AudioFile]: 峰值文件，名称不合法、分辨率不支持或尚未生成时返回 None
+        """
+        if bins not in PEAK_RESOLUTIONS or not AUDIO_NAME_PATTERN.fullmatch(audio_name):
+            return None
+
+        key = (audio_name, bins)
+        cached = self._stats.get(key)
+        if cached is not None:
+            return cached
+
+        name = peaks_file_name(audio_name, bins)
+        path = os.path.join(self.directory, name)
+        try:
+            peaks_file = AudioFile(name, path, os.stat(path))
+        except OSError:
+            return None
+        self._stats.set(key, peaks_file)
+        return peaks_file
+
+
+def compute_peaks(ffmpeg: str, source: str) -> Tuple[dict, int]:
+    """
+    解码音频并计算各分辨率的峰值
+
+    Args:
+        ffmpeg: ffmpeg 可执行文件
+        source: 音频路径
+
+    Returns:
+        Tuple[dict, int]: (分辨率 → 峰值文件内容, 解码采样数)
+
+    Raises:
+        RuntimeError: 解码失败时抛出
+    """
+    command = [
+        ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error",
+        "-i", source, "-map", "0:a:0", "-vn",
+        "-ac", "1", "-ar", str(PEAKS_SAMPLE_RATE), "-f", "s16le", "-acodec", "pcm_s16le", "-"
+    ]
+    accumulator = PeakAccumulator()
+    # stderr 写入临时文件：读取 stdout 时 ffmpeg 不会因 stderr 管道写满而阻塞
+    with tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file)
+        try:
+            for chunk in iter(lambda: process.stdout.read(256 * 1024), b""):
+                accumulator.feed(chunk)
+        except BaseException:
+            process.kill()
+            raise
+        finally:
+            process.stdout.close()
+            returncode = process.wait()
+        if returncode != 0:
+            stderr_file.seek(0)
+            stderr = stderr_file.read().decode("utf-8", "replace")
+            # 只保留最后的错误输出
+            raise RuntimeError(f"ffmpeg 解码 {os.path.basename(source)} 失败: {stderr.strip()[-2000:]}")
+
+    peaks = accumulator.finish()
+    return {
+        bins: encode_peaks(data, PEAKS_SAMPLE_RATE, accumulator.samples)
+        for bins, data in zip(PEAK_RESOLUTIONS, peaks)
+    }, accumulator.samples
+
+
+def _build(ffmpeg: str, directory: str, audio_name: str, force: bool) -> Optional[int]:
+    """为一个音频生成峰值文件，文件比音频新时跳过；返回写入的字节数"""
+    source = os.path.join(directory, audio_name)
+    source_mtime = os.stat(source).st_mtime
+    targets = [os.path.join(directory, peaks_file_name(audio_name, bins)) for bins in PEAK_RESOLUTIONS]
+    if not force and all(os.path.exists(target) and os.stat(target).st_mtime >= source_mtime for target in targets):
+        return None
+
+    files, _ = compute_peaks(ffmpeg, source)
+    written = 0
+    for target, data in zip(targets, files.values()):
+        temp_path = f"{target}.tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, target)
+        written += len(data)
+    return written
+
+
+def main() -> int:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="计算音频波形峰值")
+    parser.add_argument("--source", default=None, help="音频目录，默认 AUDIO_FILES_DIR 或 backend/media/audio")
+    parser.add_argument("--tracks", nargs="+", default=None, help="只处理这些音频，默认目录中的全部音频")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 2, help="同时运行的 ffmpeg 进程数")
+    parser.add_argument("--force", action="store_true", help="忽略修改时间，全部重新计算")
+    args = parser.parse_args()
+
+    ffmpeg = os.getenv("FFMPEG_BIN") or shutil.which("ffmpeg")
+    if not ffmpeg:
+        print("❌ 未找到 ffmpeg，请安装 ffmpeg 或通过 FFMPEG_BIN 指定路径")
+        return 1
+
+    audio_files = AudioFileStore(args.source)
+    audio_names = args.tracks or sorted(os.listdir(audio_files.directory))
+    audio_names = [name for name in audio_names if audio_files.resolve(name) is not None]
+
+    print(f"🚀 计算波形峰值（{'NumPy' if _numpy() else '标准库'}，{len(audio_names)} 个音频）")
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, args.jobs)) as executor:
+        results = executor.map(
+            lambda name: (name, _build(ffmpeg, audio_files.directory, name, args.force)), audio_names
+        )
+        for audio_name, written in results:
+            if written is None:
+                print(f"⏭️  {audio_name} 未变化，跳过")
+            else:
+                print(f"✅ {audio_name}: {written / 1024:.1f}KB（{'/'.join(map(str, PEAK_RESOLUTIONS))} 点）")
+    print(f"耗时 {time.perf_counter() - started:.2f}s")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""
+音频签名链接 - 无状态的带过期时间音频 URL
+
+播放会话开始时做一次访问判断，为用户可访问的音频签发链接；
+之后每次拉取（包括 Range 请求）只需校验 HMAC 签名和过期时间，不访问数据库，
+签名链接也可以放在 CDN 后面。
+
+签名内容为 "资源名\\n过期时间戳"（资源名为音频文件名，或 HLS 播放列表/分片的标识），不包含用户信息：
+过期时间按 AUDIO_URL_BUCKET 向上取整，同一时间窗口内所有用户拿到的链接相同，CDN 可以共享缓存。
+"""
+import os
+import hmac
+import time
+import base64
+import hashlib
+from typing import List, Optional
+
+# 签名截断长度（字节），128 位足以防止伪造
+SIGNATURE_BYTES = 16
+
+
+def _derive_key(secret: str) -> bytes:
+    """从已有密钥派生音频签名专用密钥，避免与 JWT 验签共用同一个密钥"""
+    return hmac.new(secret.encode("utf-8"), b"herhzzz-audio-url", hashlib.sha256).digest()
+
+
+class AudioUrlSigner:
+    """音频链接签名与校验"""
+
+    def __init__(
+        self,
+        keys: Optional[List[bytes]] = None,
+        ttl: Optional[float] = None,
+        bucket: Optional[float] = None
+    ):
+        """
+        初始化签名器（参数从环境变量读取）
+
+        Args:
+            keys: 签名密钥列表，第一个用于签名，全部用于校验（轮换密钥时保留旧密钥）；
+                默认读取 AUDIO_URL_SIGNING_KEY / AUDIO_URL_SIGNING_KEY_PREVIOUS，
+                未配置时从 SUPABASE_JWT_SECRET 派生
+            ttl: 链接有效期（秒）
+            bucket: 过期时间取整粒度（秒）
+
+        Raises:
+            ValueError: 没有可用的签名密钥时抛出
+        """
+        if keys is None:
+            secrets = [
+                os.getenv("AUDIO_URL_SIGNING_KEY") or os.getenv("SUPABASE_JWT_SECRET"),
+                os.getenv("AUDIO_URL_SIGNING_KEY_PREVIOUS")
+            ]
+            keys = [_derive_key(secret) for secret in secrets if secret]
+        if not keys:
+            raise ValueError("缺少音频链接签名密钥，请设置 AUDIO_URL_SIGNING_KEY")
+
+        self.ttl = ttl if ttl is not None else float(os.getenv("AUDIO_URL_TTL", "21600"))
+        self.bucket = bucket if bucket is not None else float(os.getenv("AUDIO_URL_BUCKET", "900"))
+        # 预先完成密钥填充，每次签名/校验只复制 HMAC 状态
+        self._macs = [hmac.new(key, digestmod=hashlib.sha256) for key in keys]
+
+    def expires_at(self, now: Optional[float] = None) -> int:
+        """
+        计算新签发链接的过期时间
+
+        Args:
+            now: 当前时间戳，默认为 time.time()
+
+        Returns:
+            int: 过期时间戳（秒），至少还有 ttl 秒有效期
+        """
+        now = time.time() if now is None else now
+        deadline = now + self.ttl
+        if self.bucket > 0:
+            deadline = -(-deadline // self.bucket) * self.bucket
+        return int(deadline)
+
+    def _signature(self, mac: "hmac.HMAC", resource: str, expires: int) -> bytes:
+        mac = mac.copy()
+        mac.update(f"{resource}\n{expires}".encode("utf-8"))
+        return mac.digest()[:SIGNATURE_BYTES]
+
+    def sign(self, resource: str, expires: int) -> str:
+        """
+        生成签名
+
+        Args:
+            resource: 资源名（音频文件名等）
+            expires: 过期时间戳（秒）
+
+        Returns:
+            str: URL 安全的 base64 签名（不含填充）
+        """
+        signature = self._signature(self._macs[0], resource, expires)
+        return base64.urlsafe_b64encode(signature).rstrip(b"=").decode("ascii")
+
+    def verify(self, resource: str, expires: int, signature: str, now: Optional[float] = None) -> bool:
+        """
+        校验签名和过期时间（纯计算，不访问数据库）
+
+        Args:
+            resource: 资源名（音频文件名等）
+            expires: 链接中的过期时间戳
+            signature: 链接中的签名
+            now: 当前时间戳，默认为 time.time()
+
+        Returns:
+            bool: 签名有效且未过期
+        """
+        if expires < (time.time() if now is None else now):
+            return False
+        try:
+            provided = base64.urlsafe_b64decode(signature + "=" * (-len(signature) % 4))
+        except (ValueError, TypeError):
+            return False
+        if len(provided) != SIGNATURE_BYTES:
+            return False
+        return any(
+            hmac.compare_digest(provided, self._signature(mac, resource, expires))
+            for mac in self._macs
+        )
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+音频签名链接校验微基准
+
+测量 AudioUrlSigner 的签名和校验吞吐量（纯计算，不访问数据库），
+包括有效链接、篡改签名和密钥轮换期间用旧密钥签发的链接三种情况。
+有效链接的校验吞吐量低于 --target 时以非 0 状态退出。
+
+用法：
+    python bench_audio_signing.py
+    python bench_audio_signing.py --iterations 200000 --target 10000
+"""
+import argparse
+import sys
+import time
+from typing import Callable
+
+from audio_signing import AudioUrlSigner
+
+AUDIO_NAME = "rongrong_yuesheng.mp3"
+
+
+def _rate(fn: Callable[[], object], iterations: int) -> float:
+    """
+    测量每秒调用次数
+
+    Returns:
+        float: 每秒调用次数
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return iterations / (time.perf_counter() - start)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="音频签名链接校验微基准")
+    parser.add_argument("--iterations", type=int, default=100000)
+    parser.add_argument("--target", type=float, default=10000, help="有效链接每秒校验次数的下限")
+    args = parser.parse_args()
+
+    signer = AudioUrlSigner(keys=[b"bench-current-key"])
+    rotated = AudioUrlSigner(keys=[b"bench-current-key", b"bench-previous-key"])
+    previous = AudioUrlSigner(keys=[b"bench-previous-key"])
+
+    expires = signer.expires_at()
+    signature = signer.sign(AUDIO_NAME, expires)
+    forged = signature[:-2] + ("AA" if not signature.endswith("AA") else "BB")
+    old_signature = previous.sign(AUDIO_NAME, expires)
+    assert signer.verify(AUDIO_NAME, expires, signature)
+    assert not signer.verify(AUDIO_NAME, expires, forged)
+    assert rotated.verify(AUDIO_NAME, expires, old_signature)
+
+    cases = [
+        ("签名", lambda: signer.sign(AUDIO_NAME, expires)),
+        ("校验：有效链接", lambda: signer.verify(AUDIO_NAME, expires, signature)),
+        ("校验：篡改签名", lambda: signer.verify(AUDIO_NAME, expires, forged)),
+        ("校验：轮换期旧密钥链接", lambda: rotated.verify(AUDIO_NAME, expires, old_signature)),
+    ]
+
+    print("🚀 音频签名链接微基准")
+    print(f"   每项迭代: {args.iterations}, 目标: 有效链接校验 ≥ {args.target:,.0f} 次/秒")
+    print("=" * 60)
+    print(f"{'场景':<24} | {'次/秒':>12} | {'单次 µs':>10}")
+    print("-" * 60)
+    results = {}
+    for name, fn in cases:
+        rate = _rate(fn, args.iterations)
+        results[name] = rate
+        print(f"{name:<24} | {rate:>12,.0f} | {1e6 / rate:>10.2f}")
+    print("=" * 60)
+
+    verify_rate = results["校验：有效链接"]
+    if verify_rate < args.target:
+        print(f"❌ 校验吞吐量 {verify_rate:,.0f} 次/秒低于目标")
+        return 1
+    print(f"✅ 校验吞吐量是目标的 {verify_rate / args.target:.0f} 倍")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
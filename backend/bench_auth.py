@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+认证开销微基准脚本
+
+对比 verify_jwt_token 三种路径的单次耗时：
+1. 旧路径：记录诊断日志 + 每次验签（AUTH_DEBUG=true，禁用缓存）
+2. 每次验签但不记录诊断日志（禁用缓存）
+3. 快速路径：命中已验证Token缓存
+
+诊断日志写入 /dev/null，测得的是请求线程的入队开销。
+
+用法：
+    python bench_auth.py
+    python bench_auth.py --iterations 20000
+"""
+import argparse
+import os
+import time
+
+# 基准测试不需要真实配置，填入占位值以便导入 main
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench-service-role-key")
+os.environ.setdefault("SUPABASE_JWT_SECRET", "bench-jwt-secret")
+os.environ.setdefault("ZPAY_MERCHANT_ID", "bench")
+os.environ.setdefault("ZPAY_MERCHANT_KEY", "bench")
+
+import jwt
+from fastapi.security import HTTPAuthorizationCredentials
+
+import main
+import log_config
+
+
+def _make_credentials() -> HTTPAuthorizationCredentials:
+    """生成一个与 Supabase 格式一致的测试Token"""
+    now = int(time.time())
+    token = jwt.encode(
+        {
+            "sub": "00000000-0000-0000-0000-000000000000",
+            "email": "bench@example.com",
+            "aud": "authenticated",
+            "role": "authenticated",
+            "iat": now,
+            "exp": now + 3600
+        },
+        main.SUPABASE_JWT_SECRET,
+        algorithm="HS256"
+    )
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=token)
+
+
+def _measure(credentials: HTTPAuthorizationCredentials, iterations: int, use_cache: bool) -> float:
+    """
+    测量 verify_jwt_token 的平均耗时
+
+    Returns:
+        float: 单次调用平均耗时（微秒）
+    """
+    start = time.perf_counter()
+    for _ in range(iterations):
+        if not use_cache:
+            main.jwt_cache.clear()
+        main.verify_jwt_token(credentials)
+    return (time.perf_counter() - start) / iterations * 1_000_000
+
+
+def run(iterations: int) -> None:
+    credentials = _make_credentials()
+
+    with open(os.devnull, "w") as devnull:
+        for handler in log_config._listener.handlers:
+            handler.setStream(devnull)
+
+        main.AUTH_DEBUG = True
+        legacy_us = _measure(credentials, iterations, use_cache=False)
+
+        main.AUTH_DEBUG = False
+        uncached_us = _measure(credentials, iterations, use_cache=False)
+
+        main.jwt_cache.clear()
+        main.verify_jwt_token(credentials)
+        cached_us = _measure(credentials, iterations, use_cache=True)
+
+        log_config.shutdown_logging()
+
+    print("🚀 认证开销微基准")
+    print(f"   迭代次数: {iterations}")
+    print("=" * 50)
+    print(f"旧路径（诊断日志 + 验签）: {legacy_us:8.2f} µs/请求")
+    print(f"验签（无诊断日志）      : {uncached_us:8.2f} µs/请求")
+    print(f"缓存快速路径            : {cached_us:8.2f} µs/请求")
+    print("=" * 50)
+    print(f"📝 快速路径相比旧路径提速 {legacy_us / cached_us:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="认证开销微基准")
+    parser.add_argument("--iterations", type=int, default=10000)
+    args = parser.parse_args()
+    run(args.iterations)
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Serverless 冷启动导入耗时基准
+
+每轮启动一个全新的 Python 进程，按 Vercel 的方式导入 api/index.py，记录：
+1. 进程启动到应用实例可用的墙钟时间，以及其中 api/index.py 的导入耗时
+2. 其中 fastapi 的导入耗时（同一进程中先单独导入 fastapi 计时），其余为应用自身的导入开销
+3. 导入后是否已经加载了应延迟导入的重量级模块（supabase、postgrest、httpx 等）
+4. 延迟到第一次使用时的开销：创建 Supabase 客户端、创建 ZPay 连接池
+
+再用 python -X importtime 导入一次，按顶层包汇总导入耗时，列出最慢的包。
+fastapi 本身的导入耗时随机器负载在 400–800ms 之间波动，且无法通过本仓库的代码减少，
+所以默认只检查应用自身的开销：超过 --overhead-target-ms 或提前加载了重量级模块时以非 0 状态退出，
+可以放进 CI；需要检查绝对耗时时另传 --target-ms。
+
+参考结果（沙箱环境，7 轮中位数）：导入 fastapi 约 590–770ms，导入 api/index.py 约 700–890ms，
+应用自身开销约 100–130ms；创建 Supabase 客户端（含导入 supabase）约 210–360ms，改为在第一次访问数据库时发生。
+
+用法：
+    python bench_cold_start.py
+    python bench_cold_start.py --runs 10 --overhead-target-ms 200 --target-ms 1000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# 应该在第一次使用时才导入的模块
+DEFERRED_MODULES = ("supabase", "postgrest", "gotrue", "realtime", "storage3", "httpx", "uvicorn", "numpy")
+
+# 子进程：导入入口文件并测量延迟的开销，结果以 JSON 输出到最后一行
+_CHILD = r"""
+import sys, time, json, importlib.util
+started = time.perf_counter()
+import fastapi
+framework = time.perf_counter()
+spec = importlib.util.spec_from_file_location("index", "api/index.py")
+index = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(index)
+imported = time.perf_counter()
+loaded = sorted(name for name in {DEFERRED!r} if name in sys.modules)
+
+database_service = index.main.database_service
+payment_service = index.main.payment_service
+start = time.perf_counter()
+database_service.supabase
+supabase_ms = (time.perf_counter() - start) * 1000
+start = time.perf_counter()
+payment_service.client
+zpay_ms = (time.perf_counter() - start) * 1000
+
+print(json.dumps({{
+    "import_ms": (imported - started) * 1000,
+    "fastapi_ms": (framework - started) * 1000,
+    "overhead_ms": (imported - framework) * 1000,
+    "loaded": loaded,
+    "supabase_ms": supabase_ms,
+    "zpay_client_ms": zpay_ms
+}}))
+"""
+
+
+def _child_env() -> Dict[str, str]:
+    """冷启动测量不需要真实配置，填入占位值，并模拟 Vercel 环境"""
+    env = dict(os.environ)
+    env.setdefault("SUPABASE_URL", "http://localhost:54321")
+    env.setdefault("SUPABASE_SERVICE_ROLE_KEY", "bench-service-role-key")
+    env.setdefault("SUPABASE_JWT_SECRET", "bench-jwt-secret")
+    env.setdefault("ZPAY_MERCHANT_ID", "bench")
+    env.setdefault("ZPAY_MERCHANT_KEY", "bench")
+    env.setdefault("LOG_LEVEL", "ERROR")
+    env["VERCEL"] = "1"
+    return env
+
+
+def _run_once(env: Dict[str, str]) -> Dict[str, float]:
+    code = _CHILD.format(DEFERRED=DEFERRED_MODULES)
+    start = time.perf_counter()
+    output = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    # 墙钟时间只算到应用可用为止，不包括之后测量延迟开销的部分
+    result["process_ms"] = (time.perf_counter() - start) * 1000 - result["supabase_ms"] - result["zpay_client_ms"]
+    return result
+
+
+def _interpreter_ms(env: Dict[str, str]) -> float:
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], env=env, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def _import_profile(env: Dict[str, str], top: int) -> List[tuple]:
+    """按顶层包汇总 -X importtime 的自身耗时（毫秒）"""
+    code = "import importlib.util; spec = importlib.util.spec_from_file_location('index', 'api/index.py'); " \
+           "spec.loader.exec_module(importlib.util.module_from_spec(spec))"
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+    ).stderr
+
+    totals: Dict[str, float] = defaultdict(float)
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|")
+        totals[name.strip().split(".")[0]] += int(self_us) / 1000
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Serverless 冷启动导入耗时基准")
+    parser.add_argument("--runs", type=int, default=7, help="测量轮数（每轮一个新进程）")
+    parser.add_argument("--overhead-target-ms", type=float,
+                        default=float(os.getenv("COLD_START_OVERHEAD_TARGET_MS", "250")),
+                        help="api/index.py 导入耗时减去 fastapi 导入耗时（中位数）的目标（毫秒）")
+    parser.add_argument("--target-ms", type=float,
+                        default=float(os.getenv("COLD_START_TARGET_MS")) if os.getenv("COLD_START_TARGET_MS") else None,
+                        help="api/index.py 导入耗时中位数的绝对目标（毫秒，默认不检查）")
+    parser.add_argument("--top", type=int, default=12, help="导入耗时分析列出的包数")
+    args = parser.parse_args()
+
+    env = _child_env()
+    results = [_run_once(env) for _ in range(args.runs)]
+    import_ms = statistics.median(result["import_ms"] for result in results)
+    fastapi_ms = statistics.median(result["fastapi_ms"] for result in results)
+    overhead_ms = statistics.median(result["overhead_ms"] for result in results)
+    process_ms = statistics.median(result["process_ms"] for result in results)
+    loaded = sorted({name for result in results for name in result["loaded"]})
+
+    target = f"应用自身开销 ≤ {args.overhead_target_ms:.0f}ms"
+    if args.target_ms is not None:
+        target += f"，api/index.py 导入 ≤ {args.target_ms:.0f}ms"
+    print("🚀 Serverless 冷启动导入耗时")
+    print(f"   轮数: {args.runs}, 目标: {target}")
+    print("=" * 60)
+    print(f"   Python 解释器启动:          {_interpreter_ms(env):>8.0f} ms")
+    print(f"   进程启动到应用可用（中位数）: {process_ms:>8.0f} ms")
+    print(f"   api/index.py 导入（中位数）:  {import_ms:>8.0f} ms")
+    print(f"   其中 fastapi 导入（中位数）:  {fastapi_ms:>8.0f} ms")
+    print(f"   应用自身导入开销:            {overhead_ms:>8.0f} ms")
+    print(f"   首次数据库访问创建客户端:    {statistics.median(r['supabase_ms'] for r in results):>8.0f} ms")
+    print(f"   首次 ZPay 请求创建连接池:    {statistics.median(r['zpay_client_ms'] for r in results):>8.0f} ms")
+    print("-" * 60)
+    print(f"{'顶层包':>24} | {'导入耗时 ms':>12}")
+    for package, elapsed in _import_profile(env, args.top):
+        print(f"{package:>24} | {elapsed:>12.1f}")
+    print("=" * 60)
+
+    ok = True
+    if loaded:
+        ok = False
+        print(f"❌ 导入时已加载应延迟导入的模块: {', '.join(loaded)}")
+    if overhead_ms > args.overhead_target_ms:
+        ok = False
+        print(f"❌ 应用自身导入开销 {overhead_ms:.0f}ms 超过目标 {args.overhead_target_ms:.0f}ms")
+    if args.target_ms is not None and import_ms > args.target_ms:
+        ok = False
+        print(f"❌ 导入耗时 {import_ms:.0f}ms 超过目标 {args.target_ms:.0f}ms")
+    if ok:
+        print("✅ 冷启动导入耗时达标")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+DatabaseService 并发压测脚本
+
+使用模拟固定延迟的 Supabase 客户端替身（不访问真实数据库），
+对比「在事件循环中直接调用同步 execute()」与「通过有界线程池执行」两种方式，
+验证吞吐量是否随并发请求数增长，而不是被串行化。
+
+用法：
+    python bench_db_concurrency.py
+    python bench_db_concurrency.py --latency 0.05 --requests 200 --concurrency 1 4 16 32
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from database_service import DatabaseService
+
+
+class _FakeResponse:
+    """模拟 PostgREST 响应"""
+
+    def __init__(self, data):
+        self.data = data
+
+
+class _FakeQuery:
+    """模拟 supabase-py 查询构造器，execute() 同步阻塞固定时长"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def __getattr__(self, name):
+        # select / eq / order / range 等链式调用全部返回自身
+        return lambda *args, **kwargs: self
+
+    def execute(self):
+        time.sleep(self.latency)
+        return _FakeResponse([{"out_trade_no": "BENCH", "status": "pending"}])
+
+
+class _FakeClient:
+    """模拟 Supabase 客户端"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def table(self, name):
+        return _FakeQuery(self.latency)
+
+    def rpc(self, name, params=None):
+        return _FakeQuery(self.latency)
+
+
+async def _run_blocking(client: _FakeClient, total: int, concurrency: int) -> float:
+    """旧实现：在协程中直接调用同步 execute()"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            client.table("orders").select("*").eq("out_trade_no", "BENCH").execute()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start
+
+
+async def _run_executor(service: DatabaseService, total: int, concurrency: int) -> float:
+    """新实现：DatabaseService 通过有界线程池执行"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            await service.get_order_by_trade_no("BENCH")
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="DatabaseService 并发压测")
+    parser.add_argument("--latency", type=float, default=0.02, help="模拟的单次 PostgREST 往返延迟（秒）")
+    parser.add_argument("--requests", type=int, default=200, help="每轮请求总数")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    client = _FakeClient(args.latency)
+    service = DatabaseService(client=client)
+
+    print("🚀 DatabaseService 并发压测")
+    print(f"   模拟延迟: {args.latency * 1000:.0f}ms, 每轮请求: {args.requests}, "
+          f"DB_MAX_WORKERS: {service.max_workers}")
+    print("=" * 60)
+    print(f"{'并发数':>8} | {'阻塞调用 req/s':>16} | {'线程池 req/s':>14} | {'加速比':>8}")
+    print("-" * 60)
+
+    for concurrency in args.concurrency:
+        blocking_elapsed = await _run_blocking(client, args.requests, concurrency)
+        executor_elapsed = await _run_executor(service, args.requests, concurrency)
+        blocking_rps = args.requests / blocking_elapsed
+        executor_rps = args.requests / executor_elapsed
+        print(f"{concurrency:>8} | {blocking_rps:>16.1f} | {executor_rps:>14.1f} | "
+              f"{executor_rps / blocking_rps:>7.1f}x")
+
+    print("=" * 60)
+    print("📝 阻塞调用的吞吐量固定在 1/延迟；线程池的吞吐量随并发数增长，上限为 DB_MAX_WORKERS/延迟")
+    service.close()
+
+
+if __name__ == "__main__":
+    # 压测不需要真实的 Supabase 配置
+    os.environ.setdefault("DB_QUERY_TIMEOUT", "30")
+    asyncio.run(main())
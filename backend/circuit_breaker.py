@@ -0,0 +1,167 @@
+"""
+熔断器 - 上游连续失败时快速拒绝请求，冷却后放行少量探测请求
+
+状态：
+    closed     正常放行；连续失败 failure_threshold 次后进入 open
+    open       直接拒绝（CircuitOpenError，带建议的重试秒数）；经过 recovery_seconds 后进入 half_open
+    half_open  最多同时放行 half_open_max_calls 个探测请求，其余请求继续拒绝；
+               探测成功回到 closed，探测失败重新进入 open 并重新计时
+
+调用方在请求前调用 acquire()，请求结束后调用 release(True/False) 报告上游是否健康；
+请求被取消等无法判断的情况调用 release(None)，只归还探测名额，不改变状态。
+状态只在进程内保存，多 worker 部署时每个进程各自熔断。
+"""
+import time
+import logging
+import threading
+from typing import Any, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """熔断器打开，请求未发出"""
+
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} 熔断中，{retry_after:.1f} 秒后重试")
+        self.name = name
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """连续失败计数熔断器（带半开探测）"""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        recovery_seconds: float = 30.0,
+        half_open_max_calls: int = 1
+    ):
+        """
+        初始化熔断器
+
+        Args:
+            name: 名称（日志和错误信息使用）
+            failure_threshold: 连续失败多少次后打开，0 表示不熔断
+            recovery_seconds: 打开后多久进入半开状态
+            half_open_max_calls: 半开状态下同时放行的探测请求数
+        """
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_seconds = recovery_seconds
+        self.half_open_max_calls = max(1, half_open_max_calls)
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probes = 0
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    def _current_state(self, now: float) -> str:
+        """当前状态（open 超过冷却时间时切换为 half_open；调用方持有锁）"""
+        if self._state == OPEN and now - self._opened_at >= self.recovery_seconds:
+            self._state = HALF_OPEN
+            self._probes = 0
+            logger.info("熔断器进入半开状态", extra={"breaker": self.name})
+        return self._state
+
+    def _retry_after(self, now: float) -> float:
+        """被拒绝的请求建议等待的秒数（调用方持有锁）"""
+        if self._state == OPEN:
+            return max(0.0, self.recovery_seconds - (now - self._opened_at))
+        # 半开状态下探测请求还在进行，探测结果很快就会出来
+        return min(1.0, self.recovery_seconds)
+
+    @property
+    def state(self) -> str:
+        """当前状态"""
+        with self._lock:
+            return self._current_state(time.monotonic())
+
+    def check(self) -> None:
+        """
+        检查是否可能放行（不占用探测名额，用于在做其他准备工作之前提前失败）
+
+        Raises:
+            CircuitOpenError: 熔断器打开，或半开状态下探测名额已满时抛出
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            if state == OPEN or (state == HALF_OPEN and self._probes >= self.half_open_max_calls):
+                self.rejected += 1
+                raise CircuitOpenError(self.name, self._retry_after(now))
+
+    def acquire(self) -> None:
+        """
+        申请发出一次请求（半开状态下占用一个探测名额，之后必须调用 release）
+
+        Raises:
+            CircuitOpenError: 熔断器打开，或半开状态下探测名额已满时抛出
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            if state == CLOSED:
+                return
+            if state == HALF_OPEN and self._probes < self.half_open_max_calls:
+                self._probes += 1
+                return
+            self.rejected += 1
+            raise CircuitOpenError(self.name, self._retry_after(now))
+
+    def release(self, success: Optional[bool]) -> None:
+        """
+        报告一次请求的结果
+
+        Args:
+            success: 上游是否健康；None 表示无法判断（例如请求被取消），只归还探测名额
+        """
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probes = max(0, self._probes - 1)
+            if success is None:
+                return
+            if success:
+                if self._state != CLOSED:
+                    logger.info("熔断器恢复", extra={"breaker": self.name})
+                self._state = CLOSED
+                self._failures = 0
+                return
+
+            self._failures += 1
+            if self._state == HALF_OPEN or (
+                self._state == CLOSED and self.failure_threshold and self._failures >= self.failure_threshold
+            ):
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self.opened += 1
+                logger.warning("熔断器打开", extra={
+                    "breaker": self.name,
+                    "consecutive_failures": self._failures,
+                    "recovery_seconds": self.recovery_seconds
+                })
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取熔断器状态
+
+        Returns:
+            Dict[str, Any]: 状态、连续失败次数、打开次数、拒绝次数和剩余冷却秒数
+        """
+        now = time.monotonic()
+        with self._lock:
+            state = self._current_state(now)
+            return {
+                "state": state,
+                "consecutive_failures": self._failures,
+                "opened": self.opened,
+                "rejected": self.rejected,
+                "retry_after": round(self._retry_after(now), 2) if state != CLOSED else 0.0
+            }
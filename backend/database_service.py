@@ -2,30 +2,183 @@
 数据库服务 - 处理与 Supabase 的交互
 """
 import os
-from typing import Optional, Dict, Any, List
-from datetime import datetime, timedelta
+import asyncio
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Optional, Dict, Any, List, AsyncIterator
+from datetime import datetime, timedelta, timezone
 import uuid
-from supabase import create_client, Client
+from cache import TTLCache
+from audio_catalog import AudioCatalog
+from audio_metadata import AUDIO_METADATA_COLUMNS
+from subscription_plans import PlanRegistry
+from metrics import db_query_duration
 from models import OrderModel, UserMembershipStatus, AudioAccessInfo, CyclePhaseAudioList
+from order_rows import OrderStatusRow, OrderListRow
+from rate_limit import RateLimitDecision
+from utils import encode_order_cursor, decode_order_cursor
+
+if TYPE_CHECKING:
+    from supabase import Client
+
+logger = logging.getLogger(__name__)
+
+# 订单列表支持的总数统计方式（exact 精确计数，estimated 行数较多时使用规划器估算）
+# 取值与 postgrest.types.CountMethod 相同，这里直接使用字符串，导入本模块时不加载 postgrest
+ORDER_COUNT_METHODS = {"exact": "exact", "estimated": "estimated"}
 
 
 class DatabaseService:
     """数据库服务类"""
     
-    def __init__(self):
-        """初始化数据库服务"""
+    def __init__(self, client: Optional["Client"] = None):
+        """
+        初始化数据库服务
+        
+        只读取配置，不导入 supabase、不创建客户端：Supabase 客户端在第一次查询时创建，
+        不访问数据库的请求（以及 Serverless 冷启动）不承担这部分开销
+        
+        Args:
+            client: 可选的 Supabase 客户端（压测或本地替身使用），默认按环境变量创建
+        """
+        # 数据库请求执行器配置：supabase-py 的 execute() 是同步阻塞调用，
+        # 统一放到有界线程池中执行，避免阻塞 uvicorn 事件循环
+        self.max_workers = int(os.getenv("DB_MAX_WORKERS", "16"))
+        self.query_timeout = float(os.getenv("DB_QUERY_TIMEOUT", "10"))
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_workers,
+            thread_name_prefix="supabase"
+        )
+        
+        # 会员状态缓存：会员状态只会因支付或到期而变化，
+        # 条目存活时间不超过会员到期时间，支付成功时主动失效
+        self.membership_cache = TTLCache(
+            max_size=int(os.getenv("MEMBERSHIP_CACHE_SIZE", "10000")),
+            default_ttl=float(os.getenv("MEMBERSHIP_CACHE_TTL", "300"))
+        )
+        # 非会员结果的存活时间：支付成功只失效发放会员的那个进程的缓存，
+        # 其他进程最多在这段时间内仍把刚付款的用户判定为非会员
+        self.membership_negative_ttl = float(os.getenv("MEMBERSHIP_NEGATIVE_CACHE_TTL", "10"))
+        
+        # 已结算订单缓存：ZPay 会重复推送同一笔通知，已结算的 (订单号, 交易号)
+        # 直接应答，不再访问数据库。缓存只是加速，幂等性由 settle_order 的行锁和
+        # 订单号/交易号唯一约束保证，多个 worker 各自缓存也不影响正确性
+        self.settlement_cache = TTLCache(
+            max_size=int(os.getenv("SETTLEMENT_CACHE_SIZE", "10000")),
+            default_ttl=float(os.getenv("SETTLEMENT_CACHE_TTL", "86400"))
+        )
+        
+        # 音频目录快照：分组排序只在刷新时做一次，过期后后台刷新
+        self.audio_catalog = AudioCatalog(
+            self._load_audio_catalog_rows,
+            ttl=float(os.getenv("AUDIO_CATALOG_TTL", "300"))
+        )
+        
+        # 订阅套餐注册表：启动时加载，定期重新读取，价格变化时生成新版本
+        self.plan_registry = PlanRegistry(
+            self._load_subscription_plan_rows,
+            ttl=float(os.getenv("PLAN_REGISTRY_TTL", "60"))
+        )
+        
+        self._supabase: Optional["Client"] = client
+        self._supabase_lock = threading.Lock()
+        if client is not None:
+            return
+        
         # 从环境变量读取 Supabase 配置
         self.supabase_url = os.getenv("SUPABASE_URL")
         self.supabase_service_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
         
         if not self.supabase_url or not self.supabase_service_key:
             raise ValueError("缺少 Supabase 配置信息，请检查环境变量")
+    
+    @property
+    def supabase(self) -> "Client":
+        """
+        获取 Supabase 客户端（首次使用时导入 supabase 并创建，之后复用）
         
-        # 创建 Supabase 客户端
-        self.supabase: Client = create_client(
-            self.supabase_url, 
-            self.supabase_service_key
-        )
+        Returns:
+            Client: Supabase 客户端
+        """
+        if self._supabase is None:
+            with self._supabase_lock:
+                if self._supabase is None:
+                    from supabase import create_client
+                    self._supabase = create_client(
+                        self.supabase_url,
+                        self.supabase_service_key
+                    )
+        return self._supabase
+    
+    async def _execute(
+        self,
+        query,
+        method: str,
+        rpc: str = "",
+        timeout: Optional[float] = None
+    ):
+        """
+        在线程池中执行 PostgREST 请求
+        
+        Args:
+            query: supabase-py 查询构造器（table()/rpc() 的返回值）
+            method: 发起请求的 DatabaseService 方法名（用于指标）
+            rpc: 调用的数据库函数名（非 RPC 请求为空）
+            timeout: 本次调用超时时间（秒），默认使用 DB_QUERY_TIMEOUT
+            
+        Returns:
+            APIResponse: PostgREST 响应
+            
+        Raises:
+            TimeoutError: 排队加执行时间超过超时时间时抛出
+        """
+        timeout = timeout if timeout is not None else self.query_timeout
+        loop = asyncio.get_running_loop()
+        start = time.perf_counter()
+        result = "error"
+        try:
+            future = loop.run_in_executor(self._executor, query.execute)
+            response = await asyncio.wait_for(future, timeout)
+            result = "ok"
+            return response
+        except asyncio.TimeoutError:
+            result = "timeout"
+            raise TimeoutError(f"数据库请求超时（{timeout}s）")
+        finally:
+            db_query_duration.observe(
+                time.perf_counter() - start,
+                method=method, rpc=rpc, result=result
+            )
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计信息
+        
+        Returns:
+            Dict[str, Any]: 各缓存的命中/未命中计数
+        """
+        catalog = self.audio_catalog.snapshot
+        plans = self.plan_registry.snapshot
+        return {
+            "membership": self.membership_cache.stats(),
+            "settlements": self.settlement_cache.stats(),
+            "audio_catalog": {
+                "version": catalog.version if catalog else None,
+                "loaded_at": catalog.loaded_at if catalog else None,
+                "total_audio_count": catalog.total_audio_count if catalog else 0
+            },
+            "subscription_plans": {
+                "version": plans.version if plans else None,
+                "loaded_at": plans.loaded_at if plans else None,
+                "etag": plans.etag if plans else None
+            }
+        }
+    
+    def close(self) -> None:
+        """关闭数据库请求线程池（应用关闭时调用）"""
+        self._executor.shutdown(wait=False, cancel_futures=True)
     
     async def create_order(self, order_data: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -65,7 +218,10 @@ class DatabaseService:
                 })
             
             # 插入订单记录
-            result = self.supabase.table("orders").insert(insert_data).execute()
+            result = await self._execute(
+                self.supabase.table("orders").insert(insert_data),
+                method="create_order"
+            )
             
             if not result.data:
                 raise Exception("订单创建失败：数据库返回空数据")
@@ -110,14 +266,41 @@ class DatabaseService:
             Optional[Dict[str, Any]]: 订单信息，如果不存在返回 None
         """
         try:
-            result = self.supabase.table("orders").select("*").eq("out_trade_no", out_trade_no).execute()
+            result = await self._execute(
+                self.supabase.table("orders").select("*").eq("out_trade_no", out_trade_no),
+                method="get_order_by_trade_no"
+            )
             
             return result.data[0] if result.data else None
             
         except Exception as e:
-            print(f"查询订单失败: {str(e)}")
+            logger.error("查询订单失败", extra={"error": str(e)})
             return None
     
+    async def get_order_status_row(self, out_trade_no: str) -> Optional[OrderStatusRow]:
+        """
+        查询订单状态（只读取状态接口需要的列）
+        
+        Args:
+            out_trade_no: 商户订单号
+            
+        Returns:
+            Optional[OrderStatusRow]: 订单状态行，如果不存在返回 None
+            
+        Raises:
+            Exception: 查询失败
+        """
+        try:
+            result = await self._execute(
+                self.supabase.table("orders").select(*OrderStatusRow.COLUMNS).eq("out_trade_no", out_trade_no),
+                method="get_order_status_row"
+            )
+        except Exception as e:
+            logger.error("查询订单状态失败", extra={"error": str(e)})
+            raise Exception(f"查询订单状态失败: {str(e)}")
+        
+        return OrderStatusRow(result.data[0]) if result.data else None
+    
     async def update_order_payment_info(
         self, 
         out_trade_no: str, 
@@ -149,18 +332,23 @@ class DatabaseService:
             if qr_code is not None:
                 update_data["qr_code"] = qr_code
             
-            result = self.supabase.table("orders").update(update_data).eq("out_trade_no", out_trade_no).execute()
+            result = await self._execute(
+                self.supabase.table("orders").update(update_data).eq("out_trade_no", out_trade_no),
+                method="update_order_payment_info"
+            )
             
             return len(result.data) > 0
             
         except Exception as e:
-            print(f"更新订单支付信息失败: {str(e)}")
+            logger.error("更新订单支付信息失败", extra={"error": str(e)})
             return False
     
     async def update_order_status(self, out_trade_no: str, status: str) -> bool:
         """
         更新订单状态
         
+        只修改订单状态字段；支付成功请使用 settle_order（同时写入会员发放任务）
+        
         Args:
             out_trade_no: 商户订单号
             status: 新状态
@@ -174,119 +362,443 @@ class DatabaseService:
                 "paid_at": datetime.now().isoformat() if status == "paid" else None
             }
             
-            result = self.supabase.table("orders").update(update_data).eq("out_trade_no", out_trade_no).execute()
-            
-            # 如果是订阅订单支付成功，需要更新用户会员状态
-            if status == "paid":
-                await self._handle_subscription_payment_success(out_trade_no)
+            result = await self._execute(
+                self.supabase.table("orders").update(update_data).eq("out_trade_no", out_trade_no),
+                method="update_order_status"
+            )
             
             return len(result.data) > 0
             
         except Exception as e:
-            print(f"更新订单状态失败: {str(e)}")
+            logger.error("更新订单状态失败", extra={"error": str(e)})
             return False
     
-    async def _handle_subscription_payment_success(self, out_trade_no: str) -> bool:
+    async def iter_orders(
+        self,
+        status: str,
+        created_before: datetime,
+        created_after: Optional[datetime] = None,
+        page_size: int = 500,
+        unreconciled_only: bool = False
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        """
+        按页读取指定状态、创建时间在指定范围内的订单（对账使用）
+        
+        按 (created_at, id) 正序游标分页（pending 和未回查的 expired 订单各有部分索引）；
+        遍历过程中订单状态被修改也不会跳过或重复
+        
+        Args:
+            status: 订单状态（pending 或 expired）
+            created_before: 只返回在此时间之前创建的订单
+            created_after: 只返回在此时间之后创建的订单，None 表示不限
+            page_size: 每页数量
+            unreconciled_only: 只返回还没有确认过未支付（reconciled_at 为空）的订单
+            
+        Yields:
+            List[Dict[str, Any]]: 一页订单（id, out_trade_no, amount, created_at）
+        """
+        cutoff = created_before.isoformat()
+        after = None
+        while True:
+            query = (
+                self.supabase.table("orders")
+                .select("id", "out_trade_no", "amount", "created_at")
+                .eq("status", status)
+                .lt("created_at", cutoff)
+            )
+            if created_after is not None:
+                query = query.gt("created_at", created_after.isoformat())
+            if unreconciled_only:
+                query = query.is_("reconciled_at", "null")
+            if after is not None:
+                created_at, order_id = after
+                query = query.or_(
+                    f'created_at.gt."{created_at}",'
+                    f'and(created_at.eq."{created_at}",id.gt.{order_id})'
+                )
+            result = await self._execute(
+                query.order("created_at").order("id").limit(page_size),
+                method="iter_orders"
+            )
+            
+            rows = result.data or []
+            if not rows:
+                return
+            yield rows
+            
+            if len(rows) < page_size:
+                return
+            after = (rows[-1]["created_at"], rows[-1]["id"])
+
+    async def expire_orders(self, out_trade_nos: List[str]) -> int:
         """
-        处理订阅支付成功后的会员状态更新
+        批量把已向 ZPay 确认未支付的待支付订单标记为已过期（单次请求）
+        
+        只更新仍为 pending 的订单，与并发到达的支付通知互不覆盖；
+        同时写入 reconciled_at，对账不再回查这些订单
+        
+        Args:
+            out_trade_nos: 商户订单号列表
+            
+        Returns:
+            int: 实际更新的订单数
+        """
+        if not out_trade_nos:
+            return 0
+        
+        result = await self._execute(
+            self.supabase.table("orders")
+            .update(
+                {"status": "expired", "reconciled_at": datetime.now(timezone.utc).isoformat()},
+                count="exact",
+                returning="minimal"
+            )
+            .in_("out_trade_no", out_trade_nos)
+            .eq("status", "pending"),
+            method="expire_orders"
+        )
+        return result.count or 0
+
+    async def mark_orders_reconciled(self, out_trade_nos: List[str]) -> int:
+        """
+        批量记录过期订单已向 ZPay 确认未支付（单次请求），之后的对账不再回查
+        
+        只更新仍为 expired 的订单
+        
+        Args:
+            out_trade_nos: 商户订单号列表
+            
+        Returns:
+            int: 实际更新的订单数
+        """
+        if not out_trade_nos:
+            return 0
+        
+        result = await self._execute(
+            self.supabase.table("orders")
+            .update({"reconciled_at": datetime.now(timezone.utc).isoformat()}, count="exact", returning="minimal")
+            .in_("out_trade_no", out_trade_nos)
+            .eq("status", "expired"),
+            method="mark_orders_reconciled"
+        )
+        return result.count or 0
+    
+    async def expire_stale_orders(self, older_than_seconds: int, batch_size: int) -> int:
+        """
+        把一批超时未支付的订单标记为已过期（单次 RPC，一个短事务）
+
+        从最老的待支付订单开始，最多更新 batch_size 行；
+        正在结算的订单被跳过，留给下一批
+
+        Args:
+            older_than_seconds: 创建时间超过该秒数的待支付订单视为已放弃
+            batch_size: 本批最多更新的行数
+
+        Returns:
+            int: 本批更新的行数，小于 batch_size 说明已经清理完
+
+        Raises:
+            Exception: 数据库调用失败时抛出异常
+        """
+        result = await self._execute(
+            self.supabase.rpc("expire_stale_orders", {
+                "p_older_than_seconds": older_than_seconds,
+                "p_batch_size": batch_size
+            }),
+            method="expire_stale_orders",
+            rpc="expire_stale_orders"
+        )
+        return int(result.data[0]) if result.data else 0
+
+    async def settle_order(
+        self,
+        out_trade_no: str,
+        amount: float,
+        zpay_trade_no: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        结算支付成功的订单（单次 RPC，数据库事务内完成）
+        
+        调用数据库函数 settle_order：校验金额、订单 pending/failed/expired→paid，订阅订单同时写入
+        会员发放任务（membership_pending=True）。调用方随后通过 OutboxWorker.dispatch 发放会员：
+        后台 worker 运行时唤醒 worker，否则（Serverless）在当前请求中直接调用 grant_membership，
+        失败的任务由 worker 或定时任务 /api/cron/payment-outbox 重试。
+        本进程已结算过的 (订单号, 交易号) 直接返回 already_paid（cached=True），不访问数据库
         
         Args:
             out_trade_no: 商户订单号
+            amount: 通知中的支付金额
+            zpay_trade_no: ZPay 交易号
             
         Returns:
-            bool: 处理是否成功
+            Dict[str, Any]: 结算结果，outcome 为 paid / already_paid / not_found /
+                amount_mismatch / invalid_status 之一
+            
+        Raises:
+            Exception: 数据库调用失败时抛出异常
         """
+        cache_key = (out_trade_no, zpay_trade_no or "")
+        cached = self.settlement_cache.get(cache_key)
+        if cached is not None:
+            return {**cached, "outcome": "already_paid", "cached": True}
+        
         try:
-            # 获取订单信息
-            order = await self.get_order_by_trade_no(out_trade_no)
-            if not order or order.get("order_type") != "subscription":
-                return True  # 不是订阅订单，无需处理
-            
-            user_id = order["user_id"]
-            subscription_type = order["subscription_type"]
-            subscription_duration_days = order.get("subscription_duration_days")
-            
-            # 计算会员到期时间
-            now = datetime.now()
-            
-            # 获取当前用户会员状态
-            current_membership = await self.get_user_membership_status(user_id)
-            
-            if subscription_type == "lifetime":
-                # 永久会员
-                membership_data = {
-                    "user_id": user_id,
-                    "membership_type": subscription_type,
-                    "membership_expires_at": None,
-                    "is_lifetime_member": True,
-                    "membership_started_at": now.isoformat(),
-                    "last_subscription_order_id": order["id"]
-                }
-            else:
-                # 计算新的到期时间
-                if current_membership and current_membership.get("membership_expires_at"):
-                    # 如果用户已有会员，从当前到期时间开始延期
-                    try:
-                        current_expires = datetime.fromisoformat(current_membership["membership_expires_at"].replace('Z', '+00:00'))
-                        if current_expires > now:
-                            # 当前会员还未到期，延期
-                            new_expires_at = current_expires + timedelta(days=subscription_duration_days)
-                        else:
-                            # 当前会员已到期，从现在开始
-                            new_expires_at = now + timedelta(days=subscription_duration_days)
-                    except:
-                        # 解析时间失败，从现在开始
-                        new_expires_at = now + timedelta(days=subscription_duration_days)
-                else:
-                    # 新会员，从现在开始
-                    new_expires_at = now + timedelta(days=subscription_duration_days)
-                
-                membership_data = {
-                    "user_id": user_id,
-                    "membership_type": subscription_type,
-                    "membership_expires_at": new_expires_at.isoformat(),
-                    "is_lifetime_member": False,
-                    "membership_started_at": current_membership.get("membership_started_at") or now.isoformat(),
-                    "last_subscription_order_id": order["id"]
-                }
-            
-            # 使用 upsert 更新或插入会员信息
-            result = self.supabase.table("user_memberships").upsert(
-                membership_data,
-                on_conflict="user_id"
-            ).execute()
-            
-            print(f"用户 {user_id} 会员状态更新成功: {subscription_type}")
-            return len(result.data) > 0
+            result = await self._execute(
+                self.supabase.rpc("settle_order", {
+                    "p_out_trade_no": out_trade_no,
+                    "p_amount": amount,
+                    "p_zpay_trade_no": zpay_trade_no
+                }),
+                method="settle_order",
+                rpc="settle_order"
+            )
+            
+            settlement = result.data[0] if result.data else None
+            if not settlement or "outcome" not in settlement:
+                raise Exception("数据库返回空数据")
+            
+            # 记录已结算订单，之后的重复通知直接应答
+            if settlement["outcome"] in ("paid", "already_paid"):
+                self.settlement_cache.set(cache_key, {
+                    "order_id": settlement.get("order_id"),
+                    "user_id": settlement.get("user_id"),
+                    "order_type": settlement.get("order_type"),
+                    "subscription_type": settlement.get("subscription_type"),
+                    "order_status": "paid"
+                })
+            
+            return settlement
             
         except Exception as e:
-            print(f"处理订阅支付成功失败: {str(e)}")
-            return False
+            raise Exception(f"结算订单失败: {str(e)}")
     
-    async def get_user_membership_status(self, user_id: str) -> Optional[Dict[str, Any]]:
+    async def take_rate_limit_token(
+        self,
+        key: str,
+        capacity: float,
+        refill_per_second: float
+    ) -> RateLimitDecision:
+        """
+        从共享令牌桶中取一个令牌（单次 RPC）
+        
+        Args:
+            key: 桶的键
+            capacity: 桶容量
+            refill_per_second: 每秒补充的令牌数
+            
+        Returns:
+            RateLimitDecision: 是否放行和需要等待的秒数
+            
+        Raises:
+            Exception: 数据库调用失败时抛出异常
+        """
+        result = await self._execute(
+            self.supabase.rpc("rate_limit_take", {
+                "p_key": key,
+                "p_capacity": capacity,
+                "p_refill_per_second": refill_per_second
+            }),
+            method="take_rate_limit_token",
+            rpc="rate_limit_take"
+        )
+        row = result.data[0]
+        return RateLimitDecision(bool(row["allowed"]), float(row["retry_after"] or 0))
+    
+    async def grant_membership(self, order_id: str) -> Dict[str, Any]:
+        """
+        为已支付的订阅订单发放或延长会员（幂等）
+        
+        由 OutboxWorker 调用：处理队列中的发放任务，或在后台 worker 未运行时
+        由 dispatch() 在支付通知请求中直接调用；重复调用返回 already_granted
+        
+        Args:
+            order_id: 订单ID
+            
+        Returns:
+            Dict[str, Any]: 发放结果，outcome 为 granted / already_granted / skipped 之一
+            
+        Raises:
+            Exception: 数据库调用失败时抛出异常
+        """
+        result = await self._execute(
+            self.supabase.rpc("grant_membership", {"p_order_id": order_id}),
+            method="grant_membership",
+            rpc="grant_membership"
+        )
+        grant = result.data[0] if result.data else None
+        if not grant or "outcome" not in grant:
+            raise Exception("数据库返回空数据")
+        
+        # 会员信息已变更，立即失效缓存
+        if grant["outcome"] == "granted" and grant.get("user_id"):
+            self.membership_cache.invalidate(grant["user_id"])
+        
+        return grant
+    
+    async def claim_outbox_batch(self, limit: int, lease_seconds: int) -> List[Dict[str, Any]]:
+        """
+        领取一批到期的支付后续任务
+        
+        Args:
+            limit: 最多领取的任务数
+            lease_seconds: 租约时长（秒），到期未完成的任务会被重新领取
+            
+        Returns:
+            List[Dict[str, Any]]: payment_outbox 行（attempts 已包含本次）
+        """
+        result = await self._execute(
+            self.supabase.rpc("claim_payment_outbox", {"p_limit": limit, "p_lease_seconds": lease_seconds}),
+            method="claim_outbox_batch",
+            rpc="claim_payment_outbox"
+        )
+        return result.data or []
+    
+    async def complete_outbox(self, ids: List[int]) -> None:
+        """
+        批量标记支付后续任务完成
+        
+        Args:
+            ids: 任务ID列表
+        """
+        await self._execute(
+            self.supabase.rpc("complete_payment_outbox", {"p_ids": ids}),
+            method="complete_outbox",
+            rpc="complete_payment_outbox"
+        )
+    
+    async def fail_outbox(self, task_id: int, error: str, retry_seconds: int, max_attempts: int) -> Optional[Dict[str, Any]]:
+        """
+        记录支付后续任务失败
+        
+        Args:
+            task_id: 任务ID
+            error: 错误信息
+            retry_seconds: 下次重试前的等待时间（秒）
+            max_attempts: 最大尝试次数，达到后任务标记为 dead
+            
+        Returns:
+            Optional[Dict[str, Any]]: 更新后的任务行
+        """
+        result = await self._execute(
+            self.supabase.rpc("fail_payment_outbox", {
+                "p_id": task_id,
+                "p_error": error,
+                "p_retry_seconds": retry_seconds,
+                "p_max_attempts": max_attempts
+            }),
+            method="fail_outbox",
+            rpc="fail_payment_outbox"
+        )
+        return result.data[0] if result.data else None
+    
+    def _membership_cache_ttl(self, membership_status: Optional[Dict[str, Any]]) -> float:
+        """
+        计算会员状态缓存的存活时间
+        
+        有到期时间的会员，缓存不能晚于到期时间失效，否则到期后仍会被判定为会员；
+        非会员只短时间缓存，其他进程发放会员后很快生效
+        
+        Args:
+            membership_status: check_user_membership_status 返回的会员状态
+            
+        Returns:
+            float: 存活时间（秒）
+        """
+        ttl = self.membership_cache.default_ttl
+        if not (membership_status and membership_status.get("is_member")):
+            return min(ttl, self.membership_negative_ttl)
+        
+        expires_at = membership_status.get("expires_at")
+        if expires_at:
+            try:
+                expires = datetime.fromisoformat(str(expires_at).replace('Z', '+00:00'))
+                if expires.tzinfo is None:
+                    seconds_left = (expires - datetime.now()).total_seconds()
+                else:
+                    seconds_left = (expires - datetime.now(expires.tzinfo)).total_seconds()
+                ttl = min(ttl, seconds_left)
+            except ValueError:
+                # 解析时间失败，不缓存
+                return 0
+        
+        return ttl
+    
+    async def get_user_membership_status(self, user_id: str, use_cache: bool = True) -> Optional[Dict[str, Any]]:
         """
         获取用户会员状态
         
         Args:
             user_id: 用户ID
+            use_cache: 是否使用会员状态缓存
             
         Returns:
             Optional[Dict[str, Any]]: 用户会员状态
         """
+        if use_cache:
+            cached = self.membership_cache.get(user_id)
+            if cached is not None:
+                return cached
+        
         try:
             # 调用数据库函数检查会员状态
-            result = self.supabase.rpc("check_user_membership_status", {"user_uuid": user_id}).execute()
-            
-            return result.data[0] if result.data else None
+            result = await self._execute(
+                self.supabase.rpc("check_user_membership_status", {"user_uuid": user_id}),
+                method="get_user_membership_status",
+                rpc="check_user_membership_status"
+            )
+            
+            membership_status = result.data[0] if result.data else None
+            if membership_status is not None:
+                self.membership_cache.set(
+                    user_id,
+                    membership_status,
+                    ttl=self._membership_cache_ttl(membership_status)
+                )
+            
+            return membership_status
             
         except Exception as e:
-            print(f"获取用户会员状态失败: {str(e)}")
+            logger.error("获取用户会员状态失败", extra={"error": str(e)})
             return None
     
+    async def _load_audio_catalog_rows(self) -> List[Dict[str, Any]]:
+        """
+        读取完整的音频目录（供目录快照使用）
+        
+        Returns:
+            List[Dict[str, Any]]: 按周期阶段和显示顺序排序的音频行
+        """
+        audio_result = await self._execute(
+            self.supabase.table("audio_access_control").select("*").order("cycle_phase, display_order"),
+            method="_load_audio_catalog_rows"
+        )
+        return audio_result.data or []
+    
+    async def _load_subscription_plan_rows(self) -> List[Dict[str, Any]]:
+        """
+        读取启用的订阅套餐（供套餐注册表使用）
+        
+        Returns:
+            List[Dict[str, Any]]: 按显示顺序排序的套餐行
+        """
+        result = await self._execute(
+            self.supabase.table("subscription_plans")
+            .select(
+                "plan_type", "name", "price", "duration_days", "description",
+                "features", "savings", "display_order", "updated_at"
+            )
+            .eq("is_active", True)
+            .order("display_order"),
+            method="_load_subscription_plan_rows"
+        )
+        return result.data or []
+    
     async def get_user_audio_access(self, user_id: str) -> Dict[str, Any]:
         """
         获取用户音频访问权限信息
         
+        音频目录来自预先分组的快照，请求时只根据会员状态选取对应的可访问标记
+        
         Args:
             user_id: 用户ID
             
@@ -298,85 +810,39 @@ class DatabaseService:
             membership_status = await self.get_user_membership_status(user_id)
             is_member = membership_status.get("is_member", False) if membership_status else False
             
-            # 获取所有音频列表
-            audio_result = self.supabase.table("audio_access_control").select("*").order("cycle_phase, display_order").execute()
-            
-            if not audio_result.data:
-                return {
-                    "user_membership": membership_status or {"is_member": False, "membership_type": "free"},
-                    "audio_phases": [],
-                    "total_accessible_count": 0,
-                    "total_audio_count": 0
-                }
-            
-            # 按周期阶段分组音频
-            phase_map = {
-                "menstrual": "月经期",
-                "follicular": "卵泡期", 
-                "ovulation": "排卵期",
-                "luteal": "黄体期"
+            # 获取音频目录快照
+            catalog = await self.audio_catalog.get()
+            
+            # 数据库函数返回 expires_at 且不含 user_id，转换成 UserMembershipStatus 的字段
+            membership_status = membership_status or {}
+            user_membership = {
+                "user_id": user_id,
+                "is_member": is_member,
+                "membership_type": membership_status.get("membership_type", "free"),
+                "membership_expires_at": membership_status.get("expires_at"),
+                "days_remaining": membership_status.get("days_remaining", 0),
+                "is_lifetime_member": membership_status.get("membership_type") == "lifetime"
             }
             
-            phases_data = {}
-            total_accessible_count = 0
-            total_audio_count = len(audio_result.data)
-            
-            for audio in audio_result.data:
-                phase = audio["cycle_phase"]
-                if phase not in phases_data:
-                    phases_data[phase] = {
-                        "cycle_phase": phase,
-                        "phase_display_name": phase_map.get(phase, phase),
-                        "audios": [],
-                        "free_audio_count": 0,
-                        "total_audio_count": 0
-                    }
-                
-                # 判断用户是否可以访问此音频
-                is_accessible = audio["is_free"] or is_member
-                if is_accessible:
-                    total_accessible_count += 1
-                
-                if audio["is_free"]:
-                    phases_data[phase]["free_audio_count"] += 1
-                
-                phases_data[phase]["audios"].append({
-                    "audio_name": audio["audio_name"],
-                    "audio_display_name": audio["audio_display_name"],
-                    "cycle_phase": audio["cycle_phase"],
-                    "is_free": audio["is_free"],
-                    "is_accessible": is_accessible,
-                    "display_order": audio["display_order"],
-                    "description": audio.get("description"),
-                    "duration_seconds": audio.get("duration_seconds")
-                })
-                phases_data[phase]["total_audio_count"] += 1
-            
-            # 转换为列表格式
-            audio_phases = list(phases_data.values())
-            
             return {
-                "user_membership": membership_status or {
-                    "user_id": user_id,
-                    "is_member": False, 
-                    "membership_type": "free",
-                    "membership_expires_at": None,
-                    "days_remaining": 0,
-                    "is_lifetime_member": False
-                },
-                "audio_phases": audio_phases,
-                "total_accessible_count": total_accessible_count,
-                "total_audio_count": total_audio_count
+                "user_membership": user_membership,
+                "audio_phases": catalog.phases_for(is_member),
+                "total_accessible_count": catalog.accessible_count(is_member),
+                "total_audio_count": catalog.total_audio_count
             }
             
         except Exception as e:
-            print(f"获取用户音频访问权限失败: {str(e)}")
+            logger.error("获取用户音频访问权限失败", extra={"error": str(e)})
             raise Exception(f"获取音频访问权限失败: {str(e)}")
     
     async def check_audio_access_permission(self, user_id: str, audio_name: str) -> bool:
         """
         检查用户对特定音频的访问权限
         
+        与数据库函数 check_audio_access_permission 的规则相同（免费音频所有人可听，
+        付费音频仅会员可听，不在目录中的音频不可访问），但音频目录来自内存快照、
+        会员状态来自会员缓存，大多数请求不访问数据库
+        
         Args:
             user_id: 用户ID
             audio_name: 音频文件名
@@ -385,35 +851,153 @@ class DatabaseService:
             bool: 是否有访问权限
         """
         try:
-            # 调用数据库函数检查访问权限
-            result = self.supabase.rpc(
-                "check_audio_access_permission", 
-                {"user_uuid": user_id, "audio_file_name": audio_name}
-            ).execute()
+            catalog = await self.audio_catalog.get()
+            is_free = catalog.is_free(audio_name)
+            if is_free is None:
+                return False
+            if is_free:
+                return True
             
-            return result.data[0] if result.data else False
+            membership_status = await self.get_user_membership_status(user_id)
+            return bool(membership_status and membership_status.get("is_member"))
             
         except Exception as e:
-            print(f"检查音频访问权限失败: {str(e)}")
+            logger.error("检查音频访问权限失败", extra={"error": str(e)})
             return False
     
-    async def get_user_orders(self, user_id: str, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
+    async def get_accessible_audio_names(self, user_id: Optional[str]) -> List[str]:
         """
-        获取用户订单列表
+        获取用户可以访问的音频文件名（签发音频链接使用）
+        
+        Args:
+            user_id: 用户ID，未登录的访客为 None（只能访问免费音频）
+            
+        Returns:
+            List[str]: 按周期阶段和显示顺序排列的音频文件名
+        """
+        is_member = False
+        if user_id is not None:
+            membership_status = await self.get_user_membership_status(user_id)
+            is_member = bool(membership_status and membership_status.get("is_member"))
+        catalog = await self.audio_catalog.get()
+        return [
+            audio["audio_name"]
+            for phase in catalog.phases_for(is_member)
+            for audio in phase["audios"]
+            if audio["is_accessible"]
+        ]
+    
+    async def get_audio_metadata_rows(self) -> List[Dict[str, Any]]:
+        """
+        读取目录中每个音频当前的元数据（索引命令比较变化使用）
+        
+        Returns:
+            List[Dict[str, Any]]: audio_name 和 AUDIO_METADATA_COLUMNS 字段
+        """
+        result = await self._execute(
+            self.supabase.table("audio_access_control").select("audio_name", *AUDIO_METADATA_COLUMNS),
+            method="get_audio_metadata_rows"
+        )
+        return result.data or []
+    
+    async def update_audio_metadata(self, rows: List[Dict[str, Any]]) -> int:
+        """
+        批量更新音频元数据（单次 RPC）
+        
+        数据库函数只更新值确有变化的行，目录中不存在的音频忽略
+        
+        Args:
+            rows: audio_name 和 AUDIO_METADATA_COLUMNS 字段
+            
+        Returns:
+            int: 实际更新的行数
+            
+        Raises:
+            Exception: 数据库调用失败时抛出异常
+        """
+        if not rows:
+            return 0
+        
+        result = await self._execute(
+            self.supabase.rpc("update_audio_metadata", {"p_rows": rows}),
+            method="update_audio_metadata",
+            rpc="update_audio_metadata"
+        )
+        updated = int(result.data[0]) if result.data else 0
+        if updated:
+            self.audio_catalog.invalidate()
+        return updated
+    
+    async def get_user_orders(
+        self,
+        user_id: str,
+        limit: int = 20,
+        cursor: Optional[str] = None,
+        count: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        获取用户订单列表（按 created_at, id 倒序的游标分页）
+        
+        每页都从 (user_id, created_at, id) 索引上的游标位置开始读取，
+        翻页深度不影响查询耗时
         
         Args:
             user_id: 用户ID
             limit: 每页数量
-            offset: 偏移量
+            cursor: 上一页返回的 next_cursor，为空时从第一页开始
+            count: 总数统计方式（exact / estimated），为空时不统计
             
         Returns:
-            List[Dict[str, Any]]: 订单列表
+            Dict[str, Any]: orders（OrderListRow 列表）、next_cursor（没有下一页时为 None）、total
+            
+        Raises:
+            ValueError: 游标或统计方式无效
         """
+        after = decode_order_cursor(cursor) if cursor else None
+        if count is not None and count not in ORDER_COUNT_METHODS:
+            raise ValueError(f"不支持的统计方式: {count}")
+        
         try:
-            result = self.supabase.table("orders").select("*").eq("user_id", user_id).order("created_at", desc=True).range(offset, offset + limit - 1).execute()
-            
-            return result.data or []
+            # 多取一行用于判断是否还有下一页
+            query = (
+                self.supabase.table("orders")
+                .select(*OrderListRow.COLUMNS)
+                .eq("user_id", user_id)
+            )
+            if after is not None:
+                created_at, order_id = after
+                query = query.or_(
+                    f'created_at.lt."{created_at}",'
+                    f'and(created_at.eq."{created_at}",id.lt.{order_id})'
+                )
+            query = query.order("created_at", desc=True).order("id", desc=True).limit(limit + 1)
+            
+            page_task = self._execute(query, method="get_user_orders")
+            if count is None:
+                result = await page_task
+                total = None
+            else:
+                # 总数统计不带游标条件，与分页查询并发执行
+                count_query = (
+                    self.supabase.table("orders")
+                    .select("id", count=ORDER_COUNT_METHODS[count], head=True)
+                    .eq("user_id", user_id)
+                )
+                result, count_result = await asyncio.gather(
+                    page_task,
+                    self._execute(count_query, method="count_user_orders")
+                )
+                total = count_result.count
+            
+            rows = result.data or []
+            next_cursor = None
+            if len(rows) > limit:
+                rows = rows[:limit]
+                next_cursor = encode_order_cursor(rows[-1]["created_at"], rows[-1]["id"])
+            orders = [OrderListRow(row) for row in rows]
+            
+            return {"orders": orders, "next_cursor": next_cursor, "total": total}
             
         except Exception as e:
-            print(f"获取用户订单列表失败: {str(e)}")
-            return [] 
\ No newline at end of file
+            logger.error("获取用户订单列表失败", extra={"error": str(e)})
+            raise Exception(f"获取订单列表失败: {str(e)}")
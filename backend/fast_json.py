@@ -0,0 +1,39 @@
+"""
+JSON 序列化 - 热点接口直接输出 JSON 字节
+
+安装了 orjson 时使用 orjson，否则回退到标准库 json。
+接口返回 FastJSONResponse 时跳过 FastAPI 的 jsonable_encoder 逐字段转换。
+"""
+import json
+from typing import Any
+
+from fastapi.responses import Response
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - 可选依赖
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """
+    把对象序列化为 UTF-8 编码的 JSON
+
+    Args:
+        content: 由 dict / list / str / 数字 / None 组成的对象
+
+    Returns:
+        bytes: 紧凑格式的 JSON
+    """
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    """使用 dumps 序列化的 JSON 响应"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
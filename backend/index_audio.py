@@ -0,0 +1,182 @@
+"""
+音频元数据索引 - 为 audio_access_control 填写时长、码率和内容摘要
+
+扫描音频目录中目录表登记过的文件（多进程，每个文件只读取一遍，解析帧头不解码，见 audio_metadata.py），
+与表中已有的值比较，只把有变化的行通过一次 update_audio_metadata RPC 提交。
+文件没有变化时重复运行不会产生任何数据库写入，可以放在部署流程或定时任务中。
+
+用法：
+    python index_audio.py
+    python index_audio.py --source /srv/audio --jobs 4 --dry-run
+"""
+import os
+import time
+import asyncio
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Optional
+
+from audio_files import AudioFileStore
+from audio_metadata import AUDIO_METADATA_COLUMNS, scan_file
+
+logger = logging.getLogger(__name__)
+
+
+def metadata_row(scan: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    把 scan_file 的结果转换成 audio_access_control 的字段
+
+    Args:
+        scan: scan_file 的返回值
+
+    Returns:
+        Dict[str, Any]: audio_name 和 AUDIO_METADATA_COLUMNS 字段
+    """
+    info = scan["info"] or {}
+    duration = info.get("duration_seconds")
+    return {
+        "audio_name": scan["audio_name"],
+        "duration_seconds": round(duration) if duration is not None else None,
+        "file_size_bytes": scan["file_size_bytes"],
+        "bitrate_kbps": info.get("bitrate_kbps"),
+        "sample_rate": info.get("sample_rate"),
+        "channels": info.get("channels"),
+        "codec": info.get("codec"),
+        "content_sha256": scan["content_sha256"]
+    }
+
+
+class AudioIndexer:
+    """音频元数据索引"""
+
+    def __init__(self, database_service, audio_files: AudioFileStore, jobs: Optional[int] = None, dry_run: bool = False):
+        """
+        初始化索引任务
+
+        Args:
+            database_service: DatabaseService 实例
+            audio_files: 音频文件目录
+            jobs: 扫描进程数，默认为 CPU 核数
+            dry_run: 只扫描和比较，不写入数据库
+        """
+        self.database_service = database_service
+        self.audio_files = audio_files
+        self.jobs = jobs or os.cpu_count() or 1
+        self.dry_run = dry_run
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        扫描音频并更新有变化的行
+
+        Returns:
+            Dict[str, Any]: 扫描和更新统计
+        """
+        started = time.perf_counter()
+        existing = {row["audio_name"]: row for row in await self.database_service.get_audio_metadata_rows()}
+
+        paths = []
+        missing = []
+        for audio_name in existing:
+            audio_file = self.audio_files.resolve(audio_name)
+            if audio_file is None:
+                missing.append(audio_name)
+            else:
+                paths.append(audio_file.path)
+        untracked = sorted(
+            name for name in os.listdir(self.audio_files.directory)
+            if name not in existing and self.audio_files.resolve(name) is not None
+        )
+
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=min(self.jobs, max(1, len(paths)))) as pool:
+            scans = await asyncio.gather(*(loop.run_in_executor(pool, scan_file, path) for path in paths))
+        scan_seconds = time.perf_counter() - started
+
+        rows = [metadata_row(scan) for scan in scans]
+        changed = [
+            row for row in rows
+            if any(existing[row["audio_name"]].get(column) != row[column] for column in AUDIO_METADATA_COLUMNS)
+        ]
+        updated = 0
+        if changed and not self.dry_run:
+            updated = await self.database_service.update_audio_metadata(changed)
+
+        total_bytes = sum(scan["file_size_bytes"] for scan in scans)
+        summary = {
+            "scanned": len(scans),
+            "changed": len(changed),
+            "updated": updated,
+            "unrecognized": sorted(row["audio_name"] for row in rows if row["codec"] is None),
+            "missing": sorted(missing),
+            "untracked": untracked,
+            "bytes": total_bytes,
+            "elapsed_seconds": round(time.perf_counter() - started, 3),
+            "megabytes_per_second": round(total_bytes / 1024 / 1024 / scan_seconds, 1) if scan_seconds else None,
+            "rows": rows
+        }
+        logger.info("音频元数据索引完成", extra={
+            key: value for key, value in summary.items() if key != "rows"
+        })
+        return summary
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    from database_service import DatabaseService
+
+    database_service = DatabaseService()
+    try:
+        indexer = AudioIndexer(
+            database_service,
+            AudioFileStore(args.source),
+            jobs=args.jobs,
+            dry_run=args.dry_run
+        )
+        return await indexer.run()
+    finally:
+        database_service.close()
+
+
+def _print_summary(summary: Dict[str, Any]) -> None:
+    print("=" * 88)
+    print(f"{'音频':<24} | {'格式':>5} | {'时长':>6} | {'码率':>8} | {'采样率':>7} | {'声道':>4} | SHA-256")
+    print("-" * 88)
+    for row in summary["rows"]:
+        print(
+            f"{row['audio_name']:<24} | {row['codec'] or '-':>5} | {row['duration_seconds'] or '-':>5}s | "
+            f"{row['bitrate_kbps'] or '-':>5}kbps | {row['sample_rate'] or '-':>7} | {row['channels'] or '-':>4} | "
+            f"{row['content_sha256'][:12]}"
+        )
+    print("=" * 88)
+    print(
+        f"扫描 {summary['scanned']} 个文件（{summary['bytes'] / 1024 / 1024:.1f}MB，"
+        f"{summary['megabytes_per_second']}MB/s），有变化 {summary['changed']} 行，"
+        f"已更新 {summary['updated']} 行；耗时 {summary['elapsed_seconds']}s"
+    )
+    if summary["unrecognized"]:
+        print(f"⚠️  无法识别格式: {', '.join(summary['unrecognized'])}")
+    if summary["missing"]:
+        print(f"⚠️  目录表中有但文件不存在: {', '.join(summary['missing'])}")
+    if summary["untracked"]:
+        print(f"⚠️  文件存在但未在目录表中登记: {', '.join(summary['untracked'])}")
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from log_config import setup_logging, shutdown_logging
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="为 audio_access_control 填写音频元数据")
+    parser.add_argument("--source", default=None, help="音频目录，默认 AUDIO_FILES_DIR 或 backend/media/audio")
+    parser.add_argument("--jobs", type=int, default=None, help="扫描进程数，默认为 CPU 核数")
+    parser.add_argument("--dry-run", action="store_true", help="只扫描和比较，不写入数据库")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        summary = asyncio.run(_main(args))
+    finally:
+        shutdown_logging()
+
+    _print_summary(summary)
@@ -0,0 +1,6 @@
+"""
+本地压测工具
+
+在单机上启动 Supabase(PostgREST) 替身、ZPay mapi.php 替身和后端应用，
+按真实流量组合压测并输出各路由的延迟分位数和吞吐量。
+"""
@@ -0,0 +1,610 @@
+"""
+Supabase(PostgREST) 本地替身
+
+实现 supabase-py 用到的 PostgREST 子集（内存存储）：
+- GET/HEAD/POST/PATCH/DELETE /rest/v1/{table}：eq/neq/gt/gte/lt/lte/is/in 过滤、or 条件、
+  order、limit/offset、select 列投影、Prefer: count=exact、upsert（on_conflict）
+- POST /rest/v1/rpc/{function}：后端调用的数据库函数的 Python 实现（含支付后续任务队列）
+
+启动：
+    uvicorn loadtest.fake_supabase:app --port 54321
+环境变量：
+    FAKE_DB_LATENCY_MS: 每个请求额外的模拟网络延迟（毫秒，默认 5）
+"""
+import asyncio
+import os
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, Response
+
+
+app = FastAPI(title="Fake Supabase")
+
+LATENCY_SECONDS = float(os.getenv("FAKE_DB_LATENCY_MS", "5")) / 1000
+
+# 各表的唯一键（用于 insert 冲突检测和 upsert）
+UNIQUE_KEYS = {
+    "orders": ["out_trade_no"],
+    "user_memberships": ["user_id"],
+    "audio_access_control": ["audio_name"],
+    "subscription_plans": ["plan_type"]
+}
+
+TABLES: Dict[str, List[Dict[str, Any]]] = {
+    "orders": [],
+    "user_memberships": [],
+    "audio_access_control": [],
+    "subscription_plans": [],
+    "payment_outbox": []
+}
+
+_OUTBOX_SEQUENCE = 0
+
+# rate_limit_take 的令牌桶：键 → [令牌数, 更新时间]
+_RATE_LIMIT_BUCKETS: Dict[str, List[float]] = {}
+
+# 与 COMPLETE_DATABASE_INIT.sql 的 audio_access_control 初始数据相同（字段也与表定义一致）
+_AUDIO_SEED = [
+    ("yaolan_chaoxi.mp3", "摇篮潮汐", "menstrual", "free", 1, "月经期的舒缓音频，免费用户可听"),
+    ("fenying_wenquan.mp3", "温泉芬影", "menstrual", "paid", 2, "月经期的高级音频，付费用户专享"),
+    ("yueguang_paoyu.mp3", "月光泡浴", "follicular", "free", 1, "卵泡期的舒缓音频，免费用户可听"),
+    ("yinguang_senlin.mp3", "银光森林", "follicular", "paid", 2, "卵泡期的高级音频，付费用户专享"),
+    ("yinhe_fengqin.mp3", "银河风琴", "follicular", "paid", 3, "卵泡期的高级音频，付费用户专享"),
+    ("rongrong_yuesheng.mp3", "茸茸月声", "ovulation", "free", 1, "排卵期的舒缓音频，免费用户可听"),
+    ("xingji_shuilong.mp3", "星际水龙", "ovulation", "paid", 2, "排卵期的高级音频，付费用户专享"),
+    ("yekong_simiao.mp3", "梦海深潜", "luteal", "free", 1, "黄体期的舒缓音频，免费用户可听"),
+    ("taixian_zhengqi.mp3", "太虚正气", "luteal", "paid", 2, "黄体期的高级音频，付费用户专享"),
+    ("qiudao_zhiye.mp3", "丘岛之夜", "luteal", "paid", 3, "黄体期的高级音频，付费用户专享"),
+    ("xuedi_maobu.mp3", "雪地茅铺", "luteal", "paid", 4, "黄体期的高级音频，付费用户专享"),
+    ("yueyun_ruanyu.mp3", "月云软语", "luteal", "paid", 5, "黄体期的高级音频，付费用户专享")
+]
+
+for _name, _title, _phase, _access_level, _order, _description in _AUDIO_SEED:
+    TABLES["audio_access_control"].append({
+        "id": str(uuid.uuid4()),
+        "audio_name": _name,
+        "audio_title": _title,
+        "cycle_phase": _phase,
+        "access_level": _access_level,
+        "display_order": _order,
+        "description": _description,
+        "duration_seconds": None,
+        "file_size_bytes": None,
+        "bitrate_kbps": None,
+        "sample_rate": None,
+        "channels": None,
+        "codec": None,
+        "content_sha256": None,
+        "metadata_indexed_at": None,
+        "created_at": datetime.now(timezone.utc).isoformat()
+    })
+
+
+_PLAN_SEED = [
+    ("monthly_3", "HERHZZZ 3个月会员", 29.99, 90, 1),
+    ("yearly", "HERHZZZ 1年会员", 99.99, 365, 2),
+    ("lifetime", "HERHZZZ 永久会员", 299.99, None, 3)
+]
+
+for _plan_type, _name, _price, _days, _order in _PLAN_SEED:
+    TABLES["subscription_plans"].append({
+        "plan_type": _plan_type,
+        "name": _name,
+        "price": _price,
+        "duration_days": _days,
+        "description": None,
+        "features": [],
+        "savings": None,
+        "display_order": _order,
+        "is_active": True,
+        "updated_at": "2025-01-01T00:00:00+00:00"
+    })
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _parse_time(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+# ===== 过滤条件 =====
+
+def _coerce(left: Any, right: str) -> tuple:
+    """把过滤值转换成与列值可比较的类型"""
+    if isinstance(left, bool):
+        return left, right.lower() == "true"
+    if isinstance(left, (int, float)):
+        try:
+            return float(left), float(right)
+        except ValueError:
+            return str(left), right
+    if left is None:
+        return None, right
+    if isinstance(left, str) and "T" in left and "T" in right:
+        try:
+            return _parse_time(left), _parse_time(right)
+        except ValueError:
+            pass
+    return str(left), right
+
+
+def _compare(row_value: Any, op: str, value: str) -> bool:
+    if op == "is":
+        if value == "null":
+            return row_value is None
+        return row_value is (value == "true")
+    if op == "in":
+        options = [item.strip().strip('"') for item in value.strip("()").split(",")]
+        return str(row_value) in options
+    if row_value is None:
+        return op == "neq"
+
+    left, right = _coerce(row_value, value)
+    if op == "eq":
+        return left == right
+    if op == "neq":
+        return left != right
+    if op == "gt":
+        return left > right
+    if op == "gte":
+        return left >= right
+    if op == "lt":
+        return left < right
+    if op == "lte":
+        return left <= right
+    raise ValueError(f"不支持的过滤操作: {op}")
+
+
+def _split_top_level(expression: str) -> List[str]:
+    """按顶层逗号拆分 or/and 条件"""
+    parts, depth, current = [], 0, ""
+    for char in expression:
+        if char == "(":
+            depth += 1
+        elif char == ")":
+            depth -= 1
+        if char == "," and depth == 0:
+            parts.append(current)
+            current = ""
+        else:
+            current += char
+    if current:
+        parts.append(current)
+    return parts
+
+
+def _logic_predicate(kind: str, expression: str) -> Callable[[Dict[str, Any]], bool]:
+    """解析 or=(a.eq.1,and(b.gt.2,c.lt.3)) 形式的条件"""
+    predicates = []
+    for part in _split_top_level(expression.strip()[1:-1]):
+        if part.startswith("and(") or part.startswith("or("):
+            inner_kind, inner = part.split("(", 1)
+            predicates.append(_logic_predicate(inner_kind, "(" + inner))
+        else:
+            column, op, value = part.split(".", 2)
+            value = value.strip('"')
+            predicates.append(
+                lambda row, column=column, op=op, value=value: _compare(row.get(column), op, value)
+            )
+    if kind == "or":
+        return lambda row: any(predicate(row) for predicate in predicates)
+    return lambda row: all(predicate(row) for predicate in predicates)
+
+
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+
+
+def _build_filters(request: Request) -> List[Callable[[Dict[str, Any]], bool]]:
+    filters = []
+    for key, value in request.query_params.multi_items():
+        if key in _RESERVED_PARAMS:
+            continue
+        if key in ("or", "and"):
+            filters.append(_logic_predicate(key, value))
+            continue
+        op, operand = value.split(".", 1)
+        filters.append(lambda row, key=key, op=op, operand=operand: _compare(row.get(key), op, operand))
+    return filters
+
+
+def _matching(table: str, request: Request) -> List[Dict[str, Any]]:
+    filters = _build_filters(request)
+    return [row for row in TABLES[table] if all(predicate(row) for predicate in filters)]
+
+
+def _apply_order(rows: List[Dict[str, Any]], order: Optional[str]) -> List[Dict[str, Any]]:
+    if not order:
+        return rows
+    # 从最后一个排序键开始做稳定排序
+    for item in reversed(order.split(",")):
+        parts = item.strip().split(".")
+        column, desc = parts[0], len(parts) > 1 and parts[1] == "desc"
+        rows = sorted(
+            rows,
+            key=lambda row: (row.get(column) is None, row.get(column) if row.get(column) is not None else ""),
+            reverse=desc
+        )
+    return rows
+
+
+def _project(rows: List[Dict[str, Any]], select: Optional[str]) -> List[Dict[str, Any]]:
+    if not select or select == "*":
+        return [dict(row) for row in rows]
+    columns = [column.strip() for column in select.split(",")]
+    return [{column: row.get(column) for column in columns} for row in rows]
+
+
+def _new_row(table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    now = _now().isoformat()
+    row = {"id": str(uuid.uuid4()), "created_at": now}
+    if table in ("orders", "user_memberships"):
+        row["updated_at"] = now
+    row.update(data)
+    return row
+
+
+def _find_conflict(table: str, data: Dict[str, Any], keys: List[str]) -> Optional[Dict[str, Any]]:
+    for row in TABLES[table]:
+        if all(row.get(key) == data.get(key) for key in keys):
+            return row
+    return None
+
+
+async def _simulate_latency() -> None:
+    if LATENCY_SECONDS > 0:
+        await asyncio.sleep(LATENCY_SECONDS)
+
+
+def _error(status_code: int, message: str, code: str = "PGRST000") -> JSONResponse:
+    return JSONResponse(
+        {"message": message, "code": code, "hint": None, "details": None},
+        status_code=status_code
+    )
+
+
+# ===== 表接口 =====
+
+@app.head("/rest/v1/{table}")
+@app.get("/rest/v1/{table}")
+async def select_rows(table: str, request: Request):
+    await _simulate_latency()
+    if table not in TABLES:
+        return _error(404, f"relation {table} does not exist", "42P01")
+
+    params = request.query_params
+    rows = _apply_order(_matching(table, request), params.get("order"))
+    total = len(rows)
+
+    offset = int(params.get("offset", 0))
+    limit = params.get("limit")
+    rows = rows[offset:offset + int(limit)] if limit is not None else rows[offset:]
+
+    headers = {}
+    if "count=" in request.headers.get("prefer", ""):
+        end = offset + len(rows) - 1
+        headers["Content-Range"] = f"{offset}-{end}/{total}" if rows else f"*/{total}"
+
+    return JSONResponse(_project(rows, params.get("select")), headers=headers)
+
+
+@app.post("/rest/v1/{table}")
+async def insert_rows(table: str, request: Request):
+    await _simulate_latency()
+    if table not in TABLES:
+        return _error(404, f"relation {table} does not exist", "42P01")
+
+    body = await request.json()
+    items = body if isinstance(body, list) else [body]
+    prefer = request.headers.get("prefer", "")
+    merge = "resolution=merge-duplicates" in prefer
+    ignore = "resolution=ignore-duplicates" in prefer
+    on_conflict = request.query_params.get("on_conflict")
+    conflict_keys = on_conflict.split(",") if on_conflict else UNIQUE_KEYS.get(table, [])
+
+    result = []
+    for item in items:
+        existing = _find_conflict(table, item, conflict_keys) if conflict_keys else None
+        if existing is not None:
+            if merge:
+                existing.update(item)
+                existing["updated_at"] = _now().isoformat()
+                result.append(dict(existing))
+                continue
+            if ignore:
+                continue
+            return _error(409, "duplicate key value violates unique constraint", "23505")
+
+        row = _new_row(table, item)
+        TABLES[table].append(row)
+        result.append(dict(row))
+
+    return JSONResponse(result, status_code=201)
+
+
+@app.patch("/rest/v1/{table}")
+async def update_rows(table: str, request: Request):
+    await _simulate_latency()
+    if table not in TABLES:
+        return _error(404, f"relation {table} does not exist", "42P01")
+
+    body = await request.json()
+    rows = _matching(table, request)
+    for row in rows:
+        row.update(body)
+        if "updated_at" in row:
+            row["updated_at"] = _now().isoformat()
+
+    prefer = request.headers.get("prefer", "")
+    headers = {"Content-Range": f"*/{len(rows)}"} if "count=" in prefer else {}
+    if "return=minimal" in prefer:
+        return Response(status_code=204, headers=headers)
+    return JSONResponse(_project(rows, request.query_params.get("select")), headers=headers)
+
+
+@app.delete("/rest/v1/{table}")
+async def delete_rows(table: str, request: Request):
+    await _simulate_latency()
+    if table not in TABLES:
+        return _error(404, f"relation {table} does not exist", "42P01")
+
+    rows = _matching(table, request)
+    ids = {id(row) for row in rows}
+    TABLES[table] = [row for row in TABLES[table] if id(row) not in ids]
+    return JSONResponse([dict(row) for row in rows])
+
+
+# ===== 数据库函数 =====
+
+def _membership_status(user_id: str) -> Dict[str, Any]:
+    """check_user_membership_status 的 Python 实现"""
+    membership = _find_conflict("user_memberships", {"user_id": user_id}, ["user_id"])
+    if membership is None:
+        return {"is_member": False, "membership_type": "free", "expires_at": None, "days_remaining": 0}
+
+    expires_at = _parse_time(membership.get("membership_expires_at"))
+    if membership.get("is_lifetime_member"):
+        is_member, days_remaining = True, None
+    elif expires_at is None:
+        is_member, days_remaining = False, 0
+    else:
+        is_member = expires_at > _now()
+        days_remaining = max(0, (expires_at - _now()).days)
+
+    return {
+        "is_member": is_member,
+        "membership_type": membership.get("membership_type", "free"),
+        "expires_at": membership.get("membership_expires_at"),
+        "days_remaining": days_remaining
+    }
+
+
+def _settle_order(p_out_trade_no: str, p_amount: float, p_zpay_trade_no: Optional[str] = None) -> Dict[str, Any]:
+    """settle_order 的 Python 实现（与 SETTLE_ORDER_FUNCTION.sql 一致）"""
+    order = _find_conflict("orders", {"out_trade_no": p_out_trade_no}, ["out_trade_no"])
+    if order is None:
+        return {"outcome": "not_found"}
+
+    base = {
+        "order_id": order["id"],
+        "user_id": order["user_id"],
+        "order_type": order.get("order_type"),
+        "subscription_type": order.get("subscription_type"),
+        "order_status": order["status"]
+    }
+    if order["status"] == "paid":
+        return {"outcome": "already_paid", **base}
+    if order["status"] not in ("pending", "failed", "expired"):
+        return {"outcome": "invalid_status", **base}
+    if abs(float(order["amount"]) - float(p_amount)) > 0.01:
+        return {"outcome": "amount_mismatch", **base}
+
+    now = _now()
+    order.update({
+        "status": "paid",
+        "paid_at": now.isoformat(),
+        "updated_at": now.isoformat(),
+        "zpay_trade_no": p_zpay_trade_no or order.get("zpay_trade_no")
+    })
+
+    membership_pending = order.get("order_type") == "subscription"
+    if membership_pending:
+        _enqueue_outbox(order["id"], "grant_membership")
+
+    return {
+        "outcome": "paid",
+        **base,
+        "order_status": "paid",
+        "membership_pending": membership_pending
+    }
+
+
+def _enqueue_outbox(order_id: str, kind: str) -> None:
+    for task in TABLES["payment_outbox"]:
+        if task["order_id"] == order_id and task["kind"] == kind:
+            return
+    global _OUTBOX_SEQUENCE
+    _OUTBOX_SEQUENCE += 1
+    now = _now().isoformat()
+    TABLES["payment_outbox"].append({
+        "id": _OUTBOX_SEQUENCE,
+        "order_id": order_id,
+        "kind": kind,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "locked_until": None,
+        "last_error": None,
+        "created_at": now,
+        "processed_at": None
+    })
+
+
+def _claim_outbox(p_limit: int, p_lease_seconds: int) -> List[Dict[str, Any]]:
+    """claim_payment_outbox 的 Python 实现"""
+    now = _now()
+    due = [
+        task for task in TABLES["payment_outbox"]
+        if task["status"] == "pending"
+        and _parse_time(task["next_attempt_at"]) <= now
+        and (task["locked_until"] is None or _parse_time(task["locked_until"]) < now)
+    ]
+    due.sort(key=lambda task: task["next_attempt_at"])
+    claimed = []
+    for task in due[:p_limit]:
+        task["locked_until"] = (now + timedelta(seconds=p_lease_seconds)).isoformat()
+        task["attempts"] += 1
+        claimed.append(dict(task))
+    return claimed
+
+
+def _complete_outbox(p_ids: List[int]) -> List[int]:
+    """complete_payment_outbox 的 Python 实现"""
+    done = []
+    for task in TABLES["payment_outbox"]:
+        if task["id"] in p_ids:
+            task.update({"status": "done", "processed_at": _now().isoformat(), "locked_until": None, "last_error": None})
+            done.append(task["id"])
+    return done
+
+
+def _fail_outbox(p_id: int, p_error: str, p_retry_seconds: int, p_max_attempts: int) -> List[Dict[str, Any]]:
+    """fail_payment_outbox 的 Python 实现"""
+    for task in TABLES["payment_outbox"]:
+        if task["id"] == p_id:
+            task.update({
+                "status": "dead" if task["attempts"] >= p_max_attempts else "pending",
+                "next_attempt_at": (_now() + timedelta(seconds=p_retry_seconds)).isoformat(),
+                "locked_until": None,
+                "last_error": p_error[:1000]
+            })
+            return [dict(task)]
+    return []
+
+
+def _grant_membership(p_order_id: str) -> Dict[str, Any]:
+    """grant_membership 的 Python 实现（与 PAYMENT_OUTBOX.sql 一致）"""
+    order = _find_conflict("orders", {"id": p_order_id}, ["id"])
+    if order is None or order["status"] != "paid" or order.get("order_type") != "subscription":
+        return {"outcome": "skipped", "order_id": p_order_id}
+    if order.get("membership_granted_at"):
+        return {"outcome": "already_granted", "order_id": order["id"], "user_id": order["user_id"]}
+
+    now = _now()
+    membership = _find_conflict("user_memberships", {"user_id": order["user_id"]}, ["user_id"])
+    if membership is None:
+        membership = _new_row("user_memberships", {
+            "user_id": order["user_id"],
+            "membership_started_at": now.isoformat()
+        })
+        TABLES["user_memberships"].append(membership)
+
+    new_expires_at = None
+    if order.get("subscription_type") == "lifetime" or membership.get("is_lifetime_member"):
+        membership.update({
+            "membership_type": "lifetime",
+            "membership_expires_at": None,
+            "is_lifetime_member": True
+        })
+    else:
+        current = _parse_time(membership.get("membership_expires_at")) or now
+        new_expires_at = max(current, now) + timedelta(days=order["subscription_duration_days"])
+        membership.update({
+            "membership_type": order["subscription_type"],
+            "membership_expires_at": new_expires_at.isoformat(),
+            "is_lifetime_member": False
+        })
+    membership["last_subscription_order_id"] = order["id"]
+    membership["updated_at"] = now.isoformat()
+    order["membership_granted_at"] = now.isoformat()
+
+    return {
+        "outcome": "granted",
+        "order_id": order["id"],
+        "user_id": order["user_id"],
+        "subscription_type": order.get("subscription_type"),
+        "membership_expires_at": new_expires_at.isoformat() if new_expires_at else None
+    }
+
+
+def _expire_stale_orders(p_older_than_seconds: int, p_batch_size: int) -> List[int]:
+    """expire_stale_orders 的 Python 实现"""
+    cutoff = _now() - timedelta(seconds=p_older_than_seconds)
+    stale = sorted(
+        (row for row in TABLES["orders"]
+         if row.get("status") == "pending" and _parse_time(row.get("created_at")) < cutoff),
+        key=lambda row: (row["created_at"], row["id"])
+    )[:p_batch_size]
+    for row in stale:
+        row["status"] = "expired"
+    return [len(stale)]
+
+
+def _update_audio_metadata(p_rows: List[Dict[str, Any]]) -> List[int]:
+    """update_audio_metadata 的 Python 实现"""
+    updated = 0
+    for row in p_rows:
+        audio = _find_conflict("audio_access_control", row, ["audio_name"])
+        if audio is None or all(audio.get(key) == value for key, value in row.items()):
+            continue
+        audio.update(row, metadata_indexed_at=_now().isoformat())
+        updated += 1
+    return [updated]
+
+
+def _rate_limit_take(p_key: str, p_capacity: float, p_refill_per_second: float) -> List[Dict[str, Any]]:
+    """rate_limit_take 的 Python 实现"""
+    now = time.monotonic()
+    bucket = _RATE_LIMIT_BUCKETS.setdefault(p_key, [p_capacity, now])
+    bucket[0] = min(p_capacity, bucket[0] + (now - bucket[1]) * p_refill_per_second)
+    bucket[1] = now
+    if bucket[0] >= 1:
+        bucket[0] -= 1
+        return [{"allowed": True, "retry_after": 0.0}]
+    return [{"allowed": False, "retry_after": (1 - bucket[0]) / p_refill_per_second}]
+
+
+def _audio_access_permission(user_uuid: str, audio_file_name: str) -> bool:
+    """check_audio_access_permission 的 Python 实现"""
+    audio = _find_conflict("audio_access_control", {"audio_name": audio_file_name}, ["audio_name"])
+    if audio is None:
+        return False
+    return audio["access_level"] == "free" or bool(_membership_status(user_uuid)["is_member"])
+
+
+RPC_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "check_user_membership_status": lambda user_uuid: [_membership_status(user_uuid)],
+    "check_audio_access_permission": _audio_access_permission,
+    "settle_order": lambda **params: [_settle_order(**params)],
+    "grant_membership": lambda **params: [_grant_membership(**params)],
+    "claim_payment_outbox": _claim_outbox,
+    "complete_payment_outbox": _complete_outbox,
+    "fail_payment_outbox": _fail_outbox,
+    "expire_stale_orders": _expire_stale_orders,
+    "update_audio_metadata": _update_audio_metadata,
+    "rate_limit_take": _rate_limit_take
+}
+
+
+@app.post("/rest/v1/rpc/{function}")
+async def call_function(function: str, request: Request):
+    await _simulate_latency()
+    handler = RPC_FUNCTIONS.get(function)
+    if handler is None:
+        return _error(404, f"function {function} does not exist", "PGRST202")
+
+    params = await request.json() if await request.body() else {}
+    return JSONResponse(handler(**params))
+
+
+@app.get("/health")
+async def health():
+    return {"tables": {name: len(rows) for name, rows in TABLES.items()}}
@@ -0,0 +1,77 @@
+"""
+ZPay mapi.php 本地替身
+
+接收下单请求并返回与 ZPay 相同结构的 JSON（code / msg / trade_no / payurl / qrcode）。
+
+启动：
+    uvicorn loadtest.fake_zpay:app --port 54322
+环境变量：
+    FAKE_ZPAY_LATENCY_MS: 每个请求的模拟处理延迟（毫秒，默认 50）
+    FAKE_ZPAY_PAID_RATIO: 订单查询接口返回已支付的比例（默认 0）
+"""
+import asyncio
+import os
+import random
+import uuid
+from urllib.parse import parse_qsl
+
+from fastapi import FastAPI, Request
+
+
+app = FastAPI(title="Fake ZPay")
+
+LATENCY_SECONDS = float(os.getenv("FAKE_ZPAY_LATENCY_MS", "50")) / 1000
+
+# 已下单但未收到通知的订单在查询接口中被视为已支付的比例（用于对账测试）
+PAID_RATIO = float(os.getenv("FAKE_ZPAY_PAID_RATIO", "0"))
+
+ORDERS = {}
+
+
+@app.post("/mapi.php")
+async def create_order(request: Request):
+    # 直接解析 urlencoded 表单，不依赖 python-multipart
+    form = dict(parse_qsl((await request.body()).decode()))
+    if LATENCY_SECONDS > 0:
+        await asyncio.sleep(LATENCY_SECONDS)
+
+    if not form.get("out_trade_no") or not form.get("sign"):
+        return {"code": -1, "msg": "参数错误"}
+
+    trade_no = uuid.uuid4().hex[:20]
+    ORDERS[form["out_trade_no"]] = {
+        "trade_no": trade_no,
+        "money": form.get("money"),
+        "paid": random.random() < PAID_RATIO
+    }
+    return {
+        "code": 1,
+        "msg": "success",
+        "trade_no": trade_no,
+        "payurl": f"https://fake-zpay.local/pay/{trade_no}",
+        "qrcode": f"https://fake-zpay.local/qr/{trade_no}"
+    }
+
+
+@app.get("/api.php")
+async def query_order(act: str, pid: str, key: str, out_trade_no: str):
+    if LATENCY_SECONDS > 0:
+        await asyncio.sleep(LATENCY_SECONDS)
+
+    order = ORDERS.get(out_trade_no)
+    if act != "order" or order is None:
+        return {"code": -1, "msg": "订单号不存在"}
+    return {
+        "code": 1,
+        "msg": "查询订单号成功！",
+        "trade_no": order["trade_no"],
+        "out_trade_no": out_trade_no,
+        "pid": pid,
+        "money": order["money"],
+        "status": 1 if order["paid"] else 0
+    }
+
+
+@app.get("/health")
+async def health():
+    return {"orders": len(ORDERS)}
@@ -0,0 +1,365 @@
+"""
+离线端到端压测
+
+在本机启动 Supabase 替身、ZPay 替身和后端应用（三个独立进程），
+按真实流量组合执行压测场景，输出各路由的请求数、错误数、吞吐量和延迟分位数。
+
+场景：
+    login_burst     大量新用户登录后同时获取会员状态和音频权限
+    order_creation  创建订阅二维码订单（经过 ZPay 替身）
+    status_polling  查询订单状态
+    notify_storm    ZPay 异步通知风暴（每笔订单重复通知多次，检验幂等结算）
+    membership_check 支付后查询会员状态，统计会员发放（异步任务）完成的比例
+
+使用方法（在 backend 目录下）：
+    python -m loadtest.run_loadtest --users 200 --concurrency 50 --output after.json
+    python -m loadtest.run_loadtest --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+import httpx
+import jwt
+
+# 以模块或脚本方式运行时都能导入 backend 下的模块
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from utils import generate_md5_signature
+
+
+JWT_SECRET = "loadtest-jwt-secret"
+MERCHANT_ID = "1000"
+MERCHANT_KEY = "loadtest-merchant-key"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _make_token(user_id: str) -> str:
+    now = int(time.time())
+    payload = {
+        "sub": user_id,
+        "email": f"{user_id[:8]}@loadtest.local",
+        "aud": "authenticated",
+        "role": "authenticated",
+        "iat": now,
+        "exp": now + 3600
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm="HS256")
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Recorder:
+    """按路由记录每个请求的耗时和结果"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.started_at: Dict[str, float] = {}
+        self.finished_at: Dict[str, float] = {}
+
+    def record(self, route: str, elapsed: float, ok: bool) -> None:
+        now = time.perf_counter()
+        self.started_at.setdefault(route, now - elapsed)
+        self.finished_at[route] = now
+        self.samples.setdefault(route, []).append(elapsed)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        result = {}
+        for route, values in self.samples.items():
+            ordered = sorted(values)
+            wall = max(self.finished_at[route] - self.started_at[route], 1e-9)
+            result[route] = {
+                "count": len(ordered),
+                "errors": self.errors.get(route, 0),
+                "rps": round(len(ordered) / wall, 1),
+                "p50_ms": round(_percentile(ordered, 0.50) * 1000, 2),
+                "p95_ms": round(_percentile(ordered, 0.95) * 1000, 2),
+                "p99_ms": round(_percentile(ordered, 0.99) * 1000, 2),
+                "mean_ms": round(sum(ordered) / len(ordered) * 1000, 2),
+                "max_ms": round(ordered[-1] * 1000, 2)
+            }
+        return result
+
+
+class LoadTest:
+    """压测场景执行器"""
+
+    def __init__(self, base_url: str, concurrency: int, recorder: Recorder):
+        self.base_url = base_url
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.recorder = recorder
+        self.client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=30,
+            limits=httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        )
+
+    async def close(self) -> None:
+        await self.client.aclose()
+
+    async def request(
+        self,
+        route: str,
+        method: str,
+        url: str,
+        expect_text: Optional[str] = None,
+        **kwargs
+    ) -> Optional[httpx.Response]:
+        async with self.semaphore:
+            started = time.perf_counter()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+                ok = response.status_code < 400
+                if ok and expect_text is not None:
+                    ok = response.text == expect_text
+            except httpx.HTTPError:
+                response, ok = None, False
+            self.recorder.record(route, time.perf_counter() - started, ok)
+            return response
+
+    async def login_burst(self, tokens: List[str]) -> None:
+        async def one_user(token: str):
+            headers = {"Authorization": f"Bearer {token}"}
+            await asyncio.gather(
+                self.request("GET /api/user/membership", "GET", "/api/user/membership", headers=headers),
+                self.request("GET /api/user/audio-access", "GET", "/api/user/audio-access", headers=headers)
+            )
+
+        await asyncio.gather(*(one_user(token) for token in tokens))
+
+    async def order_creation(self, tokens: List[str]) -> List[Dict[str, Any]]:
+        async def one_order(token: str):
+            response = await self.request(
+                "POST /api/create_subscription_qr_order",
+                "POST",
+                "/api/create_subscription_qr_order",
+                headers={"Authorization": f"Bearer {token}"},
+                json={"subscription_type": random.choice(["monthly_3", "yearly"]), "payment_type": "alipay"}
+            )
+            if response is None or response.status_code != 200:
+                return None
+            data = response.json()
+            return {"token": token, "out_trade_no": data["out_trade_no"], "amount": data["amount"]}
+
+        orders = await asyncio.gather(*(one_order(token) for token in tokens))
+        return [order for order in orders if order]
+
+    async def status_polling(self, orders: List[Dict[str, Any]], rounds: int) -> None:
+        async def poll(order: Dict[str, Any]):
+            headers = {"Authorization": f"Bearer {order['token']}"}
+            for _ in range(rounds):
+                await self.request(
+                    "GET /api/get_order_status",
+                    "GET",
+                    f"/api/get_order_status/{order['out_trade_no']}",
+                    headers=headers
+                )
+
+        await asyncio.gather(*(poll(order) for order in orders))
+
+    async def notify_storm(self, orders: List[Dict[str, Any]], duplicates: int) -> None:
+        def signed_params(order: Dict[str, Any]) -> Dict[str, str]:
+            params = {
+                "pid": MERCHANT_ID,
+                "trade_no": uuid.uuid5(uuid.NAMESPACE_OID, order["out_trade_no"]).hex[:20],
+                "out_trade_no": order["out_trade_no"],
+                "type": "alipay",
+                "name": "HERHZZZ 会员订阅",
+                "money": f"{float(order['amount']):.2f}",
+                "trade_status": "TRADE_SUCCESS"
+            }
+            params["sign"] = generate_md5_signature(params, MERCHANT_KEY)
+            params["sign_type"] = "MD5"
+            return params
+
+        calls = [
+            self.request("GET /notify_url", "GET", "/notify_url", expect_text="success", params=signed_params(order))
+            for order in orders
+            for _ in range(duplicates)
+        ]
+        random.shuffle(calls)
+        await asyncio.gather(*calls)
+
+
+    async def membership_check(self, orders: List[Dict[str, Any]], deadline_seconds: float = 10.0) -> float:
+        async def wait_member(order: Dict[str, Any]) -> bool:
+            headers = {"Authorization": f"Bearer {order['token']}"}
+            deadline = time.monotonic() + deadline_seconds
+            while time.monotonic() < deadline:
+                response = await self.request(
+                    "GET /api/user/membership (after pay)", "GET", "/api/user/membership", headers=headers
+                )
+                if response is not None and response.status_code == 200 and response.json()["is_member"]:
+                    return True
+                await asyncio.sleep(0.2)
+            return False
+
+        results = await asyncio.gather(*(wait_member(order) for order in orders))
+        return sum(results) / len(results) if results else 0.0
+
+
+def _start_process(module: str, port: int, env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning", "--no-access-log"],
+        cwd=BACKEND_DIR,
+        env=env,
+        stdout=subprocess.DEVNULL
+    )
+
+
+async def _wait_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f"服务未就绪: {url}")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    supabase_port, zpay_port, app_port = _free_port(), _free_port(), _free_port()
+
+    base_env = dict(os.environ)
+    fake_supabase_env = {**base_env, "FAKE_DB_LATENCY_MS": str(args.db_latency_ms)}
+    fake_zpay_env = {**base_env, "FAKE_ZPAY_LATENCY_MS": str(args.zpay_latency_ms)}
+    app_env = {
+        **base_env,
+        "SUPABASE_URL": f"http://127.0.0.1:{supabase_port}",
+        "SUPABASE_SERVICE_ROLE_KEY": "loadtest-service-role-key",
+        "SUPABASE_JWT_SECRET": JWT_SECRET,
+        "ZPAY_MERCHANT_ID": MERCHANT_ID,
+        "ZPAY_MERCHANT_KEY": MERCHANT_KEY,
+        "ZPAY_API_URL": f"http://127.0.0.1:{zpay_port}/mapi.php",
+        "ZPAY_NOTIFY_URL": f"http://127.0.0.1:{app_port}/notify_url",
+        # 所有虚拟用户都来自 127.0.0.1，按 IP 限流会把压测流量当成单个客户端
+        "RATE_LIMIT_ENABLED": "false",
+        "LOG_LEVEL": args.log_level
+    }
+
+    processes = [
+        _start_process("loadtest.fake_supabase:app", supabase_port, fake_supabase_env),
+        _start_process("loadtest.fake_zpay:app", zpay_port, fake_zpay_env),
+        _start_process("main:app", app_port, app_env)
+    ]
+
+    recorder = Recorder()
+    base_url = f"http://127.0.0.1:{app_port}"
+    try:
+        await _wait_ready(f"http://127.0.0.1:{supabase_port}/health")
+        await _wait_ready(f"http://127.0.0.1:{zpay_port}/health")
+        await _wait_ready(f"{base_url}/")
+
+        tokens = [_make_token(str(uuid.uuid4())) for _ in range(args.users)]
+        load_test = LoadTest(base_url, args.concurrency, recorder)
+        started = time.perf_counter()
+        try:
+            await load_test.login_burst(tokens)
+            orders = await load_test.order_creation(tokens)
+            await load_test.status_polling(orders, args.poll_rounds)
+            await load_test.notify_storm(orders, args.notify_duplicates)
+            membership_granted_ratio = await load_test.membership_check(orders)
+        finally:
+            await load_test.close()
+        elapsed = time.perf_counter() - started
+
+        async with httpx.AsyncClient() as client:
+            cache_stats = (await client.get(f"{base_url}/api/cache/stats")).json()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    return {
+        "config": {
+            "users": args.users,
+            "concurrency": args.concurrency,
+            "poll_rounds": args.poll_rounds,
+            "notify_duplicates": args.notify_duplicates,
+            "db_latency_ms": args.db_latency_ms,
+            "zpay_latency_ms": args.zpay_latency_ms
+        },
+        "elapsed_seconds": round(elapsed, 2),
+        "membership_granted_ratio": membership_granted_ratio,
+        "routes": recorder.summary(),
+        "cache_stats": cache_stats
+    }
+
+
+def _print_report(report: Dict[str, Any], baseline: Optional[Dict[str, Any]]) -> None:
+    print(f"总耗时: {report['elapsed_seconds']}s  配置: {report['config']}")
+    print(f"会员发放完成比例: {report['membership_granted_ratio']:.0%}")
+    header = f"{'路由':<42}{'请求':>7}{'错误':>6}{'rps':>9}{'p50':>9}{'p95':>9}{'p99':>9}"
+    if baseline:
+        header += f"{'p95变化':>10}"
+    print(header)
+
+    for route, stats in sorted(report["routes"].items()):
+        line = (
+            f"{route:<42}{stats['count']:>7}{stats['errors']:>6}{stats['rps']:>9}"
+            f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}"
+        )
+        previous = (baseline or {}).get("routes", {}).get(route)
+        if previous and previous["p95_ms"]:
+            change = (stats["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100
+            line += f"{change:>+9.1f}%"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="HERHZZZ 离线端到端压测")
+    parser.add_argument("--users", type=int, default=200, help="模拟用户数（每个用户创建一笔订单）")
+    parser.add_argument("--concurrency", type=int, default=50, help="最大并发请求数")
+    parser.add_argument("--poll-rounds", type=int, default=5, help="每笔订单查询状态的次数")
+    parser.add_argument("--notify-duplicates", type=int, default=3, help="每笔订单收到的重复通知数")
+    parser.add_argument("--db-latency-ms", type=float, default=5, help="Supabase 替身的模拟延迟")
+    parser.add_argument("--zpay-latency-ms", type=float, default=50, help="ZPay 替身的模拟延迟")
+    parser.add_argument("--log-level", default="WARNING", help="后端应用日志级别")
+    parser.add_argument("--output", help="结果写入的 JSON 文件")
+    parser.add_argument("--compare", help="用于对比的历史结果 JSON 文件")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+
+    _print_report(report, baseline)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f"结果已写入 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+日志配置模块
+
+请求线程只把日志记录放进有界队列，由后台线程格式化为 JSON 并写出，
+日志开销不随请求量增长。支持按模块设置级别、DEBUG 日志采样和自动附加请求ID。
+"""
+import os
+import sys
+import copy
+import json
+import queue
+import random
+import logging
+import logging.handlers
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+
+# 当前请求ID（由 main.py 的中间件设置）
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+# LogRecord 自带的属性，其余属性视为 extra 结构化字段
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class RequestContextFilter(logging.Filter):
+    """附加请求ID，并按采样率丢弃 DEBUG 日志（在请求线程中执行，保持轻量）"""
+
+    def __init__(self, debug_sample_rate: float = 1.0):
+        super().__init__()
+        self.debug_sample_rate = debug_sample_rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno <= logging.DEBUG and self.debug_sample_rate < 1.0:
+            if random.random() >= self.debug_sample_rate:
+                return False
+
+        record.request_id = request_id_var.get()
+        return True
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """队列满时直接丢弃日志并计数，不阻塞请求"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """
+        只复制记录，不在请求线程中格式化
+
+        标准库的 prepare() 会在这里拼接消息和异常堆栈并清空 exc_info，
+        消息和堆栈改由监听线程中的 JsonFormatter 生成
+
+        Args:
+            record: 日志记录
+
+        Returns:
+            logging.LogRecord: 放入队列的记录副本
+        """
+        return copy.copy(record)
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """把日志记录格式化为单行 JSON"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage()
+        }
+
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and value is not None:
+                entry[key] = value
+
+        if record.exc_info:
+            exc_type, exc_value, _ = record.exc_info
+            entry["exception"] = {
+                "type": exc_type.__name__ if exc_type is not None else None,
+                "message": str(exc_value) if exc_value is not None else None,
+                "traceback": self.formatException(record.exc_info)
+            }
+        if record.stack_info:
+            entry["stack"] = self.formatStack(record.stack_info)
+
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def _parse_module_levels(spec: str) -> dict:
+    """
+    解析按模块设置的日志级别
+
+    Args:
+        spec: 形如 "main=INFO,payment_service=DEBUG" 的配置
+
+    Returns:
+        dict: 日志器名称到级别的映射
+    """
+    levels = {}
+    for item in spec.split(","):
+        if "=" not in item:
+            continue
+        name, level = item.split("=", 1)
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging() -> None:
+    """
+    配置队列日志（可重复调用，只生效一次）
+
+    环境变量：
+        LOG_LEVEL: 默认日志级别（默认 INFO）
+        LOG_LEVELS: 按模块设置的级别，如 "main=INFO,database_service=DEBUG"
+        LOG_DEBUG_SAMPLE_RATE: DEBUG 日志采样率（0~1，默认 1）
+        LOG_QUEUE_SIZE: 日志队列容量，队列满时丢弃（默认 10000）
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    log_queue: queue.Queue = queue.Queue(maxsize=int(os.getenv("LOG_QUEUE_SIZE", "10000")))
+
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RequestContextFilter(
+        debug_sample_rate=float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1"))
+    ))
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(JsonFormatter())
+
+    root = logging.getLogger()
+    root.handlers = [queue_handler]
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+
+    # httpx/httpcore 每个上游请求都会记录 INFO 日志，默认只保留警告
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    logging.getLogger("httpcore").setLevel(logging.WARNING)
+
+    for name, level in _parse_module_levels(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown_logging() -> None:
+    """停止后台日志线程并写出队列中剩余的日志"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -1,11 +1,17 @@
 from fastapi import FastAPI, HTTPException, Depends, Security, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, Response
 import jwt
 import os
+import math
+import time
+import hashlib
 from typing import Optional
 from datetime import datetime
-import uvicorn
+from contextlib import asynccontextmanager
+import uuid
+import logging
 from dotenv import load_dotenv
 
 # 导入我们的模型和服务
@@ -15,14 +21,56 @@ from models import (
     UserMembershipStatus, UserAudioAccessResponse
 )
 from database_service import DatabaseService
-from payment_service import PaymentService
-from utils import generate_order_number, get_client_ip, validate_amount
+from cache import TTLCache
+from order_events import OrderStatusBus
+from outbox_worker import OutboxWorker
+from order_sweeper import OrderSweeper
+from order_rows import OrderStatusRow
+from fast_json import FastJSONResponse
+from audio_files import AudioFile, AudioFileStore
+from audio_hls import PLAYLIST_MEDIA_TYPE, RENDITIONS_BY_NAME, SEGMENT_MEDIA_TYPE, HlsStore, choose_rendition, rewrite_playlist
+from audio_signing import AudioUrlSigner
+from audio_peaks import DEFAULT_PEAK_BINS, PEAK_RESOLUTIONS, PEAKS_MEDIA_TYPE, PeaksStore
+from payment_service import PaymentService, PaymentUnavailableError
+from rate_limit import RateLimiter, RateLimitPolicy
+from utils import generate_order_number, get_client_ip, detect_device, validate_amount
+from log_config import setup_logging, shutdown_logging, request_id_var
+import metrics
 
 # 加载环境变量
 load_dotenv()
 
+# 配置队列日志（请求线程只入队，后台线程写出）
+setup_logging()
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    应用生命周期管理
+    
+    启动时加载订阅套餐并启动支付后续任务 worker 和过期订单清理，
+    关闭时释放服务持有的资源（数据库线程池、ZPay 连接池等）。
+    BACKGROUND_TASKS_ENABLED 关闭时（Serverless）两者都跳过，
+    Supabase 客户端和套餐在第一次用到时加载
+    """
+    if BACKGROUND_TASKS_ENABLED:
+        try:
+            await database_service.plan_registry.refresh()
+        except Exception as e:
+            # 加载失败时由首个定价或下单请求重试
+            logger.error("启动时加载订阅套餐失败", extra={"error": str(e)})
+        outbox_worker.start()
+        order_sweeper.start()
+    yield
+    await order_sweeper.stop()
+    await outbox_worker.stop()
+    await payment_service.close()
+    database_service.close()
+    shutdown_logging()
+
 # 创建FastAPI应用实例
-app = FastAPI(title="HERHZZZ Payment API", version="1.0.0")
+app = FastAPI(title="HERHZZZ Payment API", version="1.0.0", lifespan=lifespan)
 
 # 配置CORS中间件，允许前端跨域请求
 frontend_url = os.getenv("FRONTEND_URL", "http://localhost:5173")
@@ -39,8 +87,37 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def request_context_middleware(request: Request, call_next):
+    """
+    请求上下文中间件
+    
+    为每个请求分配请求ID（自动附加到该请求的所有日志中），并按路由模板记录耗时
+    """
+    request_id = request.headers.get("X-Request-ID") or uuid.uuid4().hex
+    token = request_id_var.set(request_id)
+    start = time.perf_counter()
+    status = "5xx"
+    try:
+        response = await call_next(request)
+        status = f"{response.status_code // 100}xx"
+    finally:
+        request_id_var.reset(token)
+        # 使用路由模板而非实际路径，避免订单号等参数造成标签基数膨胀
+        route = request.scope.get("route")
+        metrics.http_request_duration.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            route=route.path if route is not None else "unmatched",
+            status=status
+        )
+    response.headers["X-Request-ID"] = request_id
+    return response
+
 # HTTP Bearer认证scheme，用于从请求头获取Token
 security = HTTPBearer()
+# 登录可选的接口使用：没有 Authorization 头时不返回 403
+optional_security = HTTPBearer(auto_error=False)
 
 # 从环境变量获取Supabase JWT密钥
 # 这个密钥用于验证Supabase生成的JWT Token的真实性
@@ -49,14 +126,148 @@ SUPABASE_JWT_SECRET = os.getenv("SUPABASE_JWT_SECRET")
 if not SUPABASE_JWT_SECRET:
     raise ValueError("SUPABASE_JWT_SECRET environment variable is required")
 
-# 初始化服务实例
+# 认证调试开关：开启后打印Token诊断信息（生产环境保持关闭）
+AUTH_DEBUG = os.getenv("AUTH_DEBUG", "false").lower() == "true"
+
+# 已验证Token缓存：按Token的SHA-256摘要缓存payload，最长缓存到Token过期
+jwt_cache = TTLCache(
+    max_size=int(os.getenv("JWT_CACHE_SIZE", "10000")),
+    default_ttl=float(os.getenv("JWT_CACHE_MAX_TTL", "3600"))
+)
+
+# 是否在进程内运行后台任务（启动预热、会员发放 worker、过期订单清理）。
+# Serverless（Vercel 会设置 VERCEL 环境变量）实例在请求之间被冻结，后台任务无法运行，
+# 启动预热也只会拖慢冷启动，默认关闭；此时会员在支付通知请求中直接发放，
+# 失败的发放任务由 Vercel Cron 调用 /api/cron/payment-outbox 重试
+BACKGROUND_TASKS_ENABLED = os.getenv(
+    "BACKGROUND_TASKS_ENABLED", "false" if os.getenv("VERCEL") else "true"
+).lower() == "true"
+
+# 初始化服务实例（构造时只读取配置，Supabase 客户端和 ZPay 连接池在第一次使用时创建）
 database_service = DatabaseService()
 payment_service = PaymentService()
 
+# 订单状态通知总线（支付回调 → 长轮询请求）
+order_status_bus = OrderStatusBus()
+
+# 支付后续任务 worker（会员发放），支付通知写入任务后唤醒（未运行时直接发放）
+outbox_worker = OutboxWorker(database_service)
+# 定时任务接口的访问令牌（Vercel Cron 以 Authorization: Bearer <CRON_SECRET> 调用），未设置时接口关闭
+CRON_SECRET = os.getenv("CRON_SECRET")
+# 定时任务单次最长处理时间（秒，需低于函数执行时长上限）
+OUTBOX_DRAIN_MAX_SECONDS = float(os.getenv("OUTBOX_DRAIN_MAX_SECONDS", "5"))
+
+# 过期待支付订单定时清理
+order_sweeper = OrderSweeper(database_service)
+
+# 下单和支付通知限流（每次下单写一行订单并调用一次 ZPay）
+rate_limiter = RateLimiter(database_service)
+ORDER_LIMIT_PER_USER = RateLimitPolicy.parse(os.getenv("RATE_LIMIT_ORDER_PER_USER", "10/60"))
+ORDER_LIMIT_PER_IP = RateLimitPolicy.parse(os.getenv("RATE_LIMIT_ORDER_PER_IP", "30/60"))
+NOTIFY_LIMIT_PER_IP = RateLimitPolicy.parse(os.getenv("RATE_LIMIT_NOTIFY_PER_IP", "600/60"))
+
+# 鉴权音频文件目录（/api/audio/{audio_name}/stream）
+audio_files = AudioFileStore()
+
+# 音频签名链接：签发时判断一次访问权限，之后每次拉取只校验签名
+audio_url_signer = AudioUrlSigner()
+# 签名链接的前缀（例如 CDN 域名），默认返回相对路径
+AUDIO_URL_BASE = os.getenv("AUDIO_URL_BASE", "").rstrip("/")
+
+# 波形峰值文件（audio_peaks.py 生成，与音频放在一起）
+audio_peaks = PeaksStore(audio_files.directory)
+
+# 多码率 HLS 打包产物（package_audio.py 生成）
+hls_store = HlsStore()
+
+# 订单状态长轮询的最长等待时间（秒，需明显低于 Vercel 函数默认 10 秒的执行时长上限）
+ORDER_STATUS_WAIT_MAX_TIMEOUT = float(os.getenv("ORDER_STATUS_WAIT_MAX_TIMEOUT", "6"))
+# 长轮询等待期间重新查询数据库的间隔（秒）：支付回调落在其他实例时进程内通知收不到
+ORDER_STATUS_RECHECK_INTERVAL = float(os.getenv("ORDER_STATUS_RECHECK_INTERVAL", "2"))
+
+# 订阅定价接口的缓存时间（秒，客户端和 CDN 过期后用 ETag 重新验证）
+PRICING_CACHE_MAX_AGE = int(os.getenv("PRICING_CACHE_MAX_AGE", "60"))
+
+# 订单列表每页最大数量
+ORDERS_PAGE_MAX_LIMIT = int(os.getenv("ORDERS_PAGE_MAX_LIMIT", "100"))
+
+# /metrics 访问令牌（设置后需携带 Authorization: Bearer <token>）
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+def _cache_counters() -> dict:
+    """缓存命中/未命中计数（供 /metrics 抓取）"""
+    caches = {
+        "membership": database_service.membership_cache,
+        "settlement": database_service.settlement_cache,
+        "jwt": jwt_cache
+    }
+    values = {}
+    for name, cache in caches.items():
+        values[(name, "hit")] = cache.hits
+        values[(name, "miss")] = cache.misses
+    return values
+
+def _zpay_upstream_latency() -> dict:
+    """ZPay 新建/复用连接的平均耗时（供 /metrics 抓取）"""
+    stats = payment_service.get_upstream_stats()
+    return {
+        (key,): stats[key]["avg_ms"] / 1000 if stats[key]["avg_ms"] is not None else None
+        for key in ["new_connection", "reused_connection"]
+    }
+
+metrics.registry.counter_callback(
+    "herhzzz_cache_requests_total",
+    "进程内缓存命中/未命中次数",
+    _cache_counters,
+    ("cache", "result")
+)
+metrics.registry.gauge_callback(
+    "herhzzz_zpay_upstream_avg_latency_seconds",
+    "ZPay 请求平均耗时（按是否新建连接）",
+    _zpay_upstream_latency,
+    ("connection",)
+)
+metrics.registry.gauge_callback(
+    "herhzzz_zpay_circuit_open",
+    "ZPay 熔断器状态（0 关闭，0.5 半开，1 打开）",
+    lambda: {(): {"closed": 0, "half_open": 0.5, "open": 1}[payment_service.breaker.state]}
+)
+metrics.registry.gauge_callback(
+    "herhzzz_order_status_waiters",
+    "等待中的订单状态长轮询请求数",
+    lambda: {(): order_status_bus.waiter_count()}
+)
+
+def _log_token_diagnostics(token: str) -> None:
+    """
+    记录Token诊断信息（仅在 AUTH_DEBUG 开启时调用）
+    
+    Args:
+        token: 原始JWT Token
+    """
+    try:
+        # 解码header和payload（不验证签名）
+        header = jwt.get_unverified_header(token)
+        payload = jwt.decode(token, options={"verify_signature": False})
+        
+        logger.info("开始验证JWT Token", extra={
+            "token_length": len(token),
+            "token_header": header,
+            "user_id": payload.get('sub'),
+            "token_exp": payload.get('exp'),
+            "token_aud": payload.get('aud'),
+            "token_role": payload.get('role'),
+            "token_expired": bool(payload.get('exp')) and time.time() > payload['exp']
+        })
+    except Exception as decode_error:
+        logger.info("无法解码token内容", extra={"error": str(decode_error)})
+
 def verify_jwt_token(credentials: HTTPAuthorizationCredentials = Security(security)) -> dict:
     """
     验证JWT Token的有效性
     
+    验证通过的payload按Token摘要缓存到过期时间，同一Token的后续请求无需重复验签
+    
     Args:
         credentials: HTTP Authorization头中的Bearer Token
         
@@ -68,46 +279,17 @@ def verify_jwt_token(credentials: HTTPAuthorizationCredentials = Security(securi
     """
     token = credentials.credentials
     
-    # 增加详细的调试日志
-    print(f"🔍 开始验证JWT Token...")
-    print(f"📏 Token长度: {len(token)}")
-    print(f"🔑 JWT Secret长度: {len(SUPABASE_JWT_SECRET) if SUPABASE_JWT_SECRET else 0}")
-    print(f"📝 Token前50个字符: {token[:50]}...")
+    # 快速路径：已验证过的Token直接返回缓存的payload
+    cache_key = hashlib.sha256(token.encode("utf-8")).digest()
+    cached_payload = jwt_cache.get(cache_key)
+    if cached_payload is not None:
+        return cached_payload
+    
+    if AUTH_DEBUG:
+        _log_token_diagnostics(token)
     
     try:
-        # 先尝试解码token而不验证签名，看看内容
-        try:
-            parts = token.split('.')
-            if len(parts) == 3:
-                import base64
-                import json
-                
-                # 解码header和payload（不验证签名）
-                header = json.loads(base64.b64decode(parts[0] + '=='))
-                payload = json.loads(base64.b64decode(parts[1] + '=='))
-                
-                print(f"📋 Token Header: {header}")
-                print(f"👤 Token Payload - 用户ID: {payload.get('sub')}")
-                print(f"📧 Token Payload - 邮箱: {payload.get('email')}")
-                print(f"⏰ Token Payload - 过期时间: {payload.get('exp')}")
-                print(f"🏢 Token Payload - 受众: {payload.get('aud')}")
-                print(f"🏷️ Token Payload - 角色: {payload.get('role')}")
-                
-                # 检查过期时间
-                if payload.get('exp'):
-                    import time
-                    current_time = time.time()
-                    exp_time = payload['exp']
-                    print(f"⏰ 当前时间: {current_time}")
-                    print(f"⏰ Token过期时间: {exp_time}")
-                    print(f"⏰ Token状态: {'已过期' if current_time > exp_time else '未过期'}")
-            else:
-                print(f"❌ Token格式错误: 分段数量 = {len(parts)}")
-        except Exception as decode_error:
-            print(f"⚠️ 无法解码token内容: {decode_error}")
-        
-        # 使用Supabase JWT密钥验证和解码Token
-        print(f"🔐 开始验证Token签名...")
+        # 使用Supabase JWT密钥验证和解码Token（同时校验exp）
         payload = jwt.decode(
             token, 
             SUPABASE_JWT_SECRET, 
@@ -116,39 +298,37 @@ def verify_jwt_token(credentials: HTTPAuthorizationCredentials = Security(securi
             options={"verify_aud": True}  # 明确启用audience验证
         )
         
-        print(f"✅ Token验证成功!")
-        
-        # 检查Token是否过期（双重验证）
-        if payload.get('exp') and payload['exp'] < datetime.utcnow().timestamp():
-            print(f"❌ Token已过期")
-            raise HTTPException(
-                status_code=401, 
-                detail="Token已过期"
-            )
-            
-        return payload
-        
     except jwt.ExpiredSignatureError as e:
         # Token过期
-        print(f"❌ JWT ExpiredSignatureError: {e}")
+        if AUTH_DEBUG:
+            logger.info("JWT ExpiredSignatureError", extra={"error": str(e)})
         raise HTTPException(
             status_code=401, 
             detail="Token已过期，请重新登录"
         )
     except jwt.InvalidTokenError as e:
         # Token无效（签名错误、格式错误等）
-        print(f"❌ JWT InvalidTokenError: {e}")
+        if AUTH_DEBUG:
+            logger.info("JWT InvalidTokenError", extra={"error": str(e)})
         raise HTTPException(
             status_code=401, 
             detail="Token无效，请重新登录"
         )
     except Exception as e:
         # 其他错误
-        print(f"❌ JWT验证异常: {type(e).__name__}: {e}")
+        logger.error("JWT验证异常", extra={"error_type": type(e).__name__, "error": str(e)})
         raise HTTPException(
             status_code=401, 
             detail=f"Token验证失败: {str(e)}"
         )
+    
+    # 缓存到Token过期为止（不超过 JWT_CACHE_MAX_TTL）
+    ttl = jwt_cache.default_ttl
+    if payload.get('exp'):
+        ttl = min(ttl, payload['exp'] - time.time())
+    jwt_cache.set(cache_key, payload, ttl=ttl)
+    
+    return payload
 
 def get_current_user(token_payload: dict = Depends(verify_jwt_token)) -> dict:
     """
@@ -182,13 +362,123 @@ def get_current_user(token_payload: dict = Depends(verify_jwt_token)) -> dict:
         'token_payload': token_payload  # 完整的token数据，如果需要其他字段
     }
 
+def get_optional_user(
+    credentials: Optional[HTTPAuthorizationCredentials] = Security(optional_security)
+) -> Optional[dict]:
+    """
+    获取当前用户信息（登录可选的接口使用）
+    
+    Args:
+        credentials: HTTP Authorization头中的Bearer Token，未登录时为 None
+        
+    Returns:
+        Optional[dict]: 用户信息，未登录时返回 None
+        
+    Raises:
+        HTTPException: 携带了Token但Token无效或过期时抛出401错误
+    """
+    if credentials is None:
+        return None
+    return get_current_user(verify_jwt_token(credentials))
+
 # ===== API路由 =====
 
+async def _enforce_rate_limit(scope: str, rules: list) -> None:
+    """
+    检查限流规则，超出时返回 429
+    
+    Args:
+        scope: 限流范围（指标标签和桶键前缀）
+        rules: (维度, 标识, 规则) 列表
+        
+    Raises:
+        HTTPException: 超出限制时抛出 429，Retry-After 为需要等待的整秒数
+    """
+    decision = await rate_limiter.check(
+        (f"{scope}:{dimension}:{identity}", policy) for dimension, identity, policy in rules
+    )
+    if not decision.allowed:
+        metrics.rate_limited.inc(scope=scope)
+        retry_after = max(1, math.ceil(decision.retry_after))
+        logger.warning("请求被限流", extra={"scope": scope, "retry_after": retry_after})
+        raise HTTPException(
+            status_code=429,
+            detail="请求过于频繁，请稍后再试",
+            headers={"Retry-After": str(retry_after)}
+        )
+
+async def limit_order_creation(request: Request, current_user: dict = Depends(get_current_user)) -> None:
+    """下单限流依赖：同时按 JWT 用户和客户端 IP 限制（两个下单接口共用同一组桶）"""
+    await _enforce_rate_limit("order", [
+        ("user", current_user['user_id'], ORDER_LIMIT_PER_USER),
+        ("ip", get_client_ip(request), ORDER_LIMIT_PER_IP)
+    ])
+
+def _payment_unavailable(error: PaymentUnavailableError) -> HTTPException:
+    """
+    ZPay 暂时不可用时的响应
+    
+    Args:
+        error: PaymentService 抛出的不可用异常
+        
+    Returns:
+        HTTPException: 503，Retry-After 为建议等待的整秒数
+    """
+    logger.warning("ZPay 不可用，下单快速失败", extra={"reason": error.reason, "error": str(error)})
+    return HTTPException(
+        status_code=503,
+        detail=str(error),
+        headers={"Retry-After": str(max(1, math.ceil(error.retry_after)))}
+    )
+
+async def limit_payment_notify(request: Request) -> None:
+    """支付通知限流依赖：按来源 IP 限制（签名校验之前拦截伪造通知洪泛）"""
+    await _enforce_rate_limit("notify", [("ip", get_client_ip(request), NOTIFY_LIMIT_PER_IP)])
+
 @app.get("/")
 async def root():
     """健康检查接口"""
     return {"message": "HERHZZZ Payment API is running"}
 
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """
+    Prometheus 指标接口
+    
+    Returns:
+        PlainTextResponse: Prometheus 文本格式的指标
+    """
+    if METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="无权访问指标")
+    
+    return PlainTextResponse(
+        metrics.registry.render(),
+        media_type="text/plain; version=0.0.4"
+    )
+
+@app.get("/api/cron/payment-outbox", include_in_schema=False)
+async def run_payment_outbox(request: Request):
+    """
+    定时处理支付后续任务（Vercel Cron 调用，见 vercel.json）
+
+    Serverless 部署没有后台 worker，会员在支付通知中直接发放；
+    这里重试发放失败的任务，并确认已直接发放的任务
+
+    Returns:
+        dict: 本次处理的任务数
+
+    Raises:
+        HTTPException: 未设置 CRON_SECRET 时返回 404，令牌错误时返回 401
+    """
+    if not CRON_SECRET:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if request.headers.get("authorization") != f"Bearer {CRON_SECRET}":
+        raise HTTPException(status_code=401, detail="无权调用定时任务")
+
+    handled = await outbox_worker.drain(max_seconds=OUTBOX_DRAIN_MAX_SECONDS)
+    logger.info("定时处理支付后续任务完成", extra={"handled": handled})
+    return {"handled": handled}
+
 @app.get("/api/protected")
 async def protected_route(current_user: dict = Depends(get_current_user)):
     """
@@ -208,7 +498,7 @@ async def protected_route(current_user: dict = Depends(get_current_user)):
 
 # 已删除旧的跳转支付订阅端点，使用下面的二维码支付端点
 
-@app.post("/api/create_subscription_qr_order")
+@app.post("/api/create_subscription_qr_order", dependencies=[Depends(limit_order_creation)])
 async def create_subscription_qr_order(
     request: Request,
     subscription_request: CreateSubscriptionOrderRequest,
@@ -230,6 +520,8 @@ async def create_subscription_qr_order(
     Raises:
         HTTPException: 生成失败时抛出异常
     """
+    # 整个下单请求共用一个截止时间，写订单的耗时也计入 ZPay 调用的预算
+    deadline = payment_service.new_deadline()
     try:
         # 1. 验证用户权限
         user_id = subscription_request.user_id or current_user['user_id']
@@ -240,24 +532,37 @@ async def create_subscription_qr_order(
                 detail="用户只能为自己创建订阅"
             )
         
-        # 2. 生成唯一的商户订单号
+        # 2. 从套餐注册表读取名称、价格和时长（内存快照）
+        try:
+            plans = await database_service.plan_registry.get()
+        except Exception as e:
+            logger.error("加载订阅套餐失败", extra={"error": str(e)})
+            raise HTTPException(status_code=503, detail="订阅套餐暂不可用")
+        
+        plan = plans.get(subscription_request.subscription_type.value)
+        if plan is None:
+            raise HTTPException(status_code=400, detail="订阅套餐不存在或已下架")
+        
+        # 3. 生成唯一的商户订单号
         out_trade_no = generate_order_number()
         
-        # 3. 获取客户端IP和设备信息
+        # 4. 获取客户端IP和设备信息
         client_ip = get_client_ip(request)
-        user_agent = request.headers.get("user-agent", "")
-        device = "mobile" if any(keyword in user_agent.lower() for keyword in ["mobile", "android", "iphone"]) else "pc"
+        device = detect_device(request)
+        
+        # ZPay 熔断中时不再写订单，直接返回 503
+        payment_service.ensure_available()
         
-        # 4. 在数据库中创建订阅订单记录
+        # 5. 在数据库中创建订阅订单记录
         try:
             # 准备订阅订单数据字典
             subscription_order_data = {
                 "out_trade_no": out_trade_no,
                 "user_id": user_id,
                 "subscription_type": subscription_request.subscription_type.value,
-                "name": subscription_request.subscription_name,
-                "amount": subscription_request.subscription_amount,
-                "subscription_duration_days": subscription_request.subscription_duration_days,
+                "name": plan.name,
+                "amount": plan.price,
+                "subscription_duration_days": plan.duration_days,
                 "payment_type": subscription_request.payment_type,
                 "client_ip": client_ip,
                 "device": device
@@ -267,45 +572,48 @@ async def create_subscription_qr_order(
             created_order = await database_service.create_subscription_order(subscription_order_data)
             order_id = created_order.get("id")
             
-            print(f"✅ 数据库订单创建成功 - 订单ID: {order_id}, 商户订单号: {out_trade_no}")
+            logger.info("数据库订单创建成功", extra={"order_id": order_id, "out_trade_no": out_trade_no})
             
         except Exception as e:
-            print(f"❌ 数据库订单创建失败: {str(e)}")
+            logger.error("数据库订单创建失败", extra={"out_trade_no": out_trade_no, "error": str(e)})
             raise HTTPException(
                 status_code=500,
                 detail=f"订单创建失败: {str(e)}"
             )
         
-        # 5. 创建用于二维码的订单请求对象
+        # 6. 创建用于二维码的订单请求对象
         from models import CreateOrderRequest
         
         qr_order_request = CreateOrderRequest(
-            name=subscription_request.subscription_name,
-            amount=subscription_request.subscription_amount,
+            name=plan.name,
+            amount=plan.price,
             payment_type="alipay",  # 二维码支付使用支付宝
             user_id=user_id
         )
         
-        # 6. 调用支付服务生成二维码
+        # 7. 调用支付服务生成二维码
         try:
             payment_result = await payment_service.create_payment(
                 order_request=qr_order_request,
                 out_trade_no=out_trade_no,
                 client_ip=client_ip,
-                device=device
+                device=device,
+                deadline=deadline
             )
             
-            print(f"✅ ZPay 二维码生成成功: {payment_result}")
+            logger.info("ZPay 二维码生成成功", extra={"out_trade_no": out_trade_no})
             
+        except PaymentUnavailableError:
+            raise
         except Exception as e:
-            print(f"❌ ZPay 二维码生成失败: {str(e)}")
+            logger.error("ZPay 二维码生成失败", extra={"out_trade_no": out_trade_no, "error": str(e)})
             # 如果支付服务失败，删除已创建的订单记录（可选）
             raise HTTPException(
                 status_code=500,
                 detail=f"支付二维码生成失败: {str(e)}"
             )
         
-        # 7. 更新订单记录，保存支付链接和二维码信息
+        # 8. 更新订单记录，保存支付链接和二维码信息
         try:
             await database_service.update_order_payment_info(
                 out_trade_no=out_trade_no,
@@ -314,19 +622,19 @@ async def create_subscription_qr_order(
                 zpay_trade_no=payment_result.get("zpay_trade_no")
             )
             
-            print(f"✅ 订单支付信息更新成功")
+            logger.debug("订单支付信息更新成功", extra={"out_trade_no": out_trade_no})
             
         except Exception as e:
-            print(f"⚠️ 订单支付信息更新失败: {str(e)}")
+            logger.warning("订单支付信息更新失败", extra={"out_trade_no": out_trade_no, "error": str(e)})
             # 这里不抛出异常，因为二维码已经生成成功
         
-        # 8. 返回二维码支付响应
+        # 9. 返回二维码支付响应
         return {
             "out_trade_no": out_trade_no,
             "subscription_type": subscription_request.subscription_type.value,
-            "subscription_name": subscription_request.subscription_name,
-            "amount": subscription_request.subscription_amount,
-            "duration_days": subscription_request.subscription_duration_days,
+            "subscription_name": plan.name,
+            "amount": plan.price,
+            "duration_days": plan.duration_days,
             "qr_code": payment_result.get("qrcode"),
             "pay_url": payment_result.get("payurl"),
             "order_id": order_id,
@@ -336,8 +644,10 @@ async def create_subscription_qr_order(
     except HTTPException:
         # 重新抛出 HTTP 异常
         raise
+    except PaymentUnavailableError as e:
+        raise _payment_unavailable(e)
     except Exception as e:
-        print(f"❌ 创建订阅二维码订单时发生未知错误: {str(e)}")
+        logger.exception("创建订阅二维码订单时发生未知错误")
         raise HTTPException(
             status_code=500,
             detail=f"服务器内部错误: {str(e)}"
@@ -440,33 +750,317 @@ async def check_audio_access(
             detail=f"检查音频访问权限失败: {str(e)}"
         )
 
-@app.get("/api/subscription/pricing")
-async def get_subscription_pricing():
+@app.api_route("/api/audio/{audio_name}/stream", methods=["GET", "HEAD"])
+async def stream_audio(
+    audio_name: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
     """
-    获取订阅定价信息接口
+    音频流接口
+    
+    检查一次访问权限后返回音频文件，支持 Range 请求（拖动进度条、断点续传）
+    和 ETag / Last-Modified 条件请求
+    
+    Args:
+        audio_name: 音频文件名
+        request: FastAPI Request 对象
+        current_user: 当前登录用户信息
+        
+    Returns:
+        Response: 音频文件（200 / 206），或 304 / 416
+    """
+    audio_file = audio_files.resolve(audio_name)
+    if audio_file is None:
+        raise HTTPException(status_code=404, detail="音频不存在")
+    
+    if not await database_service.check_audio_access_permission(current_user['user_id'], audio_name):
+        raise HTTPException(status_code=403, detail="该音频仅限会员收听")
+    
+    return audio_files.response(audio_file, request)
+
+@app.api_route("/api/audio/{audio_name}/peaks", methods=["GET", "HEAD"])
+async def get_audio_peaks(audio_name: str, request: Request, bins: int = DEFAULT_PEAK_BINS):
+    """
+    音频波形峰值接口（不需要登录，只包含波形轮廓）
+    
+    返回离线计算好的 int8 峰值文件（格式见 audio_peaks.py），播放器按绘制宽度选择分辨率；
+    响应允许 CDN 缓存，重新生成后 ETag 变化
     
+    Args:
+        audio_name: 音频文件名
+        request: FastAPI Request 对象
+        bins: 峰值点数（256 / 1024 / 4096）
+        
     Returns:
-        dict: 订阅定价信息
+        Response: 峰值文件（200 / 206），或 304
+    """
+    if bins not in PEAK_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail=f"bins 只支持 {', '.join(map(str, PEAK_RESOLUTIONS))}")
+    
+    peaks_file = audio_peaks.resolve(audio_name, bins)
+    if peaks_file is None:
+        raise HTTPException(status_code=404, detail="波形数据不存在")
+    
+    return audio_files.response(
+        peaks_file,
+        request,
+        cache_control=f"public, max-age={audio_peaks.max_age}",
+        media_type=PEAKS_MEDIA_TYPE
+    )
+
+@app.get("/api/audio/signed-urls")
+async def get_signed_audio_urls(current_user: Optional[dict] = Depends(get_optional_user)):
+    """
+    签发音频链接接口
+    
+    播放会话开始时调用一次：为用户当前可访问的每个音频签发带过期时间的链接，
+    之后的播放和拖动直接请求链接，不再检查会员状态。未登录的访客只获得免费音频的链接
+    
+    Args:
+        current_user: 当前登录用户信息，未登录时为 None
+        
+    Returns:
+        dict: expires_at（过期时间戳）和 urls（音频文件名 → 签名链接）
     """
     try:
-        pricing_info = payment_service.get_subscription_pricing()
-        return {
-            "pricing": pricing_info,
-            "currency": "CNY",
-            "updated_at": datetime.utcnow().isoformat()
+        audio_names = await database_service.get_accessible_audio_names(
+            current_user['user_id'] if current_user else None
+        )
+    except Exception as e:
+        logger.error("获取可访问音频失败", extra={"error": str(e)})
+        raise HTTPException(status_code=503, detail="音频目录暂不可用，请稍后重试")
+    
+    expires = audio_url_signer.expires_at()
+    return {
+        "expires_at": expires,
+        "urls": {
+            audio_name: f"{AUDIO_URL_BASE}/api/media/audio/{audio_name}"
+                        f"?exp={expires}&sig={audio_url_signer.sign(audio_name, expires)}"
+            for audio_name in audio_names
+            if audio_files.resolve(audio_name) is not None
         }
+    }
+
+@app.api_route("/api/media/audio/{audio_name}", methods=["GET", "HEAD"])
+async def get_signed_audio(audio_name: str, exp: int, sig: str, request: Request):
+    """
+    签名音频接口（不需要登录，链接本身即凭证）
+    
+    只校验签名和过期时间，不访问数据库；响应允许 CDN 缓存到链接过期
+    
+    Args:
+        audio_name: 音频文件名
+        exp: 过期时间戳
+        sig: 签名
+        request: FastAPI Request 对象
         
-    except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"获取订阅定价失败: {str(e)}"
+    Returns:
+        Response: 音频文件（200 / 206），或 304 / 416
+    """
+    if not audio_url_signer.verify(audio_name, exp, sig):
+        raise HTTPException(status_code=403, detail="音频链接无效或已过期")
+    
+    audio_file = audio_files.resolve(audio_name)
+    if audio_file is None:
+        raise HTTPException(status_code=404, detail="音频不存在")
+    
+    max_age = max(0, exp - int(time.time()))
+    return audio_files.response(audio_file, request, cache_control=f"public, max-age={max_age}, immutable")
+
+def _signed_hls_url(audio_name: str, playlist: str, expires: int) -> str:
+    """生成 HLS 播放列表签名链接（同一音频的主播放列表和各码率播放列表共用一个签名）"""
+    signature = audio_url_signer.sign(f"hls/{audio_name}", expires)
+    return f"{AUDIO_URL_BASE}/api/media/hls/{audio_name}/{playlist}?exp={expires}&sig={signature}"
+
+@app.get("/api/audio/{audio_name}/rendition")
+async def get_audio_rendition(
+    audio_name: str,
+    request: Request,
+    quality: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    选择音频码率接口
+    
+    检查一次访问权限后，按设备类型（User-Agent）、Save-Data 请求头和客户端指定的 quality
+    选择码率，返回该码率的签名播放列表；同时返回多码率主播放列表（由播放器自适应切换）
+    和原始 MP3 签名链接（不支持 HLS 或音频尚未打包时使用）
+    
+    Args:
+        audio_name: 音频文件名
+        request: FastAPI Request 对象
+        quality: 客户端指定的码率（low / mid / high）
+        current_user: 当前登录用户信息
+        
+    Returns:
+        dict: 选中的码率、签名播放列表链接和 MP3 备用链接
+    """
+    audio_file = audio_files.resolve(audio_name)
+    if audio_file is None:
+        raise HTTPException(status_code=404, detail="音频不存在")
+    
+    if not await database_service.check_audio_access_permission(current_user['user_id'], audio_name):
+        raise HTTPException(status_code=403, detail="该音频仅限会员收听")
+    
+    device = detect_device(request)
+    save_data = request.headers.get("save-data", "").strip().lower() == "on"
+    renditions = hls_store.renditions(audio_name)
+    rendition = choose_rendition(renditions, device, save_data=save_data, requested=quality)
+    
+    expires = audio_url_signer.expires_at()
+    result = {
+        "audio_name": audio_name,
+        "device": device,
+        "rendition": rendition,
+        "bitrate_kbps": None,
+        "expires_at": expires,
+        "playlist_url": None,
+        "master_url": None,
+        "fallback_url": f"{AUDIO_URL_BASE}/api/media/audio/{audio_name}"
+                        f"?exp={expires}&sig={audio_url_signer.sign(audio_name, expires)}"
+    }
+    if rendition is not None:
+        result.update({
+            "bitrate_kbps": RENDITIONS_BY_NAME[rendition].bitrate_kbps,
+            "playlist_url": _signed_hls_url(audio_name, f"{rendition}.m3u8", expires),
+            "master_url": _signed_hls_url(audio_name, "master.m3u8", expires)
+        })
+    return result
+
+@app.get("/api/media/hls/{audio_name}/{playlist}")
+async def get_signed_hls_playlist(audio_name: str, playlist: str, exp: int, sig: str):
+    """
+    签名 HLS 播放列表接口（不需要登录，链接本身即凭证）
+    
+    主播放列表中的子播放列表、媒体播放列表中的分片都改写成使用相同过期时间的签名链接，
+    同一签名时间窗口内所有用户拿到的播放列表相同，CDN 可以共享缓存
+    
+    Args:
+        audio_name: 音频文件名
+        playlist: master.m3u8 或 <码率>.m3u8
+        exp: 过期时间戳
+        sig: 签名
+        
+    Returns:
+        Response: m3u8 播放列表
+    """
+    if not audio_url_signer.verify(f"hls/{audio_name}", exp, sig):
+        raise HTTPException(status_code=403, detail="音频链接无效或已过期")
+    
+    name, extension = os.path.splitext(playlist)
+    text = hls_store.playlist(audio_name, name) if extension == ".m3u8" else None
+    if text is None:
+        raise HTTPException(status_code=404, detail="播放列表不存在")
+    
+    if name == "master":
+        text = rewrite_playlist(text, lambda child: _signed_hls_url(audio_name, child, exp))
+    else:
+        text = rewrite_playlist(
+            text,
+            lambda segment: f"{AUDIO_URL_BASE}/api/media/segments/{segment}"
+                            f"?exp={exp}&sig={audio_url_signer.sign(f'hls-seg/{segment}', exp)}"
+        )
+    
+    max_age = max(0, exp - int(time.time()))
+    return Response(
+        content=text,
+        media_type=PLAYLIST_MEDIA_TYPE,
+        headers={"Cache-Control": f"public, max-age={max_age}"}
+    )
+
+@app.api_route("/api/media/segments/{segment}", methods=["GET", "HEAD"])
+async def get_signed_hls_segment(segment: str, exp: int, sig: str, request: Request):
+    """
+    签名 HLS 分片接口（不需要登录，链接本身即凭证）
+    
+    分片按内容命名，内容不变则链接在签名时间窗口内不变，响应允许 CDN 缓存到链接过期
+    
+    Args:
+        segment: 分片名
+        exp: 过期时间戳
+        sig: 签名
+        request: FastAPI Request 对象
+        
+    Returns:
+        Response: 分片文件（200 / 206），或 304 / 416
+    """
+    if not audio_url_signer.verify(f"hls-seg/{segment}", exp, sig):
+        raise HTTPException(status_code=403, detail="音频链接无效或已过期")
+    
+    found = hls_store.segment(segment)
+    if found is None:
+        raise HTTPException(status_code=404, detail="分片不存在")
+    
+    path, stat_result = found
+    max_age = max(0, exp - int(time.time()))
+    return audio_files.response(
+        AudioFile(segment, path, stat_result),
+        request,
+        cache_control=f"public, max-age={max_age}, immutable",
+        media_type=SEGMENT_MEDIA_TYPE
+    )
+
+@app.get("/api/subscription/pricing")
+async def get_subscription_pricing(request: Request):
+    """
+    获取订阅定价信息接口
+    
+    响应体在套餐快照中预先序列化，客户端携带匹配的 If-None-Match 时返回 304；
+    不等待数据库：套餐快照还没加载时（冷启动）在后台加载，本次返回不缓存的默认定价
+    
+    Args:
+        request: FastAPI Request 对象
+        
+    Returns:
+        Response: 订阅定价信息（pricing、currency、updated_at）
+    """
+    plans = database_service.plan_registry.get_nowait()
+    if plans is None:
+        return Response(
+            content=database_service.plan_registry.default_snapshot.pricing_body,
+            media_type="application/json",
+            headers={"Cache-Control": "no-store"}
         )
+    
+    headers = {
+        "ETag": plans.etag,
+        "Cache-Control": f"public, max-age={PRICING_CACHE_MAX_AGE}"
+    }
+    if plans.etag in request.headers.get("if-none-match", ""):
+        return Response(status_code=304, headers=headers)
+    
+    return Response(content=plans.pricing_body, media_type="application/json", headers=headers)
+
+@app.get("/api/payment/upstream-stats")
+async def get_payment_upstream_stats(current_user: dict = Depends(get_current_user)):
+    """
+    获取 ZPay 上游延迟统计接口
+    
+    Returns:
+        dict: 新建连接与复用连接的平均耗时、连接复用每单节省的时间，以及熔断器状态和连接重试次数
+    """
+    return payment_service.get_upstream_stats()
+
+@app.get("/api/cache/stats")
+async def get_cache_stats(current_user: dict = Depends(get_current_user)):
+    """
+    获取进程内缓存统计接口
+    
+    Returns:
+        dict: 各缓存的条目数和命中/未命中计数
+    """
+    stats = database_service.get_cache_stats()
+    stats["jwt"] = jwt_cache.stats()
+    stats["order_sweeper"] = order_sweeper.stats()
+    stats["rate_limit"] = rate_limiter.stats()
+    return stats
 
 # ===== 原有支付接口 =====
 
 # 已删除跳转支付端点，只保留二维码支付功能
 
-@app.post("/api/create_order", response_model=CreateOrderResponse)
+@app.post("/api/create_order", response_model=CreateOrderResponse, dependencies=[Depends(limit_order_creation)])
 async def create_order(
     request: Request,
     order_request: CreateOrderRequest,
@@ -494,6 +1088,8 @@ async def create_order(
     Raises:
         HTTPException: 订单创建失败时抛出异常
     """
+    # 整个下单请求共用一个截止时间，写订单的耗时也计入 ZPay 调用的预算
+    deadline = payment_service.new_deadline()
     try:
         # 1. 验证用户ID（确保用户只能为自己创建订单）
         if order_request.user_id != current_user['user_id']:
@@ -528,7 +1124,8 @@ async def create_order(
             "params": {}  # 扩展参数
         }
         
-        # 6. 在数据库中创建订单记录
+        # 6. 在数据库中创建订单记录（ZPay 熔断中时直接返回 503，不再写订单）
+        payment_service.ensure_available()
         created_order = await database_service.create_order(order_data)
         
         # 7. 调用 ZPay 创建支付订单
@@ -536,7 +1133,8 @@ async def create_order(
             order_request=order_request,
             out_trade_no=out_trade_no,
             client_ip=client_ip,
-            device="pc"
+            device="pc",
+            deadline=deadline
         )
         
         # 8. 更新订单的支付信息
@@ -559,16 +1157,34 @@ async def create_order(
     except HTTPException:
         # 重新抛出 HTTP 异常
         raise
+    except PaymentUnavailableError as e:
+        raise _payment_unavailable(e)
     except Exception as e:
         # 处理其他异常
-        print(f"创建订单失败: {str(e)}")
+        logger.exception("创建订单失败")
         raise HTTPException(
             status_code=500,
             detail=f"订单创建失败: {str(e)}"
         )
 
-@app.post("/notify_url")
-@app.get("/notify_url")
+def _notify_metric_outcome(settlement: dict) -> str:
+    """
+    支付通知结算结果对应的指标标签
+    
+    Args:
+        settlement: DatabaseService.settle_order 的返回值
+        
+    Returns:
+        str: success / replay（命中已结算缓存）/ 其余 outcome 原样返回
+    """
+    if settlement.get("cached"):
+        return "replay"
+    if settlement["outcome"] == "paid":
+        return "success"
+    return settlement["outcome"]
+
+@app.post("/notify_url", response_class=PlainTextResponse, dependencies=[Depends(limit_payment_notify)])
+@app.get("/notify_url", response_class=PlainTextResponse, dependencies=[Depends(limit_payment_notify)])
 async def zpay_notify_callback(request: Request):
     """
     ZPay 支付通知回调接口 (匹配环境配置)
@@ -588,32 +1204,37 @@ async def zpay_notify_callback(request: Request):
         if request.method == "GET":
             # GET方式：从查询参数获取
             notification_data = dict(request.query_params)
-            print(f"🔔 收到 ZPay 异步通知 (GET): {notification_data}")
         else:
             # POST方式：从表单或JSON获取
             if request.headers.get("content-type", "").startswith("application/json"):
                 notification_data = await request.json()
-                print(f"🔔 收到 ZPay 异步通知 (JSON): {notification_data}")
             else:
                 # ZPay 通常使用 form-data 格式
                 form_data = await request.form()
                 notification_data = dict(form_data)
-                print(f"🔔 收到 ZPay 异步通知 (FORM): {notification_data}")
+        
+        logger.info("收到 ZPay 异步通知", extra={
+            "method": request.method,
+            "out_trade_no": notification_data.get("out_trade_no"),
+            "trade_no": notification_data.get("trade_no"),
+            "trade_status": notification_data.get("trade_status"),
+            "money": notification_data.get("money")
+        })
         
         # 验证必要参数
         required_params = ["out_trade_no", "trade_status", "sign"]
         for param in required_params:
             if not notification_data.get(param):
-                print(f"❌ 缺少必要参数: {param}")
+                logger.warning("支付通知缺少必要参数", extra={"param": param})
+                metrics.notify_outcomes.inc(endpoint="notify_url", outcome="missing_param")
                 return "fail"
         
         # 验证通知签名
         if not payment_service.verify_notification(notification_data):
-            print("❌ 支付通知签名验证失败")
+            logger.warning("支付通知签名验证失败", extra={"out_trade_no": notification_data.get("out_trade_no")})
+            metrics.notify_outcomes.inc(endpoint="notify_url", outcome="signature_error")
             return "fail"
         
-        print("✅ 签名验证通过")
-        
         # 获取订单号和交易状态
         out_trade_no = notification_data.get("out_trade_no")
         trade_status = notification_data.get("trade_status", "")
@@ -621,60 +1242,68 @@ async def zpay_notify_callback(request: Request):
         
         # 验证交易状态
         if trade_status.upper() not in ["SUCCESS", "TRADE_SUCCESS", "PAID"]:
-            print(f"⚠️ 支付状态非成功: {trade_status}")
+            logger.info("支付状态非成功", extra={"out_trade_no": out_trade_no, "trade_status": trade_status})
+            metrics.notify_outcomes.inc(endpoint="notify_url", outcome="non_success_status")
             return "success"  # 仍返回success避免重复通知
         
-        print("✅ 支付状态检查通过")
+        # 一次 RPC 完成结算：校验金额、更新订单状态、发放或延长会员
+        settlement = await database_service.settle_order(
+            out_trade_no,
+            notified_amount,
+            zpay_trade_no=notification_data.get("trade_no")
+        )
+        outcome = settlement["outcome"]
+        metrics.notify_outcomes.inc(endpoint="notify_url", outcome=_notify_metric_outcome(settlement))
         
-        # 获取订单信息
-        order = await database_service.get_order_by_trade_no(out_trade_no)
-        if not order:
-            print(f"❌ 订单不存在: {out_trade_no}")
+        if outcome == "not_found":
+            logger.warning("订单不存在", extra={"out_trade_no": out_trade_no})
             return "fail"
         
-        print(f"✅ 找到订单: {order['status']}")
-        
-        # 检查订单是否已经处理过（幂等性）
-        if order["status"] == "paid":
-            print(f"⚠️ 订单 {out_trade_no} 已经是支付成功状态，跳过处理")
-            return "success"
-        
-        # 验证金额是否一致（防止金额篡改）
-        if abs(float(order["amount"]) - notified_amount) > 0.01:
-            print(f"❌ 金额不匹配: 订单金额={order['amount']}, 通知金额={notified_amount}")
+        if outcome == "amount_mismatch":
+            logger.warning("金额不匹配", extra={"out_trade_no": out_trade_no, "notified_amount": notified_amount})
             return "fail"
         
-        print("✅ 金额验证通过")
+        if outcome == "already_paid":
+            # 检查订单是否已经处理过（幂等性）
+            logger.info("订单已经是支付成功状态，跳过处理", extra={
+                "out_trade_no": out_trade_no,
+                "cached": settlement.get("cached", False)
+            })
+            return "success"
         
-        # 更新订单状态为已支付
-        success = await database_service.update_order_status(out_trade_no, "paid")
-        if not success:
-            print(f"❌ 更新订单状态失败: {out_trade_no}")
-            return "fail"
+        if outcome == "invalid_status":
+            logger.warning("订单当前状态不允许结算", extra={
+                "out_trade_no": out_trade_no,
+                "order_status": settlement.get("order_status")
+            })
+            return "success"  # 仍返回success避免重复通知
         
-        print(f"✅ 订单 {out_trade_no} 状态更新为已支付")
+        logger.info("订单状态更新为已支付", extra={
+            "out_trade_no": out_trade_no,
+            "user_id": settlement.get("user_id"),
+            "order_type": settlement.get("order_type"),
+            "subscription_type": settlement.get("subscription_type")
+        })
         
-        # 如果是订阅订单，更新用户会员状态
-        if order.get("order_type") == "subscription":
-            print(f"🔄 开始更新用户会员状态: user_id={order['user_id']}, type={order.get('subscription_type')}")
-            
-            # 这里会员状态更新已经在 database_service.update_order_status 中自动处理
-            # 通过 _handle_subscription_payment_success 方法
-            
-            print(f"✅ 用户 {order['user_id']} 会员状态更新成功: {order.get('subscription_type')}")
+        # 会员发放任务已随支付状态一起提交：唤醒 worker 立即处理，没有 worker 时直接发放
+        if settlement.get("membership_pending"):
+            await outbox_worker.dispatch(settlement["order_id"])
         
-        print("🎉 ZPay 异步通知处理成功")
+        # 唤醒等待该订单状态的长轮询请求
+        order_status_bus.publish(out_trade_no, {
+            "status": "paid",
+            "paid_at": datetime.utcnow().isoformat()
+        })
         
         # 返回成功响应给 ZPay（必须是纯字符串"success"）
         return "success"
         
     except Exception as e:
-        print(f"❌ 处理支付通知失败: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("处理支付通知失败")
+        metrics.notify_outcomes.inc(endpoint="notify_url", outcome="fail")
         return "fail"
 
-@app.post("/api/payment/notify")
+@app.post("/api/payment/notify", response_class=PlainTextResponse, dependencies=[Depends(limit_payment_notify)])
 async def payment_notify(request: Request):
     """
     ZPay 支付通知回调接口 (原有接口，保持兼容性)
@@ -694,11 +1323,15 @@ async def payment_notify(request: Request):
             form_data = await request.form()
             notification_data = dict(form_data)
         
-        print(f"收到支付通知 (旧接口): {notification_data}")
+        logger.info("收到支付通知 (旧接口)", extra={
+            "out_trade_no": notification_data.get("out_trade_no"),
+            "trade_status": notification_data.get("trade_status")
+        })
         
         # 验证通知签名
         if not payment_service.verify_notification(notification_data):
-            print("支付通知签名验证失败")
+            logger.warning("支付通知签名验证失败", extra={"out_trade_no": notification_data.get("out_trade_no")})
+            metrics.notify_outcomes.inc(endpoint="payment_notify", outcome="signature_error")
             raise HTTPException(status_code=400, detail="签名验证失败")
         
         # 获取订单号和交易状态
@@ -710,58 +1343,118 @@ async def payment_notify(request: Request):
         
         # 根据交易状态更新订单
         if trade_status.upper() in ["SUCCESS", "TRADE_SUCCESS", "PAID"]:
-            # 支付成功
-            await database_service.update_order_status(out_trade_no, "paid")
-            print(f"订单 {out_trade_no} 支付成功")
+            # 支付成功：单次 RPC 校验金额并结算
+            settlement = await database_service.settle_order(
+                out_trade_no,
+                float(notification_data.get("money", "0")),
+                zpay_trade_no=notification_data.get("trade_no")
+            )
+            metrics.notify_outcomes.inc(endpoint="payment_notify", outcome=_notify_metric_outcome(settlement))
+            if settlement["outcome"] in ["not_found", "amount_mismatch"]:
+                logger.warning("订单结算失败", extra={"out_trade_no": out_trade_no, "outcome": settlement["outcome"]})
+                return "fail"
+            if settlement["outcome"] == "paid":
+                if settlement.get("membership_pending"):
+                    await outbox_worker.dispatch(settlement["order_id"])
+                order_status_bus.publish(out_trade_no, {
+                    "status": "paid",
+                    "paid_at": datetime.utcnow().isoformat()
+                })
+            logger.info("订单支付成功", extra={"out_trade_no": out_trade_no})
         elif trade_status.upper() in ["FAILED", "TRADE_FAILED"]:
             # 支付失败
             await database_service.update_order_status(out_trade_no, "failed")
-            print(f"订单 {out_trade_no} 支付失败")
+            order_status_bus.publish(out_trade_no, {"status": "failed"})
+            metrics.notify_outcomes.inc(endpoint="payment_notify", outcome="payment_failed")
+            logger.info("订单支付失败", extra={"out_trade_no": out_trade_no})
         
         # 返回成功响应给 ZPay
         return "success"
         
     except Exception as e:
-        print(f"处理支付通知失败: {str(e)}")
+        logger.exception("处理支付通知失败")
+        metrics.notify_outcomes.inc(endpoint="payment_notify", outcome="fail")
         raise HTTPException(status_code=500, detail="处理支付通知失败")
 
 @app.get("/api/orders")
 async def get_user_orders(
-    page: int = 1,
     limit: int = 20,
+    cursor: Optional[str] = None,
+    count: Optional[str] = None,
     current_user: dict = Depends(get_current_user)
 ):
     """
-    获取用户订单列表
+    获取用户订单列表（游标分页）
     
     Args:
-        page: 页码（从1开始）
-        limit: 每页数量
+        limit: 每页数量（1~100）
+        cursor: 上一页返回的 next_cursor，不传时返回第一页
+        count: 是否返回总数：exact（精确）或 estimated（估算），不传时不统计
         current_user: 当前用户信息
         
     Returns:
-        dict: 包含订单列表和分页信息的响应
+        dict: orders、limit、next_cursor（没有下一页时为 null）和 total（未统计时为 null）
     """
+    limit = max(1, min(limit, ORDERS_PAGE_MAX_LIMIT))
     try:
-        offset = (page - 1) * limit
-        orders = await database_service.get_user_orders(
+        page = await database_service.get_user_orders(
             user_id=current_user['user_id'],
             limit=limit,
-            offset=offset
+            cursor=cursor,
+            count=count
         )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"获取订单列表失败: {str(e)}"
+        )
+    
+    return FastJSONResponse({
+        "orders": [order.to_response() for order in page["orders"]],
+        "limit": limit,
+        "next_cursor": page["next_cursor"],
+        "total": page["total"]
+    })
+
+async def _load_order_status(out_trade_no: str, current_user: dict) -> OrderStatusRow:
+    """
+    查询订单状态并校验订单归属
+    
+    Args:
+        out_trade_no: 商户订单号
+        current_user: 当前用户信息
         
-        return {
-            "orders": orders,
-            "page": page,
-            "limit": limit,
-            "total": len(orders)
-        }
+    Returns:
+        OrderStatusRow: 订单状态行
         
+    Raises:
+        HTTPException: 订单不存在、无权限查看或查询失败时抛出异常
+    """
+    try:
+        order = await database_service.get_order_status_row(out_trade_no)
     except Exception as e:
+        logger.exception("查询订单状态失败")
         raise HTTPException(
             status_code=500,
-            detail=f"获取订单列表失败: {str(e)}"
+            detail=f"查询订单状态失败: {str(e)}"
         )
+    
+    if order is None:
+        raise HTTPException(
+            status_code=404,
+            detail="订单不存在"
+        )
+    
+    # 验证用户权限（只能查看自己的订单）
+    if order.user_id != current_user['user_id']:
+        raise HTTPException(
+            status_code=403,
+            detail="无权限查看此订单"
+        )
+    
+    return order
 
 @app.get("/api/get_order_status/{out_trade_no}")
 async def get_order_status(
@@ -781,45 +1474,50 @@ async def get_order_status(
     Raises:
         HTTPException: 订单不存在或无权限查看时抛出异常
     """
-    try:
-        # 查询订单信息
-        order = await database_service.get_order_by_trade_no(out_trade_no)
-        
-        if not order:
-            raise HTTPException(
-                status_code=404,
-                detail="订单不存在"
-            )
-        
-        # 验证用户权限（只能查看自己的订单）
-        if order['user_id'] != current_user['user_id']:
-            raise HTTPException(
-                status_code=403,
-                detail="无权限查看此订单"
-            )
-        
-        # 返回订单状态信息
-        return {
-            "out_trade_no": order['out_trade_no'],
-            "status": order['status'],
-            "name": order['name'],
-            "amount": float(order['amount']),
-            "payment_type": order['payment_type'],
-            "created_at": order['created_at'],
-            "paid_at": order.get('paid_at'),
-            "qr_code": order.get('qr_code'),
-            "pay_url": order.get('pay_url')
-        }
+    order = await _load_order_status(out_trade_no, current_user)
+    return FastJSONResponse(order.to_response())
+
+@app.get("/api/wait_order_status/{out_trade_no}")
+async def wait_order_status(
+    out_trade_no: str,
+    since: str = "pending",
+    timeout: float = ORDER_STATUS_WAIT_MAX_TIMEOUT,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    订单状态长轮询接口
+    
+    订单状态与 since 不同时立即返回；否则挂起等待支付回调推送状态变更，
+    并每隔 ORDER_STATUS_RECHECK_INTERVAL 秒重新查询数据库（回调由其他实例处理时收不到进程内通知），
+    超时后返回当前状态，前端随即发起下一次长轮询
+    
+    Args:
+        out_trade_no: 商户订单号
+        since: 前端已知的订单状态
+        timeout: 最长等待时间（秒），不超过 ORDER_STATUS_WAIT_MAX_TIMEOUT
+        current_user: 当前用户信息
         
-    except HTTPException:
-        # 重新抛出 HTTP 异常
-        raise
-    except Exception as e:
-        print(f"查询订单状态失败: {str(e)}")
-        raise HTTPException(
-            status_code=500,
-            detail=f"查询订单状态失败: {str(e)}"
-        )
+    Returns:
+        dict: 订单状态信息（同 /api/get_order_status）
+    """
+    deadline = time.monotonic() + min(max(timeout, 0), ORDER_STATUS_WAIT_MAX_TIMEOUT)
+    
+    # 先订阅再查询，避免查询后、等待前的状态变更被遗漏
+    with order_status_bus.subscribe(out_trade_no) as subscription:
+        order = await _load_order_status(out_trade_no, current_user)
+        while order.status == since:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            event = await subscription.wait(min(remaining, ORDER_STATUS_RECHECK_INTERVAL))
+            if event is not None:
+                order.status = event["status"]
+                order.paid_at = event.get("paid_at", order.paid_at)
+                break
+            if deadline - time.monotonic() > 0:
+                order = await _load_order_status(out_trade_no, current_user)
+        
+        return FastJSONResponse(order.to_response())
 
 @app.get("/api/user/profile")
 async def get_user_profile(current_user: dict = Depends(get_current_user)):
@@ -863,5 +1561,7 @@ async def update_user_profile(
     }
 
 if __name__ == "__main__":
+    import uvicorn
+    
     # 运行服务器
     uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
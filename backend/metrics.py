@@ -0,0 +1,271 @@
+"""
+指标模块 - 轻量的 Prometheus 文本格式指标
+
+只实现本服务需要的 Counter / Histogram / 回调 Gauge / 回调 Counter，不依赖 prometheus_client。
+每个指标限制标签组合数量，超出后归入 "other"，防止基数失控。
+"""
+import math
+import threading
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+# 默认延迟分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# 每个指标最多保留的标签组合数
+MAX_SERIES_PER_METRIC = 200
+
+OVERFLOW_LABEL = "other"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    """指标基类：负责标签校验和基数限制"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        if key not in self._series and len(self._series) >= MAX_SERIES_PER_METRIC:
+            key = tuple(OVERFLOW_LABEL for _ in self.label_names)
+        return key
+
+    def _header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}"
+        ]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增计数器"""
+
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        with self._lock:
+            key = self._key(labels)
+            self._series[key] = self._series.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            for key, value in self._series.items():
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class Histogram(_Metric):
+    """分桶直方图"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels: str) -> None:
+        with self._lock:
+            key = self._key(labels)
+            series = self._series.get(key)
+            if series is None:
+                # [各分桶计数..., 总和]
+                series = [0] * len(self.buckets) + [0.0]
+                self._series[key] = series
+
+            for index, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    series[index] += 1
+                    break
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        with self._lock:
+            for key, series in self._series.items():
+                cumulative = 0
+                for upper_bound, count in zip(self.buckets, series):
+                    cumulative += count
+                    labels = _format_labels(self.label_names, key, f'le="{_format_value(upper_bound)}"')
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+                lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class CallbackGauge(_Metric):
+    """抓取时调用回调函数取值的 Gauge（用于等待数、平均耗时等已有统计）"""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Dict[Tuple[str, ...], float]],
+        label_names: Sequence[str] = ()
+    ):
+        super().__init__(name, documentation, label_names)
+        self._callback = callback
+
+    def render(self) -> List[str]:
+        lines = self._header()
+        try:
+            values = self._callback()
+        except Exception:
+            return lines
+        for key, value in values.items():
+            if value is None:
+                continue
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+
+class CallbackCounter(CallbackGauge):
+    """抓取时调用回调函数取值的 Counter（回调返回只增不减的累计值，例如缓存命中次数）"""
+
+    kind = "counter"
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _register(self, metric: _Metric) -> _Metric:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Optional[Sequence[float]] = None
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets or DEFAULT_BUCKETS))
+
+    def gauge_callback(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Dict[Tuple[str, ...], float]],
+        label_names: Sequence[str] = ()
+    ) -> CallbackGauge:
+        return self._register(CallbackGauge(name, documentation, callback, label_names))
+
+    def counter_callback(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Dict[Tuple[str, ...], float]],
+        label_names: Sequence[str] = ()
+    ) -> CallbackCounter:
+        return self._register(CallbackCounter(name, documentation, callback, label_names))
+
+    def render(self) -> str:
+        """
+        输出 Prometheus 文本格式
+
+        Returns:
+            str: 所有指标的文本表示
+        """
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# 全局注册表
+registry = MetricsRegistry()
+
+# ===== 服务指标 =====
+
+http_request_duration = registry.histogram(
+    "herhzzz_http_request_duration_seconds",
+    "HTTP 请求耗时（按路由模板）",
+    ("method", "route", "status")
+)
+
+db_query_duration = registry.histogram(
+    "herhzzz_db_query_duration_seconds",
+    "DatabaseService 数据库请求耗时（含线程池排队）",
+    ("method", "rpc", "result")
+)
+
+zpay_create_payment_duration = registry.histogram(
+    "herhzzz_zpay_create_payment_duration_seconds",
+    "PaymentService.create_payment 耗时",
+    ("result",)
+)
+
+notify_outcomes = registry.counter(
+    "herhzzz_payment_notify_total",
+    "支付通知处理结果",
+    ("endpoint", "outcome")
+)
+
+outbox_tasks = registry.counter(
+    "herhzzz_payment_outbox_tasks_total",
+    "支付后续任务处理结果",
+    ("kind", "result")
+)
+
+orders_expired = registry.counter(
+    "herhzzz_orders_expired_total",
+    "定时清理标记为过期的待支付订单数"
+)
+
+rate_limited = registry.counter(
+    "herhzzz_rate_limited_total",
+    "被限流拒绝的请求数",
+    ("scope",)
+)
+
+zpay_unavailable = registry.counter(
+    "herhzzz_zpay_unavailable_total",
+    "ZPay 不可用导致下单快速失败的次数",
+    ("reason",)
+)
@@ -56,36 +56,8 @@ class CreateSubscriptionOrderRequest(BaseModel):
     subscription_type: SubscriptionType = Field(..., description="订阅类型")
     payment_type: Literal["alipay"] = Field(..., description="支付方式（仅支持支付宝二维码）")
     user_id: Optional[str] = Field(None, description="用户ID（可选，可从session中获取）")
-    
-    @property
-    def subscription_duration_days(self) -> Optional[int]:
-        """获取订阅时长（天数）"""
-        duration_map = {
-            SubscriptionType.THREE_MONTHS: 90,
-            SubscriptionType.ONE_YEAR: 365,
-            SubscriptionType.LIFETIME: None  # 永久会员
-        }
-        return duration_map.get(self.subscription_type)
-    
-    @property
-    def subscription_name(self) -> str:
-        """获取订阅名称"""
-        name_map = {
-            SubscriptionType.THREE_MONTHS: "HERHZZZ 3个月会员",
-            SubscriptionType.ONE_YEAR: "HERHZZZ 1年会员", 
-            SubscriptionType.LIFETIME: "HERHZZZ 永久会员"
-        }
-        return name_map.get(self.subscription_type, "HERHZZZ 会员")
-    
-    @property
-    def subscription_amount(self) -> float:
-        """获取订阅价格"""
-        price_map = {
-            SubscriptionType.THREE_MONTHS: 29.99,
-            SubscriptionType.ONE_YEAR: 99.99,
-            SubscriptionType.LIFETIME: 299.99
-        }
-        return price_map.get(self.subscription_type, 0.0)
+
+    # 名称、价格和时长由订阅套餐注册表（subscription_plans.py）提供
 
 
 # 已删除包含跳转链接的订阅响应模型
@@ -0,0 +1,98 @@
+"""
+订单状态通知总线 - 进程内的订单状态变更推送
+"""
+import asyncio
+from typing import Any, Dict, Optional, Set
+
+
+class OrderStatusSubscription:
+    """单个等待者对某个订单状态变更的订阅"""
+
+    def __init__(self, bus: "OrderStatusBus", out_trade_no: str):
+        self._bus = bus
+        self.out_trade_no = out_trade_no
+        self._future: asyncio.Future = asyncio.get_running_loop().create_future()
+
+    async def wait(self, timeout: float) -> Optional[Dict[str, Any]]:
+        """
+        等待订单状态变更
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            Optional[Dict[str, Any]]: 状态变更事件，超时返回 None
+        """
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._future), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def _deliver(self, event: Dict[str, Any]) -> None:
+        if not self._future.done():
+            self._future.set_result(event)
+
+    def __enter__(self) -> "OrderStatusSubscription":
+        self._bus._add(self)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._bus._remove(self)
+        if not self._future.done():
+            self._future.cancel()
+
+
+class OrderStatusBus:
+    """
+    订单状态通知总线
+
+    长轮询请求先订阅再查询数据库，避免查询与订阅之间发生的状态变更被遗漏；
+    支付回调结算订单后发布事件，唤醒该订单的所有等待者。
+    仅在当前进程内有效，回调由其他 worker / 实例处理时，等待者靠定期重新查询数据库发现状态变更。
+    """
+
+    def __init__(self):
+        self._subscriptions: Dict[str, Set[OrderStatusSubscription]] = {}
+
+    def subscribe(self, out_trade_no: str) -> OrderStatusSubscription:
+        """
+        订阅订单状态变更（配合 with 语句使用）
+
+        Args:
+            out_trade_no: 商户订单号
+
+        Returns:
+            OrderStatusSubscription: 订阅对象
+        """
+        return OrderStatusSubscription(self, out_trade_no)
+
+    def publish(self, out_trade_no: str, event: Dict[str, Any]) -> int:
+        """
+        发布订单状态变更事件
+
+        Args:
+            out_trade_no: 商户订单号
+            event: 事件内容（至少包含 status）
+
+        Returns:
+            int: 被唤醒的等待者数量
+        """
+        subscriptions = self._subscriptions.pop(out_trade_no, set())
+        for subscription in subscriptions:
+            subscription._deliver(event)
+        return len(subscriptions)
+
+    def waiter_count(self) -> int:
+        """当前等待中的长轮询请求数"""
+        return sum(len(subscriptions) for subscriptions in self._subscriptions.values())
+
+    def _add(self, subscription: OrderStatusSubscription) -> None:
+        self._subscriptions.setdefault(subscription.out_trade_no, set()).add(subscription)
+
+    def _remove(self, subscription: OrderStatusSubscription) -> None:
+        subscriptions = self._subscriptions.get(subscription.out_trade_no)
+        if subscriptions is None:
+            return
+        subscriptions.discard(subscription)
+        if not subscriptions:
+            del self._subscriptions[subscription.out_trade_no]
@@ -0,0 +1,104 @@
+"""
+订单行类型 - 按调用场景只解码需要的列
+
+每个行类型声明自己需要的 COLUMNS，查询时只 select 这些列；
+行对象使用 __slots__，解码一次后直接输出接口响应。
+"""
+from typing import Any, Dict, Optional, Tuple
+
+
+class OrderStatusRow:
+    """订单状态查询（/api/get_order_status、/api/wait_order_status）使用的订单行"""
+
+    __slots__ = (
+        "out_trade_no", "user_id", "status", "name", "amount", "payment_type",
+        "created_at", "paid_at", "qr_code", "pay_url"
+    )
+
+    COLUMNS: Tuple[str, ...] = __slots__
+
+    def __init__(self, row: Dict[str, Any]):
+        """
+        从 PostgREST 返回的行解码
+
+        Args:
+            row: 至少包含 COLUMNS 中各列的字典
+        """
+        self.out_trade_no: str = row["out_trade_no"]
+        self.user_id: str = row["user_id"]
+        self.status: str = row["status"]
+        self.name: str = row["name"]
+        self.amount: float = float(row["amount"])
+        self.payment_type: str = row["payment_type"]
+        self.created_at: str = row["created_at"]
+        self.paid_at: Optional[str] = row.get("paid_at")
+        self.qr_code: Optional[str] = row.get("qr_code")
+        self.pay_url: Optional[str] = row.get("pay_url")
+
+    def to_response(self) -> Dict[str, Any]:
+        """
+        生成接口响应（不包含 user_id）
+
+        Returns:
+            Dict[str, Any]: 订单状态信息
+        """
+        return {
+            "out_trade_no": self.out_trade_no,
+            "status": self.status,
+            "name": self.name,
+            "amount": self.amount,
+            "payment_type": self.payment_type,
+            "created_at": self.created_at,
+            "paid_at": self.paid_at,
+            "qr_code": self.qr_code,
+            "pay_url": self.pay_url
+        }
+
+
+class OrderListRow:
+    """订单列表（/api/orders）使用的订单行"""
+
+    __slots__ = (
+        "id", "out_trade_no", "name", "amount", "payment_type", "status",
+        "order_type", "subscription_type", "paid_at", "created_at"
+    )
+
+    COLUMNS: Tuple[str, ...] = __slots__
+
+    def __init__(self, row: Dict[str, Any]):
+        """
+        从 PostgREST 返回的行解码
+
+        Args:
+            row: 至少包含 COLUMNS 中各列的字典
+        """
+        self.id: str = row["id"]
+        self.out_trade_no: str = row["out_trade_no"]
+        self.name: str = row["name"]
+        self.amount: float = float(row["amount"])
+        self.payment_type: str = row["payment_type"]
+        self.status: str = row["status"]
+        self.order_type: str = row.get("order_type") or "payment"
+        self.subscription_type: Optional[str] = row.get("subscription_type")
+        self.paid_at: Optional[str] = row.get("paid_at")
+        self.created_at: str = row["created_at"]
+
+    def to_response(self) -> Dict[str, Any]:
+        """
+        生成接口响应
+
+        Returns:
+            Dict[str, Any]: 订单列表项
+        """
+        return {
+            "id": self.id,
+            "out_trade_no": self.out_trade_no,
+            "name": self.name,
+            "amount": self.amount,
+            "payment_type": self.payment_type,
+            "status": self.status,
+            "order_type": self.order_type,
+            "subscription_type": self.subscription_type,
+            "paid_at": self.paid_at,
+            "created_at": self.created_at
+        }
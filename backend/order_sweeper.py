@@ -0,0 +1,149 @@
+"""
+过期订单清理 - 定时把超时未支付的订单标记为 expired
+
+每次扫码都会创建一个待支付订单，用户放弃支付后订单一直停在 pending。
+OrderSweeper 在后台按 ORDER_SWEEP_INTERVAL 定时运行，每轮调用 expire_stale_orders
+分批更新（每批一个短事务），批与批之间稍作停顿，直到没有可清理的订单或达到单轮上限。
+多个实例同时运行时通过 SKIP LOCKED 各自处理不同的行。
+清理时不向 ZPay 核对：支付通知丢失的已支付订单由 reconcile_orders.py 回查最近过期的订单补结算。
+
+也可以单独运行一轮（例如在定时任务中）：
+    python order_sweeper.py
+"""
+import os
+import time
+import asyncio
+import logging
+from typing import Any, Dict, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class OrderSweeper:
+    """过期待支付订单清理"""
+
+    def __init__(self, database_service):
+        """
+        初始化清理任务（参数从环境变量读取）
+
+        Args:
+            database_service: DatabaseService 实例
+        """
+        self.database_service = database_service
+        self.interval = float(os.getenv("ORDER_SWEEP_INTERVAL", "300"))
+        self.expire_after = int(float(os.getenv("ORDER_EXPIRE_AFTER_MINUTES", "30")) * 60)
+        self.batch_size = int(os.getenv("ORDER_SWEEP_BATCH_SIZE", "1000"))
+        self.max_batches = int(os.getenv("ORDER_SWEEP_MAX_BATCHES", "50"))
+        self.batch_pause = float(os.getenv("ORDER_SWEEP_BATCH_PAUSE", "0.05"))
+
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.expired = 0
+        self.last_run: Dict[str, Any] = {}
+
+    def start(self) -> None:
+        """启动后台定时清理（在事件循环中调用，ORDER_SWEEP_INTERVAL 为 0 时不启动）"""
+        if self._task is not None or self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._run(), name="order-sweeper")
+
+    async def stop(self) -> None:
+        """停止后台清理，进行中的批次所在事务由数据库自行完成或回滚"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取清理统计
+
+        Returns:
+            Dict[str, Any]: 运行轮数、累计过期订单数和最近一轮的结果
+        """
+        return {
+            "running": self._task is not None,
+            "runs": self.runs,
+            "expired": self.expired,
+            "last_run": self.last_run
+        }
+
+    async def sweep(self) -> Dict[str, Any]:
+        """
+        执行一轮清理
+
+        Returns:
+            Dict[str, Any]: 本轮过期的订单数、批次数、耗时和每秒处理的行数
+        """
+        started = time.monotonic()
+        expired = 0
+        batches = 0
+        while batches < self.max_batches:
+            count = await self.database_service.expire_stale_orders(self.expire_after, self.batch_size)
+            batches += 1
+            expired += count
+            if count < self.batch_size:
+                break
+            if self.batch_pause > 0:
+                await asyncio.sleep(self.batch_pause)
+
+        elapsed = time.monotonic() - started
+        result = {
+            "expired": expired,
+            "batches": batches,
+            "elapsed_seconds": round(elapsed, 3),
+            "rows_per_second": round(expired / elapsed, 1) if elapsed > 0 else 0.0,
+            # 达到单轮上限时还有积压，下一轮继续
+            "backlog": batches >= self.max_batches
+        }
+
+        self.runs += 1
+        self.expired += expired
+        self.last_run = result
+        if expired:
+            metrics.orders_expired.inc(expired)
+        logger.info("过期订单清理完成", extra=result)
+        return result
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                result = await self.sweep()
+                delay = self.batch_pause if result["backlog"] else self.interval
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("过期订单清理失败", extra={"error": str(e)})
+                delay = self.interval
+            await asyncio.sleep(delay)
+
+
+async def _sweep_once() -> Dict[str, Any]:
+    from database_service import DatabaseService
+
+    database_service = DatabaseService()
+    try:
+        return await OrderSweeper(database_service).sweep()
+    finally:
+        database_service.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from log_config import setup_logging, shutdown_logging
+
+    load_dotenv()
+    setup_logging()
+    try:
+        summary = asyncio.run(_sweep_once())
+    finally:
+        shutdown_logging()
+
+    print(
+        f"过期 {summary['expired']} 个订单，{summary['batches']} 批，"
+        f"耗时 {summary['elapsed_seconds']}s（{summary['rows_per_second']} 行/秒）"
+        + ("，仍有积压" if summary["backlog"] else "")
+    )
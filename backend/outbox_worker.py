@@ -0,0 +1,247 @@
+"""
+支付后续任务 worker - 处理 payment_outbox 中的会员发放任务
+
+支付通知只把订单改为 paid 并在同一事务中写入任务，立即应答 ZPay；
+后台 worker 批量领取任务，逐个发放会员，成功的批量确认，失败的按指数退避重试。
+任务带租约领取，worker 崩溃后租约到期的任务会被其他 worker 重新领取。
+
+没有后台 worker 时（Serverless 部署，BACKGROUND_TASKS_ENABLED 关闭），支付通知请求直接发放会员，
+任务仍保留在队列中，由定时调用 drain()（/api/cron/payment-outbox）兜底重试和确认。
+
+也可以单独运行，处理完当前积压后退出（例如在定时任务中兜底）：
+    python outbox_worker.py
+"""
+import os
+import random
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxWorker:
+    """支付后续任务 worker 池"""
+
+    def __init__(self, database_service):
+        """
+        初始化 worker 池（参数从环境变量读取）
+
+        Args:
+            database_service: DatabaseService 实例
+        """
+        self.database_service = database_service
+        self.concurrency = int(os.getenv("OUTBOX_WORKERS", "2"))
+        self.batch_size = int(os.getenv("OUTBOX_BATCH_SIZE", "20"))
+        self.poll_interval = float(os.getenv("OUTBOX_POLL_INTERVAL", "5"))
+        self.lease_seconds = int(os.getenv("OUTBOX_LEASE_SECONDS", "60"))
+        self.max_attempts = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "8"))
+        self.base_backoff = float(os.getenv("OUTBOX_BASE_BACKOFF", "2"))
+        self.max_backoff = float(os.getenv("OUTBOX_MAX_BACKOFF", "600"))
+
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self.processed = 0
+        self.failed = 0
+        self.dead = 0
+
+    def start(self) -> None:
+        """启动后台 worker（在事件循环中调用）"""
+        if self._tasks:
+            return
+        self._wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run(index), name=f"outbox-worker-{index}")
+            for index in range(self.concurrency)
+        ]
+
+    async def stop(self) -> None:
+        """停止后台 worker，已领取未完成的任务在租约到期后重新处理"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def running(self) -> bool:
+        """后台 worker 是否在运行"""
+        return bool(self._tasks)
+
+    def wake(self) -> None:
+        """唤醒空闲的 worker 立即领取任务（支付通知写入任务后调用）"""
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def dispatch(self, order_id: str) -> None:
+        """
+        处理支付通知刚写入的会员发放任务
+
+        后台 worker 在运行时只唤醒 worker；否则在当前请求中直接发放（尽力而为，失败只记录日志）。
+        直接发放后任务仍留在队列中：发放失败时由 drain() 按退避重试，
+        成功时之后被领取，grant_membership 返回 already_granted 并确认完成
+
+        Args:
+            order_id: 订单ID
+        """
+        if self.running:
+            self.wake()
+            return
+
+        try:
+            grant = await self.database_service.grant_membership(order_id)
+        except Exception as e:
+            metrics.outbox_tasks.inc(kind="grant_membership", result="inline_error")
+            logger.warning("直接发放会员失败，等待定时任务重试", extra={"order_id": order_id, "error": str(e)})
+            return
+
+        metrics.outbox_tasks.inc(kind="grant_membership", result=grant["outcome"])
+        logger.info("会员已在支付通知中直接发放", extra={
+            "order_id": order_id,
+            "outcome": grant["outcome"],
+            "user_id": grant.get("user_id")
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取处理统计
+
+        Returns:
+            Dict[str, Any]: worker 数量和累计完成/失败/放弃的任务数
+        """
+        return {
+            "workers": len(self._tasks),
+            "processed": self.processed,
+            "failed": self.failed,
+            "dead": self.dead
+        }
+
+    async def drain(self, max_seconds: Optional[float] = None) -> int:
+        """
+        处理当前所有到期任务，没有可领取的任务时返回
+
+        Args:
+            max_seconds: 最长处理时间（秒），超过后处理完当前批次即返回，剩余任务留给下一次
+
+        Returns:
+            int: 本次处理的任务数
+        """
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        total = 0
+        while True:
+            handled = await self._process_batch()
+            total += handled
+            if handled == 0 or (max_seconds is not None and loop.time() - started >= max_seconds):
+                return total
+
+    async def _run(self, index: int) -> None:
+        while True:
+            try:
+                handled = await self._process_batch()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error("领取支付后续任务失败", extra={"worker": index, "error": str(e)})
+                handled = 0
+
+            if handled:
+                continue
+
+            # 没有任务时等待唤醒或轮询间隔
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _process_batch(self) -> int:
+        batch = await self.database_service.claim_outbox_batch(self.batch_size, self.lease_seconds)
+        if not batch:
+            return 0
+
+        results = await asyncio.gather(*(self._process(task) for task in batch), return_exceptions=True)
+
+        done_ids = []
+        for task, result in zip(batch, results):
+            if isinstance(result, Exception):
+                await self._record_failure(task, result)
+            else:
+                done_ids.append(task["id"])
+
+        if done_ids:
+            await self.database_service.complete_outbox(done_ids)
+            self.processed += len(done_ids)
+
+        return len(batch)
+
+    async def _process(self, task: Dict[str, Any]) -> Dict[str, Any]:
+        if task["kind"] != "grant_membership":
+            raise ValueError(f"未知的任务类型: {task['kind']}")
+
+        grant = await self.database_service.grant_membership(task["order_id"])
+        metrics.outbox_tasks.inc(kind=task["kind"], result=grant["outcome"])
+        logger.info("会员发放任务完成", extra={
+            "order_id": task["order_id"],
+            "outcome": grant["outcome"],
+            "user_id": grant.get("user_id")
+        })
+        return grant
+
+    def _retry_delay(self, attempts: int) -> int:
+        """指数退避（带随机抖动，避免失败任务同时重试）"""
+        delay = min(self.max_backoff, self.base_backoff * (2 ** max(attempts - 1, 0)))
+        return max(1, int(delay * random.uniform(0.8, 1.2)))
+
+    async def _record_failure(self, task: Dict[str, Any], error: Exception) -> None:
+        self.failed += 1
+        attempts = task.get("attempts", 1)
+        try:
+            updated = await self.database_service.fail_outbox(
+                task["id"], str(error), self._retry_delay(attempts), self.max_attempts
+            )
+        except Exception as e:
+            # 记录失败也失败时，任务在租约到期后会被重新领取
+            logger.error("记录支付后续任务失败状态失败", extra={"task_id": task["id"], "error": str(e)})
+            return
+
+        status = updated.get("status") if updated else None
+        metrics.outbox_tasks.inc(kind=task["kind"], result="dead" if status == "dead" else "retry")
+        if status == "dead":
+            self.dead += 1
+            logger.error("支付后续任务超过最大重试次数", extra={
+                "task_id": task["id"],
+                "order_id": task["order_id"],
+                "error": str(error)
+            })
+        else:
+            logger.warning("支付后续任务失败，稍后重试", extra={
+                "task_id": task["id"],
+                "order_id": task["order_id"],
+                "attempts": attempts,
+                "error": str(error)
+            })
+
+
+async def _drain_once() -> None:
+    from database_service import DatabaseService
+
+    database_service = DatabaseService()
+    try:
+        handled = await OutboxWorker(database_service).drain()
+        logger.info("支付后续任务处理完成", extra={"handled": handled})
+    finally:
+        database_service.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from log_config import setup_logging, shutdown_logging
+
+    load_dotenv()
+    setup_logging()
+    try:
+        asyncio.run(_drain_once())
+    finally:
+        shutdown_logging()
@@ -0,0 +1,326 @@
+"""
+音频离线打包 - 多码率 AAC + HLS 播放列表
+
+把 audio_access_control 中的每个音频转成 audio_hls.RENDITIONS 定义的几档码率（AAC-LC，fMP4 分片），
+生成 HLS 媒体播放列表和多码率主播放列表。分片按内容 SHA-256 命名并在所有音频间共享，
+重复打包时内容不变的分片名称不变，已缓存的分片继续有效。
+源文件摘要和码率配置都没有变化的音频直接跳过。
+
+需要 ffmpeg（PATH 中或通过 FFMPEG_BIN 指定）。Vercel 构建环境没有 ffmpeg，打包在本地完成：
+打包产物写入 backend/media/hls 并提交到仓库，部署时由 vercel.json 的 includeFiles 随函数一起上传。
+
+用法：
+    python package_audio.py                         # 打包音频目录中的全部音频
+    python package_audio.py --tracks a.mp3 b.mp3    # 只打包指定音频（不访问数据库）
+    python package_audio.py --jobs 4 --force --prune
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import argparse
+import tempfile
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from audio_files import AudioFileStore
+from audio_hls import (
+    MANIFEST_FILE, RENDITIONS, Rendition, HlsStore, build_master_playlist, rewrite_playlist, track_stem
+)
+
+# 分片时长（秒）：越短首个分片越小、起播越快，但播放列表和请求数更多
+SEGMENT_SECONDS = int(os.getenv("AUDIO_HLS_SEGMENT_SECONDS", "6"))
+SAMPLE_RATE = 44100
+
+# 整晚定时（480 分钟）按单条音频循环播放估算流量
+SESSION_SECONDS = 480 * 60
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _config_key() -> str:
+    """码率和分片配置的摘要，配置变化时重新打包"""
+    config = [list(rendition) for rendition in RENDITIONS] + [SEGMENT_SECONDS, SAMPLE_RATE]
+    return hashlib.sha256(json.dumps(config).encode("utf-8")).hexdigest()[:16]
+
+
+class AudioPackager:
+    """音频打包"""
+
+    def __init__(self, source_dir: str, output_dir: str, ffmpeg: str, jobs: int = 2):
+        """
+        初始化打包任务
+
+        Args:
+            source_dir: 源 MP3 目录
+            output_dir: 打包输出目录（AUDIO_HLS_DIR）
+            ffmpeg: ffmpeg 可执行文件
+            jobs: 同时运行的 ffmpeg 进程数
+        """
+        self.source_dir = source_dir
+        self.output_dir = output_dir
+        self.segments_dir = os.path.join(output_dir, "segments")
+        self.ffmpeg = ffmpeg
+        self.jobs = max(1, jobs)
+        self.manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+
+    def load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(self.manifest_path, encoding="utf-8") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return {"tracks": {}}
+
+    def save_manifest(self, manifest: Dict[str, Any]) -> None:
+        """原子写入 manifest（服务端按修改时间重新加载）"""
+        manifest["generated_at"] = int(time.time())
+        self._write_atomic(self.manifest_path, json.dumps(manifest, ensure_ascii=False, indent=2))
+
+    @staticmethod
+    def _write_atomic(path: str, content: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as file:
+            file.write(content)
+        os.replace(temp_path, path)
+
+    def package(self, audio_names: List[str], force: bool = False) -> Dict[str, Any]:
+        """
+        打包音频
+
+        Args:
+            audio_names: 音频文件名列表
+            force: 忽略摘要，全部重新打包
+
+        Returns:
+            Dict[str, Any]: 更新后的 manifest
+        """
+        os.makedirs(self.segments_dir, exist_ok=True)
+        manifest = self.load_manifest()
+        tracks = manifest.setdefault("tracks", {})
+        config_key = _config_key()
+
+        pending: List[Tuple[str, str, str]] = []
+        for audio_name in audio_names:
+            source = os.path.join(self.source_dir, audio_name)
+            source_sha256 = _sha256(source)
+            existing = tracks.get(audio_name)
+            if (
+                not force and existing
+                and existing.get("source_sha256") == source_sha256
+                and existing.get("config") == config_key
+            ):
+                print(f"⏭️  {audio_name} 未变化，跳过")
+                continue
+            pending.append((audio_name, source, source_sha256))
+
+        with ThreadPoolExecutor(max_workers=self.jobs) as executor:
+            futures = {
+                (audio_name, rendition.name): executor.submit(self._encode, audio_name, source, rendition)
+                for audio_name, source, _ in pending
+                for rendition in RENDITIONS
+            }
+
+            for audio_name, source, source_sha256 in pending:
+                renditions = {}
+                for rendition in RENDITIONS:
+                    renditions[rendition.name] = futures[(audio_name, rendition.name)].result()
+
+                self._write_atomic(
+                    os.path.join(self.output_dir, track_stem(audio_name), "master.m3u8"),
+                    build_master_playlist(renditions)
+                )
+                tracks[audio_name] = {
+                    "source_sha256": source_sha256,
+                    "source_bytes": os.path.getsize(source),
+                    "config": config_key,
+                    "duration_seconds": renditions[RENDITIONS[0].name]["duration_seconds"],
+                    "renditions": renditions
+                }
+                # 每个音频完成后保存一次，中断后重新运行可以从断点继续
+                self.save_manifest(manifest)
+                print(f"✅ {audio_name}: " + ", ".join(
+                    f"{name} {info['bytes'] / 1024:.0f}KB" for name, info in renditions.items()
+                ))
+
+        return manifest
+
+    def _encode(self, audio_name: str, source: str, rendition: Rendition) -> Dict[str, Any]:
+        """
+        用 ffmpeg 转码一档码率，分片按内容命名后移入共享分片目录
+
+        Returns:
+            Dict[str, Any]: 码率信息（码率、时长、总大小、平均/峰值带宽、分片数）
+        """
+        with tempfile.TemporaryDirectory(prefix="hls-") as work_dir:
+            command = [
+                self.ffmpeg, "-nostdin", "-hide_banner", "-loglevel", "error", "-y",
+                "-i", source,
+                "-map", "0:a:0", "-vn", "-map_metadata", "-1",
+                "-c:a", "aac", "-b:a", f"{rendition.bitrate_kbps}k",
+                "-ac", str(rendition.channels), "-ar", str(SAMPLE_RATE),
+                # 去掉编码器版本等不稳定信息，同样的输入得到同样的分片
+                "-fflags", "+bitexact", "-flags:a", "+bitexact",
+                "-f", "hls", "-hls_time", str(SEGMENT_SECONDS), "-hls_playlist_type", "vod",
+                "-hls_segment_type", "fmp4", "-hls_fmp4_init_filename", "init.mp4",
+                "-hls_segment_filename", os.path.join(work_dir, "segment_%05d.m4s"),
+                os.path.join(work_dir, "index.m3u8")
+            ]
+            completed = subprocess.run(command, capture_output=True, text=True)
+            if completed.returncode != 0:
+                raise RuntimeError(f"ffmpeg 转码 {audio_name} ({rendition.name}) 失败: {completed.stderr.strip()}")
+
+            with open(os.path.join(work_dir, "index.m3u8"), encoding="utf-8") as file:
+                playlist = file.read()
+
+            renamed: Dict[str, str] = {}
+            segment_sizes: Dict[str, int] = {}
+
+            def content_name(file_name: str) -> str:
+                if file_name not in renamed:
+                    path = os.path.join(work_dir, file_name)
+                    extension = os.path.splitext(file_name)[1]
+                    name = _sha256(path)[:20] + extension
+                    target = os.path.join(self.segments_dir, name)
+                    if not os.path.exists(target):
+                        shutil.move(path, target)
+                    renamed[file_name] = name
+                    segment_sizes[name] = os.path.getsize(target)
+                return f"../segments/{renamed[file_name]}"
+
+            playlist = rewrite_playlist(playlist, content_name)
+
+        durations = [
+            float(line.split(":", 1)[1].rstrip(","))
+            for line in playlist.splitlines() if line.startswith("#EXTINF:")
+        ]
+        duration = sum(durations)
+        total_bytes = sum(segment_sizes.values())
+        media_sizes = [
+            segment_sizes[os.path.basename(line)]
+            for line in playlist.splitlines() if line and not line.startswith("#")
+        ]
+        peak = max(
+            (size * 8 / seconds for size, seconds in zip(media_sizes, durations) if seconds > 0),
+            default=rendition.bitrate_kbps * 1000
+        )
+
+        self._write_atomic(
+            os.path.join(self.output_dir, track_stem(audio_name), f"{rendition.name}.m3u8"),
+            playlist
+        )
+        return {
+            "bitrate_kbps": rendition.bitrate_kbps,
+            "duration_seconds": round(duration, 3),
+            "bytes": total_bytes,
+            "average_bandwidth": int(total_bytes * 8 / duration) if duration else rendition.bitrate_kbps * 1000,
+            "peak_bandwidth": int(peak),
+            "segments": len(media_sizes)
+        }
+
+    def prune(self, manifest: Dict[str, Any]) -> int:
+        """
+        删除不再被任何播放列表引用的分片
+
+        Returns:
+            int: 删除的分片数
+        """
+        referenced = set()
+        for audio_name, track in manifest.get("tracks", {}).items():
+            for name in track["renditions"]:
+                path = os.path.join(self.output_dir, track_stem(audio_name), f"{name}.m3u8")
+                with open(path, encoding="utf-8") as file:
+                    rewrite_playlist(file.read(), lambda segment: referenced.add(segment) or segment)
+
+        removed = 0
+        for file_name in os.listdir(self.segments_dir):
+            if file_name not in referenced:
+                os.remove(os.path.join(self.segments_dir, file_name))
+                removed += 1
+        return removed
+
+
+def print_report(manifest: Dict[str, Any], audio_names: List[str]) -> None:
+    """输出每个音频的大小对比和整晚循环播放的流量估算"""
+    print("=" * 78)
+    print(f"{'音频':<24} | {'MP3':>8} | " + " | ".join(f"{r.name:>8}" for r in RENDITIONS) + " | 整晚 MP3→mid")
+    print("-" * 78)
+    for audio_name in audio_names:
+        track = manifest["tracks"].get(audio_name)
+        if not track:
+            continue
+        renditions = track["renditions"]
+        duration = track["duration_seconds"] or 1
+        loops = SESSION_SECONDS / duration
+        mp3_session = track["source_bytes"] * loops / 1024 / 1024
+        mid_session = renditions.get("mid", {}).get("bytes", 0) * loops / 1024 / 1024
+        sizes = " | ".join(
+            f"{renditions[r.name]['bytes'] / 1024:>6.0f}KB" if r.name in renditions else f"{'-':>8}"
+            for r in RENDITIONS
+        )
+        print(
+            f"{audio_name:<24} | {track['source_bytes'] / 1024:>6.0f}KB | {sizes} | "
+            f"{mp3_session:.0f}MB→{mid_session:.0f}MB"
+        )
+    print("=" * 78)
+    print("📝 整晚流量按 480 分钟无缓存循环估算；分片按内容命名，命中浏览器/CDN 缓存时循环播放不再产生流量")
+
+
+async def _catalog_audio_names() -> List[str]:
+    from database_service import DatabaseService
+
+    database_service = DatabaseService()
+    try:
+        catalog = await database_service.audio_catalog.get()
+        return [audio["audio_name"] for phase in catalog.phases_for(True) for audio in phase["audios"]]
+    finally:
+        database_service.close()
+
+
+def main() -> int:
+    from dotenv import load_dotenv
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="音频离线打包（多码率 AAC + HLS）")
+    parser.add_argument("--source", default=None, help="源 MP3 目录，默认 AUDIO_FILES_DIR 或 backend/media/audio")
+    parser.add_argument("--output", default=None, help="输出目录，默认 AUDIO_HLS_DIR 或 backend/media/hls")
+    parser.add_argument("--tracks", nargs="+", default=None, help="只打包这些音频（不读取 audio_access_control）")
+    parser.add_argument("--jobs", type=int, default=os.cpu_count() or 2, help="同时运行的 ffmpeg 进程数")
+    parser.add_argument("--force", action="store_true", help="忽略摘要，全部重新打包")
+    parser.add_argument("--prune", action="store_true", help="删除不再被引用的分片")
+    args = parser.parse_args()
+
+    ffmpeg: Optional[str] = os.getenv("FFMPEG_BIN") or shutil.which("ffmpeg")
+    if not ffmpeg:
+        print("❌ 未找到 ffmpeg，请安装 ffmpeg 或通过 FFMPEG_BIN 指定路径")
+        return 1
+
+    audio_files = AudioFileStore(args.source)
+    output_dir = HlsStore(args.output).directory
+    audio_names = args.tracks or asyncio.run(_catalog_audio_names())
+
+    available = [name for name in audio_names if audio_files.resolve(name) is not None]
+    for name in sorted(set(audio_names) - set(available)):
+        print(f"⚠️  {name} 在 {audio_files.directory} 中不存在，跳过")
+
+    packager = AudioPackager(audio_files.directory, output_dir, ffmpeg, jobs=args.jobs)
+    manifest = packager.package(available, force=args.force)
+    if args.prune:
+        print(f"🧹 删除未引用的分片 {packager.prune(manifest)} 个")
+    print_report(manifest, available)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
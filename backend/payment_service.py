@@ -2,10 +2,29 @@
 支付服务 - 处理与 ZPay 的交互
 """
 import os
-import httpx
-from typing import Dict, Optional, Any
+import time
+import random
+import asyncio
+import logging
+from typing import TYPE_CHECKING, Dict, Optional, Any
 from models import ZPayRequest, ZPayResponse, CreateOrderRequest, CreateSubscriptionOrderRequest
 from utils import generate_md5_signature, normalize_payment_type
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from metrics import zpay_create_payment_duration, zpay_unavailable
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentUnavailableError(Exception):
+    """ZPay 暂时不可用（熔断中、下单截止时间已到、超时或连接失败），调用方应快速失败并提示稍后重试"""
+
+    def __init__(self, message: str, reason: str, retry_after: float = 0.0):
+        super().__init__(message)
+        self.reason = reason
+        self.retry_after = retry_after
 
 
 class PaymentService:
@@ -14,77 +33,145 @@ class PaymentService:
     def __init__(self):
         """初始化支付服务"""
         # 从环境变量读取 ZPay 配置（只保留二维码支付所需配置）
-        self.zpay_url = "https://zpayz.cn/mapi.php"
+        self.zpay_url = os.getenv("ZPAY_API_URL", "https://zpayz.cn/mapi.php")
+        self.zpay_query_url = os.getenv("ZPAY_QUERY_URL", "https://zpayz.cn/api.php")
         self.merchant_id = os.getenv("ZPAY_MERCHANT_ID")
         self.merchant_key = os.getenv("ZPAY_MERCHANT_KEY") 
         self.notify_url = os.getenv("ZPAY_NOTIFY_URL", "")
         
-        # 🔍 调试信息：显示ZPay配置加载状态
-        print("🔍 PaymentService 初始化:")
-        print(f"✅ ZPAY_MERCHANT_ID: {'已设置' if self.merchant_id else '❌ 未设置'}")
-        print(f"✅ ZPAY_MERCHANT_KEY: {'已设置' if self.merchant_key else '❌ 未设置'}")  
-        print(f"✅ ZPAY_NOTIFY_URL: {self.notify_url if self.notify_url else '❌ 未设置'}")
+        # ZPay配置加载状态
+        logger.info("PaymentService 初始化", extra={
+            "merchant_id_set": bool(self.merchant_id),
+            "merchant_key_set": bool(self.merchant_key),
+            "notify_url": self.notify_url or None
+        })
         
         if not self.merchant_id or not self.merchant_key:
             raise ValueError("缺少 ZPay 配置信息，请检查环境变量")
+        
+        # ZPay HTTP 连接池配置：所有订单共用一个长连接客户端，避免每单重复 DNS/TCP/TLS 握手
+        self.connect_timeout = float(os.getenv("ZPAY_CONNECT_TIMEOUT", "5"))
+        self.read_timeout = float(os.getenv("ZPAY_READ_TIMEOUT", "30"))
+        self.max_connections = int(os.getenv("ZPAY_MAX_CONNECTIONS", "20"))
+        self.max_keepalive_connections = int(os.getenv("ZPAY_MAX_KEEPALIVE_CONNECTIONS", "10"))
+        self.keepalive_expiry = float(os.getenv("ZPAY_KEEPALIVE_EXPIRY", "60"))
+        self._client: Optional["httpx.AsyncClient"] = None
+        
+        # 下单截止时间和熔断：ZPay 变慢时不让每个下单请求都挂满读超时，拖垮其他接口
+        self.create_deadline = float(os.getenv("ZPAY_CREATE_DEADLINE", "10"))
+        self.min_attempt_seconds = float(os.getenv("ZPAY_MIN_ATTEMPT_SECONDS", "0.5"))
+        self.connect_retries = int(os.getenv("ZPAY_CONNECT_RETRIES", "1"))
+        self.retry_backoff = float(os.getenv("ZPAY_RETRY_BACKOFF", "0.2"))
+        self.breaker = CircuitBreaker(
+            "ZPay",
+            failure_threshold=int(os.getenv("ZPAY_BREAKER_FAILURES", "5")),
+            recovery_seconds=float(os.getenv("ZPAY_BREAKER_RECOVERY_SECONDS", "30")),
+            half_open_max_calls=int(os.getenv("ZPAY_BREAKER_HALF_OPEN_CALLS", "1"))
+        )
+        self.connect_retried = 0
+        
+        # 上游延迟统计：区分新建连接与复用连接
+        self._upstream_stats = {
+            "new_connection": {"count": 0, "total_ms": 0.0},
+            "reused_connection": {"count": 0, "total_ms": 0.0}
+        }
     
-# 已删除订阅跳转支付方法，只保留二维码支付
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        """
+        获取共享的 ZPay HTTP 客户端（首次使用时导入 httpx 并创建）
+        
+        Returns:
+            httpx.AsyncClient: 带连接池和 keep-alive 的客户端
+        """
+        if self._client is None or self._client.is_closed:
+            import httpx
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(
+                    self.read_timeout,
+                    connect=self.connect_timeout
+                ),
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_keepalive_connections,
+                    keepalive_expiry=self.keepalive_expiry
+                ),
+                headers={"User-Agent": "HERHZZZ-Payment/1.0"}
+            )
+        return self._client
     
-# 已删除通用跳转支付方法，只保留二维码支付
+    async def close(self) -> None:
+        """关闭共享的 HTTP 客户端（应用关闭时调用）"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
-    def get_subscription_pricing(self) -> Dict[str, Dict[str, Any]]:
+    def _record_upstream_latency(self, elapsed_ms: float, new_connection: bool) -> None:
         """
-        获取订阅定价信息
+        记录一次 ZPay 请求的耗时
+        
+        Args:
+            elapsed_ms: 请求耗时（毫秒）
+            new_connection: 本次请求是否新建了连接
+        """
+        key = "new_connection" if new_connection else "reused_connection"
+        self._upstream_stats[key]["count"] += 1
+        self._upstream_stats[key]["total_ms"] += elapsed_ms
+    
+    def get_upstream_stats(self) -> Dict[str, Any]:
+        """
+        获取 ZPay 上游延迟统计
         
         Returns:
-            Dict[str, Dict[str, Any]]: 订阅定价信息
+            Dict[str, Any]: 新建/复用连接的请求数、平均耗时，以及连接复用每单节省的时间
         """
-        return {
-            "monthly_3": {
-                "name": "HERHZZZ 3个月会员",
-                "duration_days": 90,
-                "price": 29.99,
-                "description": "3个月畅享全部高品质睡眠音频",
-                "features": [
-                    "解锁全部周期音频",
-                    "高品质音频体验",
-                    "个性化推荐",
-                    "无广告畅听"
-                ]
-            },
-            "yearly": {
-                "name": "HERHZZZ 1年会员",
-                "duration_days": 365,
-                "price": 99.99,
-                "description": "1年畅享全部高品质睡眠音频，更超值",
-                "features": [
-                    "解锁全部周期音频",
-                    "高品质音频体验", 
-                    "个性化推荐",
-                    "无广告畅听",
-                    "优先客服支持",
-                    "新功能抢先体验"
-                ],
-                "savings": "相比3个月会员节省17%"
-            },
-            "lifetime": {
-                "name": "HERHZZZ 永久会员",
-                "duration_days": None,
-                "price": 299.99,
-                "description": "一次购买，终身畅享所有功能",
-                "features": [
-                    "永久解锁全部音频",
-                    "高品质音频体验",
-                    "个性化推荐",
-                    "无广告畅听",
-                    "优先客服支持",
-                    "新功能抢先体验",
-                    "终身免费更新",
-                    "专属会员标识"
-                ],
-                "savings": "相比年费会员节省75%"
+        stats = {}
+        for key, value in self._upstream_stats.items():
+            count = value["count"]
+            stats[key] = {
+                "count": count,
+                "avg_ms": round(value["total_ms"] / count, 2) if count else None
             }
-        }
+        
+        new_avg = stats["new_connection"]["avg_ms"]
+        reused_avg = stats["reused_connection"]["avg_ms"]
+        stats["saved_ms_per_order"] = (
+            round(new_avg - reused_avg, 2)
+            if new_avg is not None and reused_avg is not None else None
+        )
+        stats["circuit"] = self.breaker.stats()
+        stats["connect_retried"] = self.connect_retried
+        return stats
+    
+    def new_deadline(self) -> float:
+        """
+        计算下单请求的截止时间（在请求开始时调用，写订单等前置步骤也计入预算）
+        
+        Returns:
+            float: 截止时间（time.monotonic() 时钟）
+        """
+        return time.monotonic() + self.create_deadline
+    
+    def _unavailable(self, message: str, reason: str, retry_after: float = 0.0) -> PaymentUnavailableError:
+        """记录指标并构造 PaymentUnavailableError"""
+        zpay_unavailable.inc(reason=reason)
+        return PaymentUnavailableError(message, reason, retry_after)
+    
+    def ensure_available(self) -> None:
+        """
+        熔断中时提前失败（在写订单之前调用，不占用半开探测名额）
+        
+        Raises:
+            PaymentUnavailableError: 熔断器打开时抛出
+        """
+        try:
+            self.breaker.check()
+        except CircuitOpenError as e:
+            raise self._unavailable("支付服务暂时不可用，请稍后重试", "circuit_open", e.retry_after)
+    
+# 已删除订阅跳转支付方法，只保留二维码支付
+    
+# 已删除通用跳转支付方法，只保留二维码支付
     
     def _prepare_zpay_params(
         self, 
@@ -118,18 +205,13 @@ class PaymentService:
             "sign_type": "MD5"
         }
         
-        # 🔍 调试信息：检查ZPay参数
-        print("🔍 ZPay参数检查:")
-        for key, value in params.items():
-            if value is None or value == "":
-                print(f"❌ {key}: 空值或None!")
-            else:
-                if key == "money":
-                    print(f"✅ {key}: {value}")
-                elif key in ["pid", "notify_url"]:
-                    print(f"✅ {key}: {value}")
-                else:
-                    print(f"✅ {key}: {str(value)[:20]}...")
+        # 检查ZPay参数中的空值
+        empty_keys = [
+            key for key, value in params.items()
+            if key != "param" and (value is None or value == "")
+        ]
+        if empty_keys:
+            logger.warning("ZPay参数存在空值", extra={"out_trade_no": out_trade_no, "empty_keys": empty_keys})
         
         return params
     
@@ -138,23 +220,120 @@ class PaymentService:
         order_request: CreateOrderRequest,
         out_trade_no: str,
         client_ip: str,
-        device: str = "pc"
+        device: str = "pc",
+        deadline: Optional[float] = None
     ) -> Dict[str, Any]:
         """
-        创建支付订单
+        创建支付订单（记录耗时指标）
         
         Args:
             order_request: 订单请求数据
             out_trade_no: 商户订单号
             client_ip: 客户端IP
             device: 设备类型
+            deadline: 截止时间（new_deadline() 的返回值），默认从现在开始计算 ZPAY_CREATE_DEADLINE
             
         Returns:
             Dict[str, Any]: 支付响应数据
             
         Raises:
+            PaymentUnavailableError: ZPay 暂时不可用时抛出
             Exception: 支付创建失败时抛出异常
         """
+        start = time.perf_counter()
+        result = "error"
+        try:
+            payment_result = await self._create_payment(
+                order_request, out_trade_no, client_ip, device,
+                deadline if deadline is not None else self.new_deadline()
+            )
+            result = "success"
+            return payment_result
+        except PaymentUnavailableError:
+            result = "unavailable"
+            raise
+        finally:
+            zpay_create_payment_duration.observe(time.perf_counter() - start, result=result)
+    
+    async def _post_create(self, params: Dict[str, Any], remaining: float) -> "httpx.Response":
+        """
+        发送一次下单请求，所有超时都不超过剩余预算
+        
+        Args:
+            params: 已签名的 ZPay 请求参数
+            remaining: 距截止时间的秒数
+            
+        Returns:
+            httpx.Response: ZPay 响应
+        """
+        import httpx
+        
+        # 通过 trace 扩展判断本次请求是否新建了 TCP 连接
+        new_connection = False
+        
+        async def trace(event_name: str, info: Dict[str, Any]) -> None:
+            nonlocal new_connection
+            if event_name == "connection.connect_tcp.started":
+                new_connection = True
+        
+        # 发送请求到 ZPay（复用共享连接池）；httpx 的读超时按单次读取计算，外层再限制总耗时
+        start = time.perf_counter()
+        response = await asyncio.wait_for(
+            self.client.post(
+                self.zpay_url,
+                data=params,
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                timeout=httpx.Timeout(
+                    min(self.read_timeout, remaining),
+                    connect=min(self.connect_timeout, remaining)
+                ),
+                extensions={"trace": trace}
+            ),
+            remaining
+        )
+        self._record_upstream_latency(
+            (time.perf_counter() - start) * 1000, new_connection
+        )
+        return response
+    
+    async def _create_payment(
+        self, 
+        order_request: CreateOrderRequest,
+        out_trade_no: str,
+        client_ip: str,
+        device: str,
+        deadline: float
+    ) -> Dict[str, Any]:
+        """
+        调用 ZPay 创建支付订单
+        
+        请求经过熔断器；连接没有建立时（请求没有到达 ZPay，重试不会重复下单）在截止时间内
+        最多重试 ZPAY_CONNECT_RETRIES 次，读超时和 5xx 不重试。
+        超时、连接失败和 5xx 计为上游失败，ZPay 业务错误说明上游正常响应，不影响熔断。
+        
+        Args:
+            order_request: 订单请求数据
+            out_trade_no: 商户订单号
+            client_ip: 客户端IP
+            device: 设备类型
+            deadline: 截止时间（time.monotonic() 时钟）
+            
+        Returns:
+            Dict[str, Any]: 支付响应数据
+            
+        Raises:
+            PaymentUnavailableError: 熔断中、截止时间已到、超时、连接失败或 ZPay 返回 5xx 时抛出
+            Exception: 支付创建失败时抛出异常
+        """
+        import httpx
+        
+        try:
+            self.breaker.acquire()
+        except CircuitOpenError as e:
+            raise self._unavailable("支付服务暂时不可用，请稍后重试", "circuit_open", e.retry_after)
+        
+        # 上游是否健康：None 表示没有得到结论（截止时间已到没有发出请求、请求被取消）
+        healthy: Optional[bool] = None
         try:
             # 准备请求参数
             params = self._prepare_zpay_params(
@@ -164,60 +343,117 @@ class PaymentService:
             # 生成签名
             params["sign"] = generate_md5_signature(params, self.merchant_key)
             
-            # 🔍 调试信息：显示完整的发送参数（包括签名）
-            print("🔍 发送给ZPay的完整参数:")
-            for key, value in params.items():
-                if key == "sign":
-                    print(f"✅ {key}: {value[:10]}...{value[-10:]}")
-                elif value is None or value == "":
-                    print(f"❌ {key}: 空值或None!")
-                else:
-                    print(f"✅ {key}: {value}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("发送ZPay请求", extra={
+                    "out_trade_no": out_trade_no,
+                    "params": {key: value for key, value in params.items() if key != "sign"}
+                })
+            
+            attempt = 0
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining < self.min_attempt_seconds:
+                    raise self._unavailable("支付服务响应超时，请稍后重试", "deadline", self.min_attempt_seconds)
+                try:
+                    response = await self._post_create(params, remaining)
+                    break
+                except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+                    backoff = self.retry_backoff * (2 ** attempt) * random.uniform(0.5, 1.5)
+                    if attempt >= self.connect_retries or deadline - time.monotonic() - backoff < self.min_attempt_seconds:
+                        raise
+                    attempt += 1
+                    self.connect_retried += 1
+                    logger.warning("ZPay 连接失败，重试", extra={
+                        "out_trade_no": out_trade_no,
+                        "attempt": attempt,
+                        "error": repr(e)
+                    })
+                    await asyncio.sleep(backoff)
+            
+            # 检查 HTTP 状态码
+            healthy = response.status_code < 500
+            response.raise_for_status()
+            
+            # 解析响应
+            result = response.json()
+            
+            # 验证响应格式
+            if not isinstance(result, dict):
+                raise Exception("ZPay 返回数据格式错误")
+            
+            # 检查业务状态码
+            code = result.get("code", -1)
+            if code != 1:  # ZPay 成功状态码通常是 1
+                error_msg = result.get("msg", "支付订单创建失败")
+                raise Exception(f"ZPay 错误: {error_msg}")
             
-            # 发送请求到 ZPay
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    self.zpay_url,
-                    data=params,
-                    headers={
-                        "Content-Type": "application/x-www-form-urlencoded",
-                        "User-Agent": "HERHZZZ-Payment/1.0"
-                    }
-                )
-                
-                # 检查 HTTP 状态码
-                response.raise_for_status()
-                
-                # 解析响应
-                result = response.json()
-                
-                # 验证响应格式
-                if not isinstance(result, dict):
-                    raise Exception("ZPay 返回数据格式错误")
-                
-                # 检查业务状态码
-                code = result.get("code", -1)
-                if code != 1:  # ZPay 成功状态码通常是 1
-                    error_msg = result.get("msg", "支付订单创建失败")
-                    raise Exception(f"ZPay 错误: {error_msg}")
-                
-                return {
-                    "code": code,
-                    "msg": result.get("msg", ""),
-                    "payurl": result.get("payurl"),
-                    "qrcode": result.get("qrcode", result.get("img")),  # 兼容不同字段名
-                    "zpay_trade_no": result.get("trade_no")  # 如果有返回交易号
-                }
-                
-        except httpx.TimeoutException:
-            raise Exception("ZPay 请求超时，请稍后重试")
+            return {
+                "code": code,
+                "msg": result.get("msg", ""),
+                "payurl": result.get("payurl"),
+                "qrcode": result.get("qrcode", result.get("img")),  # 兼容不同字段名
+                "zpay_trade_no": result.get("trade_no")  # 如果有返回交易号
+            }
+            
+        except PaymentUnavailableError:
+            raise
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            healthy = False
+            raise self._unavailable("ZPay 连接失败，请稍后重试", "connect")
+        except (httpx.TimeoutException, asyncio.TimeoutError):
+            healthy = False
+            raise self._unavailable("ZPay 请求超时，请稍后重试", "timeout")
         except httpx.HTTPStatusError as e:
+            if e.response.status_code >= 500:
+                raise self._unavailable(f"ZPay 服务异常: HTTP {e.response.status_code}", "upstream_error")
             raise Exception(f"ZPay 服务异常: HTTP {e.response.status_code}")
+        except httpx.TransportError as e:
+            healthy = False
+            raise self._unavailable(f"ZPay 连接异常: {e!r}", "connect")
         except Exception as e:
             if "ZPay 错误" in str(e):
                 raise e
             else:
                 raise Exception(f"支付服务异常: {str(e)}")
+        finally:
+            self.breaker.release(healthy)
+    
+    async def query_order(self, out_trade_no: str) -> Dict[str, Any]:
+        """
+        向 ZPay 查询订单支付状态（对账使用）
+        
+        Args:
+            out_trade_no: 商户订单号
+            
+        Returns:
+            Dict[str, Any]: paid（是否已支付）、trade_no（ZPay 交易号）、money（实付金额）；
+                ZPay 查无此单时 paid 为 False、found 为 False
+            
+        Raises:
+            Exception: 请求失败或响应格式错误时抛出异常
+        """
+        response = await self.client.get(self.zpay_query_url, params={
+            "act": "order",
+            "pid": self.merchant_id,
+            "key": self.merchant_key,
+            "out_trade_no": out_trade_no
+        })
+        response.raise_for_status()
+        
+        result = response.json()
+        if not isinstance(result, dict):
+            raise Exception("ZPay 返回数据格式错误")
+        
+        # 未扫码的订单在 ZPay 侧不存在，按未支付处理
+        if str(result.get("code")) != "1":
+            return {"found": False, "paid": False, "trade_no": None, "money": None}
+        
+        return {
+            "found": True,
+            "paid": str(result.get("status")) == "1",
+            "trade_no": result.get("trade_no"),
+            "money": float(result["money"]) if result.get("money") not in (None, "") else None
+        }
     
     def verify_notification(self, notification_data: Dict[str, Any]) -> bool:
         """
@@ -241,7 +477,7 @@ class PaymentService:
             return received_sign.lower() == expected_sign.lower()
             
         except Exception as e:
-            print(f"验证支付通知签名失败: {str(e)}")
+            logger.error("验证支付通知签名失败", extra={"error": str(e)})
             return False
     
     def get_payment_type_name(self, payment_type: str) -> str:
@@ -0,0 +1,195 @@
+"""
+令牌桶限流 - 按用户和按 IP 限制下单、支付通知等高成本接口
+
+每个键一个令牌桶：容量为 capacity，每秒补充 refill_per_second 个令牌，每次请求消耗一个；
+令牌不足时拒绝，并给出补足一个令牌需要等待的秒数（Retry-After）。
+桶状态只有 (令牌数, 更新时间)，补充在读取时按经过的时间计算，每次检查都是 O(1)。
+
+两种后端（RATE_LIMIT_BACKEND）：
+    memory    进程内（默认）：有界 LRU 字典，多 worker 部署时每个进程各自限流
+    supabase  共享：rate_limit_take RPC（见 RATE_LIMIT.sql），一次往返在数据库中原子完成补充和扣减；
+              数据库不可用时退回进程内桶，不会因为限流把正常请求挡在外面
+"""
+import os
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class RateLimitPolicy(NamedTuple):
+    """限流规则"""
+
+    capacity: float
+    refill_per_second: float
+
+    @classmethod
+    def parse(cls, value: Optional[str]) -> Optional["RateLimitPolicy"]:
+        """
+        解析 "次数/秒数" 格式的规则（例如 "10/60"：最多连续 10 次，每 6 秒恢复 1 次）
+
+        Args:
+            value: 规则字符串，为空或 0 表示不限流
+
+        Returns:
+            Optional[RateLimitPolicy]: 规则，不限流时返回 None
+
+        Raises:
+            ValueError: 格式错误时抛出
+        """
+        if not value or value.strip() in ("0", "off"):
+            return None
+        count, _, seconds = value.partition("/")
+        capacity = float(count)
+        period = float(seconds or 1)
+        if capacity <= 0 or period <= 0:
+            raise ValueError(f"限流规则格式错误: {value}")
+        return cls(capacity, capacity / period)
+
+
+class RateLimitDecision(NamedTuple):
+    """限流结果"""
+
+    allowed: bool
+    retry_after: float
+
+
+class MemoryTokenBuckets:
+    """进程内令牌桶（LRU 有界，最久未访问的桶先淘汰；被淘汰的桶等同于满桶）"""
+
+    def __init__(self, max_keys: int = 100000):
+        """
+        初始化令牌桶表
+
+        Args:
+            max_keys: 最多保留的桶数量
+        """
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key: str, policy: RateLimitPolicy, now: Optional[float] = None) -> RateLimitDecision:
+        """
+        从桶中取一个令牌
+
+        Args:
+            key: 桶的键
+            policy: 限流规则
+            now: 当前单调时间，默认为 time.monotonic()
+
+        Returns:
+            RateLimitDecision: 是否放行和需要等待的秒数
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = [policy.capacity, now]
+                self._buckets[key] = bucket
+                if len(self._buckets) > self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(policy.capacity, bucket[0] + (now - bucket[1]) * policy.refill_per_second)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return RateLimitDecision(True, 0.0)
+            return RateLimitDecision(False, (1 - bucket[0]) / policy.refill_per_second)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class RateLimiter:
+    """令牌桶限流器"""
+
+    def __init__(self, database_service=None, backend: Optional[str] = None, enabled: Optional[bool] = None):
+        """
+        初始化限流器（参数从环境变量读取）
+
+        Args:
+            database_service: DatabaseService 实例（supabase 后端使用）
+            backend: memory 或 supabase，默认读取 RATE_LIMIT_BACKEND
+            enabled: 是否启用，默认读取 RATE_LIMIT_ENABLED
+        """
+        self.database_service = database_service
+        self.backend = (backend or os.getenv("RATE_LIMIT_BACKEND", "memory")).lower()
+        if self.backend not in ("memory", "supabase"):
+            raise ValueError(f"不支持的限流后端: {self.backend}")
+        if self.backend == "supabase" and database_service is None:
+            raise ValueError("supabase 限流后端需要 DatabaseService")
+        self.enabled = (
+            enabled if enabled is not None
+            else os.getenv("RATE_LIMIT_ENABLED", "true").lower() in ("1", "true", "yes")
+        )
+        self._local = MemoryTokenBuckets(int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000")))
+        self.allowed = 0
+        self.limited = 0
+        self.backend_errors = 0
+
+    async def take(self, key: str, policy: RateLimitPolicy) -> RateLimitDecision:
+        """
+        从指定键的桶中取一个令牌
+
+        Args:
+            key: 桶的键（例如 "order:user:<用户ID>"）
+            policy: 限流规则
+
+        Returns:
+            RateLimitDecision: 是否放行和需要等待的秒数
+        """
+        if self.backend == "supabase":
+            try:
+                return await self.database_service.take_rate_limit_token(
+                    key, policy.capacity, policy.refill_per_second
+                )
+            except Exception as e:
+                self.backend_errors += 1
+                logger.warning("共享限流不可用，使用进程内限流", extra={"key": key, "error": str(e)})
+        return self._local.take(key, policy)
+
+    async def check(self, rules: Iterable[Tuple[str, Optional[RateLimitPolicy]]]) -> RateLimitDecision:
+        """
+        依次检查多个桶（例如先按用户、再按 IP），任意一个不足即拒绝
+
+        遇到第一个拒绝的桶就停止，超出自身限制的用户不会继续消耗同一 IP 下其他用户的令牌
+
+        Args:
+            rules: (键, 规则) 列表，规则为 None 的跳过
+
+        Returns:
+            RateLimitDecision: 全部放行时 allowed 为 True，否则给出拒绝桶需要等待的秒数
+        """
+        if not self.enabled:
+            return RateLimitDecision(True, 0.0)
+
+        for key, policy in rules:
+            if policy is None:
+                continue
+            decision = await self.take(key, policy)
+            if not decision.allowed:
+                self.limited += 1
+                return decision
+        self.allowed += 1
+        return RateLimitDecision(True, 0.0)
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取限流统计
+
+        Returns:
+            Dict[str, Any]: 后端、放行/拒绝次数和进程内桶数量
+        """
+        return {
+            "enabled": self.enabled,
+            "backend": self.backend,
+            "allowed": self.allowed,
+            "limited": self.limited,
+            "backend_errors": self.backend_errors,
+            "local_buckets": len(self._local)
+        }
@@ -0,0 +1,302 @@
+"""
+待支付订单对账 - 向 ZPay 核对收不到支付通知的订单
+
+按 (created_at, id) 游标分页读取创建时间超过 --min-age-minutes 的 pending 订单，
+以有限并发和限速向 ZPay 查询每个订单：
+    已支付 → DatabaseService.settle_order（与支付通知相同的结算逻辑，订阅订单写入会员发放任务）
+    未支付且超过 --expire-after-minutes → 按页批量标记为 expired
+    其余 → 保持 pending，下次对账再查
+
+OrderSweeper 不向 ZPay 核对就把超时的 pending 订单标记为 expired，
+所以还会回查最近 --expired-lookback-hours 内创建、还没有确认过的 expired 订单：
+ZPay 已支付（支付通知丢失或在过期后才支付）→ settle_order 补结算，
+未支付 → 保持 expired 并写入 reconciled_at，之后的对账不再向 ZPay 查询该订单
+
+在定时任务中运行：
+    python reconcile_orders.py --min-age-minutes 10 --expire-after-minutes 30 --expired-lookback-hours 24
+
+环境变量：
+    RECONCILE_CONCURRENCY: 同时进行的 ZPay 查询数（默认 16）
+    RECONCILE_MAX_QPS: 每秒最多发起的 ZPay 查询数（默认 50）
+"""
+import os
+import time
+import asyncio
+import logging
+import argparse
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _QpsThrottle:
+    """匀速限流：相邻两次请求至少间隔 1/qps 秒"""
+
+    def __init__(self, qps: float):
+        """
+        初始化限流器
+
+        Args:
+            qps: 每秒最多请求数，小于等于 0 时不限速
+        """
+        self.interval = 1.0 / qps if qps > 0 else 0.0
+        self._next_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """等待下一个可用的请求时间点"""
+        if self.interval == 0:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next_at - now
+            self._next_at = max(now, self._next_at) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class OrderReconciler:
+    """待支付订单对账"""
+
+    def __init__(
+        self,
+        database_service,
+        payment_service,
+        concurrency: int = 16,
+        qps: float = 50,
+        dry_run: bool = False
+    ):
+        """
+        初始化对账任务
+
+        Args:
+            database_service: DatabaseService 实例
+            payment_service: PaymentService 实例
+            concurrency: 同时进行的 ZPay 查询数
+            qps: 每秒最多发起的 ZPay 查询数
+            dry_run: 只查询不写入
+        """
+        self.database_service = database_service
+        self.payment_service = payment_service
+        self.dry_run = dry_run
+        self._semaphore = asyncio.Semaphore(max(1, concurrency))
+        self._throttle = _QpsThrottle(qps)
+        self.stats: Dict[str, int] = {
+            "checked": 0,
+            "settled": 0,
+            "expired": 0,
+            "pending": 0,
+            "errors": 0
+        }
+
+    async def run(
+        self,
+        min_age: timedelta,
+        expire_after: timedelta,
+        page_size: int = 500,
+        limit: Optional[int] = None,
+        expired_lookback: Optional[timedelta] = None
+    ) -> Dict[str, Any]:
+        """
+        执行一轮对账
+
+        Args:
+            min_age: 只核对创建时间超过该时长的订单（给正常的支付通知留出时间）
+            expire_after: ZPay 未支付且创建时间超过该时长的订单标记为 expired
+            page_size: 每页读取的订单数
+            limit: 最多核对的订单数（包括查询失败的订单），None 表示不限
+            expired_lookback: 回查创建时间在该时长内的 expired 订单，None 表示不回查
+
+        Returns:
+            Dict[str, Any]: 各结果的订单数、耗时和每秒处理的订单数
+        """
+        started = time.monotonic()
+        now = datetime.now(timezone.utc)
+        expire_before = now - expire_after
+        examined = 0
+
+        # (订单状态, 分页读取)
+        sources = [
+            ("pending", self.database_service.iter_orders("pending", now - min_age, page_size=page_size))
+        ]
+        if expired_lookback is not None:
+            sources.append((
+                "expired",
+                self.database_service.iter_orders(
+                    "expired", now - min_age, created_after=now - expired_lookback,
+                    page_size=page_size, unreconciled_only=True
+                )
+            ))
+
+        for status, pages in sources:
+            async for page in pages:
+                if limit is not None:
+                    page = page[:max(0, limit - examined)]
+                    if not page:
+                        break
+                examined += len(page)
+
+                results = await asyncio.gather(*(self._check(order) for order in page))
+
+                if status == "pending":
+                    expirable = [
+                        order["out_trade_no"]
+                        for order, paid in zip(page, results)
+                        if paid is False and _parse_time(order["created_at"]) < expire_before
+                    ]
+                    self.stats["pending"] += sum(1 for paid in results if paid is False) - len(expirable)
+                    await self._expire(expirable)
+                else:
+                    # 查询失败的订单不标记，下次对账重试
+                    await self._mark_reconciled([
+                        order["out_trade_no"] for order, paid in zip(page, results) if paid is False
+                    ])
+
+                logger.info("对账进度", extra={**self.stats, "status": status, "page": len(page)})
+
+        elapsed = time.monotonic() - started
+        return {
+            **self.stats,
+            "examined": examined,
+            "elapsed_seconds": round(elapsed, 2),
+            "rows_per_second": round(self.stats["checked"] / elapsed, 1) if elapsed > 0 else 0.0
+        }
+
+    async def _check(self, order: Dict[str, Any]) -> Optional[bool]:
+        """
+        核对单个订单，已支付时完成结算
+
+        Returns:
+            Optional[bool]: True 已结算，False 未支付，None 查询或结算失败
+        """
+        out_trade_no = order["out_trade_no"]
+        async with self._semaphore:
+            await self._throttle.acquire()
+            try:
+                remote = await self.payment_service.query_order(out_trade_no)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.warning("查询 ZPay 订单失败", extra={"out_trade_no": out_trade_no, "error": str(e)})
+                return None
+        self.stats["checked"] += 1
+
+        if not remote["paid"]:
+            return False
+
+        # 没有实付金额时无法校验金额，不结算，留给人工核对
+        if remote["money"] is None:
+            self.stats["errors"] += 1
+            logger.error("ZPay 已支付订单缺少金额，跳过结算", extra={
+                "out_trade_no": out_trade_no,
+                "trade_no": remote["trade_no"],
+                "amount": order["amount"]
+            })
+            return None
+
+        if self.dry_run:
+            self.stats["settled"] += 1
+            return True
+
+        try:
+            settlement = await self.database_service.settle_order(
+                out_trade_no,
+                remote["money"],
+                zpay_trade_no=remote["trade_no"]
+            )
+        except Exception as e:
+            self.stats["errors"] += 1
+            logger.error("对账结算订单失败", extra={"out_trade_no": out_trade_no, "error": str(e)})
+            return None
+
+        if settlement["outcome"] in ("paid", "already_paid"):
+            self.stats["settled"] += 1
+            logger.info("对账补结算订单", extra={"out_trade_no": out_trade_no, "outcome": settlement["outcome"]})
+        else:
+            self.stats["errors"] += 1
+            logger.warning("对账结算被拒绝", extra={"out_trade_no": out_trade_no, "outcome": settlement["outcome"]})
+        return True
+
+    async def _expire(self, out_trade_nos: List[str]) -> None:
+        if not out_trade_nos:
+            return
+        if self.dry_run:
+            self.stats["expired"] += len(out_trade_nos)
+            return
+        try:
+            self.stats["expired"] += await self.database_service.expire_orders(out_trade_nos)
+        except Exception as e:
+            self.stats["errors"] += len(out_trade_nos)
+            logger.error("批量过期订单失败", extra={"count": len(out_trade_nos), "error": str(e)})
+
+
+    async def _mark_reconciled(self, out_trade_nos: List[str]) -> None:
+        if not out_trade_nos or self.dry_run:
+            return
+        try:
+            await self.database_service.mark_orders_reconciled(out_trade_nos)
+        except Exception as e:
+            # 标记失败只会让这些订单在下次对账时再查询一次
+            logger.warning("记录过期订单回查结果失败", extra={"count": len(out_trade_nos), "error": str(e)})
+
+
+def _parse_time(value: str) -> datetime:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+async def _main(args: argparse.Namespace) -> Dict[str, Any]:
+    from database_service import DatabaseService
+    from payment_service import PaymentService
+
+    database_service = DatabaseService()
+    payment_service = PaymentService()
+    try:
+        reconciler = OrderReconciler(
+            database_service,
+            payment_service,
+            concurrency=args.concurrency,
+            qps=args.qps,
+            dry_run=args.dry_run
+        )
+        return await reconciler.run(
+            min_age=timedelta(minutes=args.min_age_minutes),
+            expire_after=timedelta(minutes=args.expire_after_minutes),
+            page_size=args.page_size,
+            limit=args.limit,
+            expired_lookback=timedelta(hours=args.expired_lookback_hours) if args.expired_lookback_hours > 0 else None
+        )
+    finally:
+        await payment_service.close()
+        database_service.close()
+
+
+if __name__ == "__main__":
+    from dotenv import load_dotenv
+    from log_config import setup_logging, shutdown_logging
+
+    load_dotenv()
+
+    parser = argparse.ArgumentParser(description="向 ZPay 核对待支付订单")
+    parser.add_argument("--min-age-minutes", type=float, default=10, help="只核对创建超过该时长的订单")
+    parser.add_argument("--expire-after-minutes", type=float, default=30, help="未支付订单超过该时长标记为 expired")
+    parser.add_argument("--expired-lookback-hours", type=float, default=24,
+                        help="回查创建时间在该时长内的 expired 订单（0 表示不回查）")
+    parser.add_argument("--page-size", type=int, default=500, help="每页读取的订单数")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("RECONCILE_CONCURRENCY", "16")))
+    parser.add_argument("--qps", type=float, default=float(os.getenv("RECONCILE_MAX_QPS", "50")))
+    parser.add_argument("--limit", type=int, default=None, help="最多核对的订单数")
+    parser.add_argument("--dry-run", action="store_true", help="只查询，不修改订单")
+    args = parser.parse_args()
+
+    setup_logging()
+    try:
+        summary = asyncio.run(_main(args))
+    finally:
+        shutdown_logging()
+
+    print(
+        f"检查 {summary['examined']} 个订单（ZPay 查询成功 {summary['checked']}）：结算 {summary['settled']}，过期 {summary['expired']}，"
+        f"保持待支付 {summary['pending']}，错误 {summary['errors']}；"
+        f"耗时 {summary['elapsed_seconds']}s（{summary['rows_per_second']} 单/秒）"
+    )
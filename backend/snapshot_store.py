@@ -0,0 +1,140 @@
+"""
+快照存储 - 定期从数据库重新加载的只读快照
+
+音频目录、订阅套餐等读多写少的配置数据使用同一套刷新逻辑：
+过期后先返回旧快照并在后台刷新，内容摘要变化时才生成新版本。
+"""
+import asyncio
+import hashlib
+import json
+import time
+import logging
+from typing import Any, Awaitable, Callable, Dict, Generic, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+# 快照类型：构造参数为 (rows, version, digest)，需提供可写的 loaded_at 属性
+SnapshotT = TypeVar("SnapshotT")
+
+
+class SnapshotStore(Generic[SnapshotT]):
+    """
+    快照管理
+
+    快照过期后先返回旧快照，同时在后台刷新（同一时间只有一个刷新任务）；
+    只有首次加载时请求需要等待数据库查询。数据变更后可调用 invalidate() 立即刷新。
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[List[Dict[str, Any]]]],
+        snapshot_factory: Callable[[List[Dict[str, Any]], int, str], SnapshotT],
+        ttl: float = 300.0,
+        name: str = "快照"
+    ):
+        """
+        初始化快照管理器
+
+        Args:
+            loader: 从数据库读取行的异步函数
+            snapshot_factory: 根据 (rows, version, digest) 构建快照
+            ttl: 快照刷新间隔（秒）
+            name: 日志中使用的名称
+        """
+        self._loader = loader
+        self._snapshot_factory = snapshot_factory
+        self.ttl = ttl
+        self.name = name
+        self._snapshot: Optional[SnapshotT] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._stale = False
+        # invalidate() 每次调用加一；加载期间如果有新的 invalidate()，加载完成后仍保持过期
+        self._generation = 0
+
+    @property
+    def snapshot(self) -> Optional[SnapshotT]:
+        """当前快照（可能为 None）"""
+        return self._snapshot
+
+    async def get(self) -> SnapshotT:
+        """
+        获取快照
+
+        Returns:
+            SnapshotT: 当前快照
+
+        Raises:
+            Exception: 首次加载失败时抛出异常
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return await self.refresh()
+
+        if self._stale or time.time() - snapshot.loaded_at > self.ttl:
+            self._schedule_refresh()
+
+        return snapshot
+
+    def get_nowait(self) -> Optional[SnapshotT]:
+        """
+        获取快照，不等待数据库
+
+        没有快照或快照已过期时在后台加载，本次返回当前快照
+
+        Returns:
+            Optional[SnapshotT]: 当前快照，首次加载完成前为 None
+        """
+        snapshot = self._snapshot
+        if snapshot is None or self._stale or time.time() - snapshot.loaded_at > self.ttl:
+            self._schedule_refresh()
+        return snapshot
+
+    async def refresh(self) -> SnapshotT:
+        """
+        从数据库重新加载
+
+        内容未变化时沿用原快照，只更新加载时间
+
+        Returns:
+            SnapshotT: 新快照
+        """
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self._reload())
+        return await asyncio.shield(self._refresh_task)
+
+    def invalidate(self) -> None:
+        """标记快照过期，下一次读取时触发后台刷新"""
+        self._generation += 1
+        self._stale = True
+
+    def _schedule_refresh(self) -> None:
+        """在后台刷新快照，失败时保留旧快照"""
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+
+        self._refresh_task = asyncio.ensure_future(self._reload())
+        self._refresh_task.add_done_callback(self._log_refresh_error)
+
+    def _log_refresh_error(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"刷新{self.name}失败", extra={"error": str(task.exception())})
+
+    async def _reload(self) -> SnapshotT:
+        generation = self._generation
+        rows = await self._loader()
+        digest = hashlib.sha256(
+            json.dumps(rows, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+        current = self._snapshot
+        if self._generation == generation:
+            self._stale = False
+        if current is not None and current.digest == digest:
+            current.loaded_at = time.time()
+            return current
+
+        version = (current.version + 1) if current is not None else 1
+        self._snapshot = self._snapshot_factory(rows, version, digest)
+        if current is not None:
+            logger.info(f"{self.name}已更新", extra={"version": version})
+        return self._snapshot
@@ -0,0 +1,170 @@
+"""
+订阅套餐注册表 - subscription_plans 表的内存快照
+
+价格、时长和展示信息只在这里维护：下单时从内存读取套餐，
+/api/subscription/pricing 直接返回快照中预先序列化的响应和 ETag。
+快照还没加载时（Serverless 冷启动不预热），定价接口返回 DEFAULT_PLAN_ROWS 生成的默认定价，不等待数据库。
+"""
+import time
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from fast_json import dumps
+from snapshot_store import SnapshotStore
+
+# 定价接口的货币单位
+PRICING_CURRENCY = "CNY"
+
+# 默认套餐：与 SUBSCRIPTION_PLANS_TABLE.sql 的初始数据相同，只用于套餐快照加载完成前的定价展示
+DEFAULT_PLAN_ROWS: List[Dict[str, Any]] = [
+    {
+        "plan_type": "monthly_3",
+        "name": "HERHZZZ 3个月会员",
+        "price": 29.99,
+        "duration_days": 90,
+        "description": "3个月畅享全部高品质睡眠音频",
+        "features": ["解锁全部周期音频", "高品质音频体验", "个性化推荐", "无广告畅听"],
+        "savings": None,
+        "display_order": 1
+    },
+    {
+        "plan_type": "yearly",
+        "name": "HERHZZZ 1年会员",
+        "price": 99.99,
+        "duration_days": 365,
+        "description": "1年畅享全部高品质睡眠音频，更超值",
+        "features": ["解锁全部周期音频", "高品质音频体验", "个性化推荐", "无广告畅听", "优先客服支持", "新功能抢先体验"],
+        "savings": "相比3个月会员节省17%",
+        "display_order": 2
+    },
+    {
+        "plan_type": "lifetime",
+        "name": "HERHZZZ 永久会员",
+        "price": 299.99,
+        "duration_days": None,
+        "description": "一次购买，终身畅享所有功能",
+        "features": [
+            "永久解锁全部音频", "高品质音频体验", "个性化推荐", "无广告畅听",
+            "优先客服支持", "新功能抢先体验", "终身免费更新", "专属会员标识"
+        ],
+        "savings": "相比年费会员节省75%",
+        "display_order": 3
+    }
+]
+
+
+class SubscriptionPlan:
+    """订阅套餐"""
+
+    __slots__ = (
+        "plan_type", "name", "price", "duration_days", "description",
+        "features", "savings", "display_order"
+    )
+
+    def __init__(self, row: Dict[str, Any]):
+        """
+        从 subscription_plans 表的行解码
+
+        Args:
+            row: 套餐行
+        """
+        self.plan_type: str = row["plan_type"]
+        self.name: str = row["name"]
+        self.price: float = float(row["price"])
+        self.duration_days: Optional[int] = row.get("duration_days")
+        self.description: Optional[str] = row.get("description")
+        self.features: List[str] = list(row.get("features") or [])
+        self.savings: Optional[str] = row.get("savings")
+        self.display_order: int = row.get("display_order") or 0
+
+    def to_pricing(self) -> Dict[str, Any]:
+        """
+        生成定价接口中的套餐信息
+
+        Returns:
+            Dict[str, Any]: 套餐名称、时长、价格、描述和权益
+        """
+        pricing = {
+            "name": self.name,
+            "duration_days": self.duration_days,
+            "price": self.price,
+            "description": self.description,
+            "features": self.features
+        }
+        if self.savings:
+            pricing["savings"] = self.savings
+        return pricing
+
+
+class PlanRegistrySnapshot:
+    """
+    套餐快照
+
+    构建时完成解码和定价响应的序列化，快照生成后不再修改。
+    ETag 由行内容摘要生成，套餐不变时跨进程、跨重启保持一致。
+    """
+
+    __slots__ = ("version", "digest", "loaded_at", "plans", "pricing_body", "etag")
+
+    def __init__(self, rows: List[Dict[str, Any]], version: int, digest: str):
+        """
+        根据数据库行构建快照
+
+        Args:
+            rows: subscription_plans 表中启用的行（已按 display_order 排序）
+            version: 快照版本号
+            digest: 行内容摘要
+        """
+        self.version = version
+        self.digest = digest
+        self.loaded_at = time.time()
+        self.plans: Dict[str, SubscriptionPlan] = {}
+        for row in rows:
+            plan = SubscriptionPlan(row)
+            self.plans[plan.plan_type] = plan
+
+        updated_at = max((str(row.get("updated_at")) for row in rows if row.get("updated_at")), default=None)
+        self.pricing_body: bytes = dumps({
+            "pricing": {plan_type: plan.to_pricing() for plan_type, plan in self.plans.items()},
+            "currency": PRICING_CURRENCY,
+            "updated_at": updated_at or datetime.now(timezone.utc).isoformat()
+        })
+        self.etag = f'"plans-{digest[:20]}"'
+
+    def get(self, plan_type: str) -> Optional[SubscriptionPlan]:
+        """
+        获取套餐
+
+        Args:
+            plan_type: 订阅类型（monthly_3 / yearly / lifetime）
+
+        Returns:
+            Optional[SubscriptionPlan]: 套餐，不存在或已下架时返回 None
+        """
+        return self.plans.get(plan_type)
+
+
+class PlanRegistry(SnapshotStore[PlanRegistrySnapshot]):
+    """
+    订阅套餐注册表
+
+    启动时加载，之后按 ttl 在后台重新读取；内容变化时版本号递增并生成新的 ETag。
+    """
+
+    def __init__(self, loader: Callable[[], Awaitable[List[Dict[str, Any]]]], ttl: float = 60.0):
+        """
+        初始化套餐注册表
+
+        Args:
+            loader: 从数据库读取启用套餐的异步函数
+            ttl: 重新读取间隔（秒）
+        """
+        super().__init__(loader, PlanRegistrySnapshot, ttl=ttl, name="订阅套餐")
+        self._default: Optional[PlanRegistrySnapshot] = None
+
+    @property
+    def default_snapshot(self) -> PlanRegistrySnapshot:
+        """DEFAULT_PLAN_ROWS 生成的默认套餐快照（只用于定价展示，下单始终使用数据库中的套餐）"""
+        if self._default is None:
+            self._default = PlanRegistrySnapshot(DEFAULT_PLAN_ROWS, version=0, digest="default")
+        return self._default
@@ -0,0 +1,117 @@
+"""
+音频目录快照测试 - 使用与 COMPLETE_DATABASE_INIT.sql 相同字段的 audio_access_control 行
+
+运行：
+    python -m pytest test_audio_catalog.py -q
+"""
+import asyncio
+from typing import Any, Dict, List
+
+from audio_catalog import AudioCatalog, AudioCatalogSnapshot
+
+
+def _row(audio_name: str, audio_title: str, cycle_phase: str, access_level: str, display_order: int) -> Dict[str, Any]:
+    """audio_access_control 表的一行（只包含表中定义的字段）"""
+    return {
+        "id": f"00000000-0000-0000-0000-{display_order:012d}",
+        "audio_name": audio_name,
+        "audio_title": audio_title,
+        "cycle_phase": cycle_phase,
+        "access_level": access_level,
+        "display_order": display_order,
+        "description": None,
+        "duration_seconds": 180,
+        "file_size_bytes": None,
+        "bitrate_kbps": None,
+        "sample_rate": None,
+        "channels": None,
+        "codec": None,
+        "content_sha256": None,
+        "metadata_indexed_at": None,
+        "created_at": "2025-06-28T00:00:00+00:00"
+    }
+
+
+ROWS = [
+    _row("yaolan_chaoxi.mp3", "摇篮潮汐", "menstrual", "free", 1),
+    _row("fenying_wenquan.mp3", "温泉芬影", "menstrual", "paid", 2),
+    _row("yueguang_paoyu.mp3", "月光泡浴", "follicular", "free", 1),
+    _row("yinguang_senlin.mp3", "银光森林", "follicular", "paid", 2),
+]
+
+
+def test_snapshot_maps_schema_columns():
+    snapshot = AudioCatalogSnapshot(ROWS, version=1, digest="d")
+
+    assert snapshot.total_audio_count == 4
+    assert snapshot.free_audio_count == 2
+    assert snapshot.is_free("yaolan_chaoxi.mp3") is True
+    assert snapshot.is_free("fenying_wenquan.mp3") is False
+    assert snapshot.is_free("missing.mp3") is None
+
+    menstrual = snapshot.phases_for(is_member=False)[0]
+    assert menstrual["phase_display_name"] == "月经期"
+    assert menstrual["free_audio_count"] == 1
+    assert menstrual["audios"][0]["audio_display_name"] == "摇篮潮汐"
+    assert [audio["is_accessible"] for audio in menstrual["audios"]] == [True, False]
+
+
+def test_members_can_access_every_audio():
+    snapshot = AudioCatalogSnapshot(ROWS, version=1, digest="d")
+
+    assert snapshot.accessible_count(is_member=True) == 4
+    assert snapshot.accessible_count(is_member=False) == 2
+    assert all(
+        audio["is_accessible"]
+        for phase in snapshot.phases_for(is_member=True)
+        for audio in phase["audios"]
+    )
+
+
+def test_catalog_keeps_version_when_rows_unchanged():
+    loads: List[int] = []
+
+    async def loader() -> List[Dict[str, Any]]:
+        loads.append(1)
+        return ROWS
+
+    async def scenario() -> None:
+        catalog = AudioCatalog(loader)
+        first = await catalog.get()
+        second = await catalog.refresh()
+        assert second is first
+        assert second.version == 1
+
+    asyncio.run(scenario())
+    assert len(loads) == 2
+
+
+def test_invalidate_during_reload_keeps_catalog_stale():
+    rows = [ROWS]
+
+    async def scenario() -> None:
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def loader() -> List[Dict[str, Any]]:
+            loaded = rows[0]
+            started.set()
+            await release.wait()
+            return loaded
+
+        catalog = AudioCatalog(loader)
+        reload = asyncio.ensure_future(catalog.refresh())
+        await started.wait()
+        # 加载期间目录被修改：这次加载读到的可能是旧数据
+        catalog.invalidate()
+        rows[0] = ROWS[:2]
+        release.set()
+        await reload
+
+        snapshot = await catalog.get()
+        assert snapshot.total_audio_count == 4
+        updated = await catalog.refresh()
+        assert updated.total_audio_count == 2
+        assert updated.version == 2
+
+    asyncio.run(scenario())
@@ -0,0 +1,103 @@
+"""
+鉴权音频传输测试 - 文件名校验、Content-Type 判断、Range / 条件请求和访问权限
+
+运行：
+    python -m pytest test_audio_files.py -q
+"""
+import asyncio
+from typing import Any, Dict, List
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from audio_catalog import AudioCatalog
+from audio_files import AudioFileStore, sniff_media_type
+from database_service import DatabaseService
+
+MP3_BYTES = b"ID3\x04\x00\x00\x00\x00\x00\x00" + bytes(range(256)) * 4
+M4A_BYTES = b"\x00\x00\x00\x20ftypM4A \x00\x00\x00\x00" + bytes(1000)
+
+
+def _store(tmp_path) -> AudioFileStore:
+    (tmp_path / "song.mp3").write_bytes(MP3_BYTES)
+    (tmp_path / "aac.mp3").write_bytes(M4A_BYTES)
+    return AudioFileStore(str(tmp_path))
+
+
+def _client(store: AudioFileStore) -> TestClient:
+    app = FastAPI()
+
+    @app.api_route("/audio/{audio_name}", methods=["GET", "HEAD"])
+    async def audio(audio_name: str, request: Request):
+        audio_file = store.resolve(audio_name)
+        if audio_file is None:
+            raise HTTPException(status_code=404)
+        return store.response(audio_file, request)
+
+    return TestClient(app)
+
+
+def test_sniff_media_type_uses_container_not_extension(tmp_path):
+    store = _store(tmp_path)
+
+    assert sniff_media_type(str(tmp_path / "song.mp3")) == "audio/mpeg"
+    assert sniff_media_type(str(tmp_path / "aac.mp3")) == "audio/mp4"
+    assert store.resolve("aac.mp3").media_type == "audio/mp4"
+
+
+def test_resolve_rejects_names_outside_directory(tmp_path):
+    store = _store(tmp_path)
+
+    assert store.resolve("../song.mp3") is None
+    assert store.resolve("song.wav") is None
+    assert store.resolve("missing.mp3") is None
+    assert store.resolve("song.mp3").name == "song.mp3"
+
+
+def test_range_and_conditional_requests(tmp_path):
+    client = _client(_store(tmp_path))
+
+    full = client.get("/audio/aac.mp3")
+    assert full.status_code == 200
+    assert full.headers["content-type"] == "audio/mp4"
+    assert full.headers["cache-control"].startswith("private")
+
+    partial = client.get("/audio/song.mp3", headers={"Range": "bytes=10-19"})
+    assert partial.status_code == 206
+    assert partial.content == MP3_BYTES[10:20]
+    assert partial.headers["content-range"] == f"bytes 10-19/{len(MP3_BYTES)}"
+
+    assert client.get("/audio/song.mp3", headers={"If-None-Match": full.headers["etag"]}).status_code == 200
+    etag = client.get("/audio/song.mp3").headers["etag"]
+    assert client.get("/audio/song.mp3", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/audio/missing.mp3").status_code == 404
+
+
+def test_access_permission_uses_schema_access_level():
+    rows: List[Dict[str, Any]] = [
+        {"audio_name": "free.mp3", "audio_title": "免费", "cycle_phase": "menstrual",
+         "access_level": "free", "display_order": 1},
+        {"audio_name": "paid.mp3", "audio_title": "付费", "cycle_phase": "menstrual",
+         "access_level": "paid", "display_order": 2},
+    ]
+    members = {"member"}
+
+    async def loader() -> List[Dict[str, Any]]:
+        return rows
+
+    async def membership(user_id: str, use_cache: bool = True) -> Dict[str, Any]:
+        return {"is_member": user_id in members}
+
+    service = DatabaseService(client=object())
+    service.audio_catalog = AudioCatalog(loader)
+    service.get_user_membership_status = membership
+
+    async def scenario() -> List[bool]:
+        return [
+            await service.check_audio_access_permission("guest", "free.mp3"),
+            await service.check_audio_access_permission("guest", "paid.mp3"),
+            await service.check_audio_access_permission("member", "paid.mp3"),
+            await service.check_audio_access_permission("member", "missing.mp3"),
+        ]
+
+    assert asyncio.run(scenario()) == [True, False, True, False]
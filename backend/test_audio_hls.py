@@ -0,0 +1,71 @@
+"""
+多码率 HLS 测试 - 码率选择、播放列表改写和默认打包目录
+
+运行：
+    python -m pytest test_audio_hls.py -q
+"""
+import os
+
+from audio_hls import DEFAULT_HLS_DIR, build_master_playlist, choose_rendition, rewrite_playlist
+
+ALL = {"low": {}, "mid": {}, "high": {}}
+
+MEDIA_PLAYLIST = """#EXTM3U
+#EXT-X-VERSION:7
+#EXT-X-TARGETDURATION:6
+#EXT-X-MAP:URI="../segments/0123456789abcdef0123.mp4"
+#EXTINF:6.000000,
+../segments/aaaaaaaaaaaaaaaaaaaa.m4s
+
+#EXTINF:4.500000,
+../segments/bbbbbbbbbbbbbbbbbbbb.m4s
+#EXT-X-ENDLIST"""
+
+
+def test_device_picks_default_rendition():
+    assert choose_rendition(ALL, "mobile") == "mid"
+    assert choose_rendition(ALL, "pc") == "high"
+    assert choose_rendition(ALL, "tablet") == "high"
+
+
+def test_save_data_and_requested_quality():
+    assert choose_rendition(ALL, "pc", save_data=True) == "low"
+    assert choose_rendition(ALL, "mobile", save_data=True, requested="high") == "high"
+    assert choose_rendition(ALL, "pc", requested="ultra") == "high"
+
+
+def test_falls_back_to_packaged_renditions():
+    # 默认档未打包时退到不高于它的最高一档，没有更低档时用最低的一档
+    assert choose_rendition({"low": {}, "high": {}}, "mobile") == "low"
+    assert choose_rendition({"high": {}}, "mobile") == "high"
+    assert choose_rendition({"unknown": {}}, "pc") is None
+    assert choose_rendition({}, "pc") is None
+
+
+def test_rewrite_playlist_signs_segments_and_init_map():
+    text = rewrite_playlist(MEDIA_PLAYLIST, lambda name: f"https://cdn/{name}?sig=s")
+
+    lines = text.splitlines()
+    assert '#EXT-X-MAP:URI="https://cdn/0123456789abcdef0123.mp4?sig=s"' in lines
+    assert "https://cdn/aaaaaaaaaaaaaaaaaaaa.m4s?sig=s" in lines
+    assert "https://cdn/bbbbbbbbbbbbbbbbbbbb.m4s?sig=s" in lines
+    assert "#EXTINF:4.500000," in lines
+    assert "" in lines
+    assert text.endswith("#EXT-X-ENDLIST\n")
+
+
+def test_master_playlist_lists_packaged_renditions_in_order():
+    renditions = {
+        "high": {"peak_bandwidth": 170000, "average_bandwidth": 161000},
+        "low": {"peak_bandwidth": 52000, "average_bandwidth": 49000},
+    }
+
+    text = rewrite_playlist(build_master_playlist(renditions), lambda name: f"/hls/{name}")
+
+    assert [line for line in text.splitlines() if not line.startswith("#")] == ["/hls/low.m3u8", "/hls/high.m3u8"]
+
+
+def test_default_directory_ships_with_backend():
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+
+    assert DEFAULT_HLS_DIR == os.path.join(backend_dir, "media", "hls")
@@ -0,0 +1,65 @@
+"""
+波形峰值测试 - 峰值计算、文件编码/解码，以及随部署提交的峰值文件
+
+运行：
+    python -m pytest test_audio_peaks.py -q
+"""
+import os
+import struct
+
+import pytest
+
+from audio_files import DEFAULT_AUDIO_DIR
+from audio_peaks import PEAK_RESOLUTIONS, PeakAccumulator, PeaksStore, decode_peaks, encode_peaks
+
+
+def _pcm(samples):
+    return struct.pack(f"<{len(samples)}h", *samples)
+
+
+@pytest.mark.parametrize("vectorized", [True, False])
+def test_accumulator_merges_blocks(vectorized):
+    accumulator = PeakAccumulator(block_samples=4)
+    if not vectorized:
+        accumulator._np = None
+    pcm = _pcm([0, 256, -512, 0] * 2 + [32767, -32768, 0, 0] * 2)
+
+    # 分段输入，分段边界不与块对齐
+    accumulator.feed(pcm[:5])
+    accumulator.feed(pcm[5:])
+    low, high = accumulator.finish(resolutions=(2, 8))
+
+    assert accumulator.samples == 16
+    assert list(struct.unpack("<4b", low)) == [-2, 1, -128, 127]
+    # 块数少于分辨率时点数等于块数
+    assert len(high) == 4 * 2
+
+
+def test_encode_decode_round_trip():
+    peaks = struct.pack("<6b", -3, 4, -128, 127, 0, 0)
+
+    sample_rate, duration_ms, points = decode_peaks(encode_peaks(peaks, 11025, 11025 * 3 + 5512))
+
+    assert sample_rate == 11025
+    assert duration_ms == 3499
+    assert points == [(-3, 4), (-128, 127), (0, 0)]
+
+
+def test_decode_rejects_other_files():
+    with pytest.raises(ValueError):
+        decode_peaks(b"ID3\x04" + bytes(32))
+
+
+def test_every_deployed_audio_has_peaks():
+    store = PeaksStore(DEFAULT_AUDIO_DIR)
+    audio_names = [name for name in os.listdir(DEFAULT_AUDIO_DIR) if name.endswith(".mp3")]
+
+    assert audio_names
+    for audio_name in audio_names:
+        for bins in PEAK_RESOLUTIONS:
+            peaks_file = store.resolve(audio_name, bins)
+            assert peaks_file is not None, f"缺少 {audio_name} 的 {bins} 点峰值文件，请运行 audio_peaks.py"
+            with open(peaks_file.path, "rb") as file:
+                _, duration_ms, points = decode_peaks(file.read())
+            assert duration_ms > 0
+            assert len(points) == bins
@@ -0,0 +1,90 @@
+"""
+音频签名链接测试 - 过期时间、密钥轮换、篡改，以及未登录访客的免费音频
+
+运行：
+    python -m pytest test_audio_signing.py -q
+"""
+import asyncio
+from typing import Any, Dict, List
+
+from audio_catalog import AudioCatalog
+from audio_signing import AudioUrlSigner
+from database_service import DatabaseService
+
+NOW = 1_750_000_000.0
+OLD_KEY = b"o" * 32
+NEW_KEY = b"n" * 32
+
+
+def test_expires_at_rounds_up_to_bucket():
+    signer = AudioUrlSigner(keys=[NEW_KEY], ttl=3600, bucket=900)
+
+    expires = signer.expires_at(now=NOW)
+
+    assert expires % 900 == 0
+    assert NOW + 3600 <= expires < NOW + 3600 + 900
+    assert signer.expires_at(now=NOW + 1) == expires
+
+
+def test_signature_expires():
+    signer = AudioUrlSigner(keys=[NEW_KEY], ttl=60, bucket=0)
+    expires = signer.expires_at(now=NOW)
+    signature = signer.sign("song.mp3", expires)
+
+    assert signer.verify("song.mp3", expires, signature, now=NOW)
+    assert signer.verify("song.mp3", expires, signature, now=expires)
+    assert not signer.verify("song.mp3", expires, signature, now=expires + 1)
+
+
+def test_previous_key_still_verifies_after_rotation():
+    old_signer = AudioUrlSigner(keys=[OLD_KEY], ttl=60, bucket=0)
+    rotated = AudioUrlSigner(keys=[NEW_KEY, OLD_KEY], ttl=60, bucket=0)
+    retired = AudioUrlSigner(keys=[NEW_KEY], ttl=60, bucket=0)
+    expires = old_signer.expires_at(now=NOW)
+    signature = old_signer.sign("song.mp3", expires)
+
+    assert rotated.verify("song.mp3", expires, signature, now=NOW)
+    assert not retired.verify("song.mp3", expires, signature, now=NOW)
+    # 轮换后用新密钥签名
+    assert rotated.sign("song.mp3", expires) == retired.sign("song.mp3", expires)
+
+
+def test_tampered_links_are_rejected():
+    signer = AudioUrlSigner(keys=[NEW_KEY], ttl=60, bucket=0)
+    expires = signer.expires_at(now=NOW)
+    signature = signer.sign("free.mp3", expires)
+    flipped = ("A" if signature[0] != "A" else "B") + signature[1:]
+
+    assert not signer.verify("paid.mp3", expires, signature, now=NOW)
+    assert not signer.verify("free.mp3", expires + 900, signature, now=NOW)
+    assert not signer.verify("free.mp3", expires, flipped, now=NOW)
+    assert not signer.verify("free.mp3", expires, signature[:-2], now=NOW)
+    assert not signer.verify("free.mp3", expires, "%%%", now=NOW)
+
+
+def test_anonymous_visitors_get_free_audio_only():
+    rows: List[Dict[str, Any]] = [
+        {"audio_name": "free.mp3", "audio_title": "免费", "cycle_phase": "menstrual",
+         "access_level": "free", "display_order": 1},
+        {"audio_name": "paid.mp3", "audio_title": "付费", "cycle_phase": "menstrual",
+         "access_level": "paid", "display_order": 2},
+    ]
+
+    async def loader() -> List[Dict[str, Any]]:
+        return rows
+
+    async def membership(user_id: str, use_cache: bool = True) -> Dict[str, Any]:
+        assert user_id == "member", "未登录访客不应查询会员状态"
+        return {"is_member": True}
+
+    service = DatabaseService(client=object())
+    service.audio_catalog = AudioCatalog(loader)
+    service.get_user_membership_status = membership
+
+    async def scenario() -> List[List[str]]:
+        return [
+            await service.get_accessible_audio_names(None),
+            await service.get_accessible_audio_names("member"),
+        ]
+
+    assert asyncio.run(scenario()) == [["free.mp3"], ["free.mp3", "paid.mp3"]]
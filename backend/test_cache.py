@@ -0,0 +1,76 @@
+"""
+进程内缓存测试 - TTLCache 的过期和淘汰，以及会员状态缓存的存活时间
+
+运行：
+    python -m pytest test_cache.py -q
+"""
+from datetime import datetime, timedelta, timezone
+
+import cache
+from cache import TTLCache
+from database_service import DatabaseService
+
+
+class FakeClock:
+    """替换 time.monotonic 的可控时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    entries = TTLCache(max_size=10, default_ttl=60)
+
+    entries.set("a", 1)
+    entries.set("b", 2, ttl=5)
+    clock.now += 10
+
+    assert entries.get("a") == 1
+    assert entries.get("b") is None
+    assert entries.stats()["hits"] == 1
+    assert entries.stats()["misses"] == 1
+
+
+def test_non_positive_ttl_is_not_stored():
+    entries = TTLCache(max_size=10, default_ttl=60)
+
+    entries.set("a", 1, ttl=0)
+
+    assert entries.get("a") is None
+
+
+def test_least_recently_used_entry_is_evicted():
+    entries = TTLCache(max_size=2, default_ttl=60)
+
+    entries.set("a", 1)
+    entries.set("b", 2)
+    entries.get("a")
+    entries.set("c", 3)
+
+    assert entries.get("b") is None
+    assert entries.get("a") == 1
+    assert entries.get("c") == 3
+    assert entries.stats()["evictions"] == 1
+
+
+def test_non_member_status_is_cached_briefly(monkeypatch):
+    monkeypatch.setenv("MEMBERSHIP_NEGATIVE_CACHE_TTL", "10")
+    service = DatabaseService(client=object())
+
+    assert service._membership_cache_ttl({"is_member": False}) == 10
+    assert service._membership_cache_ttl(None) == 10
+
+
+def test_member_status_ttl_is_capped_by_expiry():
+    service = DatabaseService(client=object())
+    expires_at = (datetime.now(timezone.utc) + timedelta(seconds=120)).isoformat()
+
+    ttl = service._membership_cache_ttl({"is_member": True, "expires_at": expires_at})
+
+    assert 100 < ttl <= 120
+    assert service._membership_cache_ttl({"is_member": True, "expires_at": None}) == service.membership_cache.default_ttl
@@ -0,0 +1,108 @@
+"""
+熔断器测试 - closed / open / half_open 状态切换和探测名额
+
+运行：
+    python -m pytest test_circuit_breaker.py -q
+"""
+import pytest
+
+import circuit_breaker
+from circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpenError
+
+
+class FakeClock:
+    """替换 time.monotonic 的可控时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker.time, "monotonic", fake)
+    return fake
+
+
+def _fail(breaker: CircuitBreaker, times: int) -> None:
+    for _ in range(times):
+        breaker.acquire()
+        breaker.release(False)
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("zpay", failure_threshold=3, recovery_seconds=30)
+
+    _fail(breaker, 2)
+    breaker.acquire()
+    breaker.release(True)
+    _fail(breaker, 2)
+    # 中间的成功清零了连续失败次数
+    assert breaker.state == CLOSED
+
+    _fail(breaker, 1)
+    assert breaker.state == OPEN
+    clock.now += 10
+    with pytest.raises(CircuitOpenError) as error:
+        breaker.acquire()
+    assert error.value.retry_after == pytest.approx(20)
+    assert breaker.stats()["rejected"] == 1
+
+
+def test_half_open_probe_success_closes(clock):
+    breaker = CircuitBreaker("zpay", failure_threshold=1, recovery_seconds=30)
+    _fail(breaker, 1)
+
+    clock.now += 30
+    assert breaker.state == HALF_OPEN
+    breaker.acquire()
+    # 探测名额已满，其余请求继续拒绝
+    with pytest.raises(CircuitOpenError):
+        breaker.check()
+    with pytest.raises(CircuitOpenError):
+        breaker.acquire()
+
+    breaker.release(True)
+    assert breaker.state == CLOSED
+    assert breaker.stats()["consecutive_failures"] == 0
+
+
+def test_half_open_probe_failure_reopens(clock):
+    breaker = CircuitBreaker("zpay", failure_threshold=1, recovery_seconds=30)
+    _fail(breaker, 1)
+    clock.now += 30
+
+    breaker.acquire()
+    breaker.release(False)
+
+    assert breaker.state == OPEN
+    assert breaker.stats()["opened"] == 2
+    # 重新计时
+    clock.now += 29
+    assert breaker.state == OPEN
+    clock.now += 1
+    assert breaker.state == HALF_OPEN
+
+
+def test_cancelled_probe_only_returns_its_slot(clock):
+    breaker = CircuitBreaker("zpay", failure_threshold=1, recovery_seconds=30)
+    _fail(breaker, 1)
+    clock.now += 30
+
+    breaker.acquire()
+    breaker.release(None)
+
+    assert breaker.state == HALF_OPEN
+    breaker.acquire()
+
+
+def test_zero_threshold_never_opens(clock):
+    breaker = CircuitBreaker("zpay", failure_threshold=0)
+
+    _fail(breaker, 100)
+
+    assert breaker.state == CLOSED
+    breaker.check()
@@ -0,0 +1,119 @@
+"""
+支付后续任务 worker 测试 - 后台 worker 未运行（Serverless）时的会员发放路径
+
+运行：
+    python -m pytest test_outbox_worker.py -q
+"""
+import asyncio
+from typing import Any, Dict, List
+
+from outbox_worker import OutboxWorker
+
+
+class InMemoryOutbox:
+    """payment_outbox 和 grant_membership 的内存实现（与 PAYMENT_OUTBOX.sql 的行为一致）"""
+
+    def __init__(self, order_ids: List[str], failures: int = 0):
+        """
+        Args:
+            order_ids: 已支付、已写入发放任务的订单
+            failures: grant_membership 前几次调用失败
+        """
+        self.tasks = [
+            {"id": index + 1, "order_id": order_id, "kind": "grant_membership", "status": "pending", "attempts": 0}
+            for index, order_id in enumerate(order_ids)
+        ]
+        self.granted: Dict[str, int] = {}
+        self.failures = failures
+        self.grant_calls = 0
+
+    async def grant_membership(self, order_id: str) -> Dict[str, Any]:
+        self.grant_calls += 1
+        if self.failures > 0:
+            self.failures -= 1
+            raise Exception("数据库请求超时")
+        if order_id in self.granted:
+            return {"outcome": "already_granted", "user_id": "user-1"}
+        self.granted[order_id] = 1
+        return {"outcome": "granted", "user_id": "user-1"}
+
+    async def claim_outbox_batch(self, limit: int, lease_seconds: int) -> List[Dict[str, Any]]:
+        # 已领取未处理完的任务在租约内不会被其他 worker 领取
+        batch = [task for task in self.tasks if task["status"] == "pending" and not task.get("locked")][:limit]
+        for task in batch:
+            task["attempts"] += 1
+            task["locked"] = True
+        return [dict(task) for task in batch]
+
+    async def complete_outbox(self, ids: List[int]) -> None:
+        for task in self.tasks:
+            if task["id"] in ids:
+                task["status"] = "done"
+                task["locked"] = False
+
+    async def fail_outbox(self, task_id: int, error: str, retry_seconds: int, max_attempts: int) -> Dict[str, Any]:
+        task = next(task for task in self.tasks if task["id"] == task_id)
+        task["locked"] = False
+        if task["attempts"] >= max_attempts:
+            task["status"] = "dead"
+        return dict(task)
+
+
+def test_dispatch_grants_inline_when_worker_not_running():
+    database = InMemoryOutbox(["order-1"])
+    worker = OutboxWorker(database)
+
+    asyncio.run(worker.dispatch("order-1"))
+
+    assert not worker.running
+    assert database.granted == {"order-1": 1}
+    # 任务保留在队列中，由定时 drain 确认
+    assert database.tasks[0]["status"] == "pending"
+
+
+def test_drain_completes_task_already_granted_inline():
+    database = InMemoryOutbox(["order-1"])
+    worker = OutboxWorker(database)
+
+    async def scenario() -> int:
+        await worker.dispatch("order-1")
+        return await worker.drain()
+
+    assert asyncio.run(scenario()) == 1
+    assert database.granted == {"order-1": 1}
+    assert database.tasks[0]["status"] == "done"
+
+
+def test_inline_failure_is_retried_by_drain():
+    database = InMemoryOutbox(["order-1"], failures=1)
+    worker = OutboxWorker(database)
+
+    async def scenario() -> int:
+        # 直接发放失败不影响支付通知应答
+        await worker.dispatch("order-1")
+        assert database.granted == {}
+        return await worker.drain()
+
+    assert asyncio.run(scenario()) == 1
+    assert database.granted == {"order-1": 1}
+    assert database.tasks[0]["status"] == "done"
+
+
+def test_dispatch_only_wakes_running_worker():
+    database = InMemoryOutbox(["order-1"])
+    worker = OutboxWorker(database)
+
+    async def scenario() -> None:
+        worker.start()
+        try:
+            await worker.dispatch("order-1")
+            for _ in range(100):
+                if database.tasks[0]["status"] == "done":
+                    break
+                await asyncio.sleep(0.01)
+        finally:
+            await worker.stop()
+
+    asyncio.run(scenario())
+    assert database.grant_calls == 1
+    assert database.tasks[0]["status"] == "done"
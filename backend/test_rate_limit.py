@@ -0,0 +1,105 @@
+"""
+令牌桶限流测试 - 规则解析、令牌补充、多桶检查和客户端IP来源
+
+运行：
+    python -m pytest test_rate_limit.py -q
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from rate_limit import MemoryTokenBuckets, RateLimiter, RateLimitPolicy
+from utils import get_client_ip
+
+
+def _request(headers, host="10.0.0.1"):
+    """只包含 get_client_ip 用到的属性的请求（请求头按小写存放）"""
+    lowered = {name.lower(): value for name, value in headers.items()}
+    return SimpleNamespace(
+        headers=SimpleNamespace(get=lambda name, default=None: lowered.get(name.lower(), default)),
+        client=SimpleNamespace(host=host)
+    )
+
+
+def test_parse_policy():
+    assert RateLimitPolicy.parse("10/60") == RateLimitPolicy(10.0, 10 / 60)
+    assert RateLimitPolicy.parse("5") == RateLimitPolicy(5.0, 5.0)
+    assert RateLimitPolicy.parse("0") is None
+    assert RateLimitPolicy.parse(None) is None
+    with pytest.raises(ValueError):
+        RateLimitPolicy.parse("10/0")
+
+
+def test_bucket_drains_and_refills():
+    buckets = MemoryTokenBuckets()
+    policy = RateLimitPolicy(2, 0.5)
+
+    assert buckets.take("k", policy, now=0).allowed
+    assert buckets.take("k", policy, now=0).allowed
+    denied = buckets.take("k", policy, now=0)
+    assert not denied.allowed
+    assert denied.retry_after == pytest.approx(2.0)
+
+    assert not buckets.take("k", policy, now=1).allowed
+    assert buckets.take("k", policy, now=2.5).allowed
+    # 补充不超过容量
+    assert buckets.take("k", policy, now=1000).allowed
+    assert buckets.take("k", policy, now=1000).allowed
+    assert not buckets.take("k", policy, now=1000).allowed
+
+
+def test_least_recently_used_bucket_is_evicted():
+    buckets = MemoryTokenBuckets(max_keys=2)
+    policy = RateLimitPolicy(1, 0.001)
+
+    buckets.take("a", policy, now=0)
+    buckets.take("b", policy, now=0)
+    buckets.take("c", policy, now=0)
+
+    assert len(buckets) == 2
+    # 被淘汰的桶等同于满桶
+    assert buckets.take("a", policy, now=0).allowed
+    assert not buckets.take("c", policy, now=0).allowed
+
+
+def test_check_stops_at_first_denied_bucket():
+    limiter = RateLimiter(backend="memory", enabled=True)
+    user_policy = RateLimitPolicy(1, 0.001)
+    ip_policy = RateLimitPolicy(2, 0.001)
+
+    async def scenario():
+        first = await limiter.check([("user:a", user_policy), ("ip:1", ip_policy)])
+        second = await limiter.check([("user:a", user_policy), ("ip:1", ip_policy)])
+        third = await limiter.check([("user:b", user_policy), ("ip:1", ip_policy), ("off", None)])
+        return first, second, third
+
+    first, second, third = asyncio.run(scenario())
+
+    assert first.allowed and not second.allowed
+    # 被用户桶拒绝的请求没有消耗 IP 桶的令牌
+    assert third.allowed
+    assert limiter.stats()["limited"] == 1
+
+
+def test_client_ip_ignores_spoofed_forwarded_for(monkeypatch):
+    monkeypatch.delenv("VERCEL", raising=False)
+    monkeypatch.delenv("TRUSTED_PROXY_COUNT", raising=False)
+    spoofed = {"X-Forwarded-For": "1.1.1.1, 203.0.113.7"}
+
+    assert get_client_ip(_request(spoofed)) == "203.0.113.7"
+    assert get_client_ip(_request({})) == "10.0.0.1"
+
+    monkeypatch.setenv("TRUSTED_PROXY_COUNT", "2")
+    assert get_client_ip(_request({"X-Forwarded-For": "1.1.1.1, 203.0.113.7, 10.0.0.2"})) == "203.0.113.7"
+
+    monkeypatch.setenv("TRUSTED_PROXY_COUNT", "0")
+    assert get_client_ip(_request({**spoofed, "X-Real-IP": "2.2.2.2"})) == "10.0.0.1"
+
+
+def test_client_ip_on_vercel(monkeypatch):
+    monkeypatch.setenv("VERCEL", "1")
+    headers = {"X-Forwarded-For": "1.1.1.1", "x-vercel-forwarded-for": "198.51.100.4"}
+
+    assert get_client_ip(_request(headers)) == "198.51.100.4"
+    assert get_client_ip(_request({"X-Real-IP": "198.51.100.5"})) == "198.51.100.5"
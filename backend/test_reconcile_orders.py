@@ -0,0 +1,127 @@
+"""
+订单对账测试 - 内存订单表和 ZPay 替身
+
+运行：
+    python -m pytest test_reconcile_orders.py -q
+"""
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from reconcile_orders import OrderReconciler
+
+CREATED_AT = (datetime.now(timezone.utc) - timedelta(hours=2)).isoformat()
+
+
+class InMemoryOrders:
+    """orders 表中对账用到的查询和更新"""
+
+    def __init__(self, orders: Dict[str, str]):
+        """
+        Args:
+            orders: 商户订单号 → 订单状态
+        """
+        self.orders = {
+            out_trade_no: {"out_trade_no": out_trade_no, "status": status, "amount": "9.90",
+                           "created_at": CREATED_AT, "reconciled_at": None}
+            for out_trade_no, status in orders.items()
+        }
+        self.settled: List[str] = []
+
+    async def iter_orders(self, status: str, created_before: datetime, created_after: Optional[datetime] = None,
+                          page_size: int = 500, unreconciled_only: bool = False):
+        rows = [
+            dict(order) for order in self.orders.values()
+            if order["status"] == status and not (unreconciled_only and order["reconciled_at"])
+        ]
+        for start in range(0, len(rows), page_size):
+            yield rows[start:start + page_size]
+
+    async def settle_order(self, out_trade_no: str, amount: float, zpay_trade_no: Optional[str] = None) -> Dict[str, Any]:
+        self.orders[out_trade_no]["status"] = "paid"
+        self.settled.append(out_trade_no)
+        return {"outcome": "paid"}
+
+    async def expire_orders(self, out_trade_nos: List[str]) -> int:
+        for out_trade_no in out_trade_nos:
+            self.orders[out_trade_no]["status"] = "expired"
+            self.orders[out_trade_no]["reconciled_at"] = datetime.now(timezone.utc).isoformat()
+        return len(out_trade_nos)
+
+    async def mark_orders_reconciled(self, out_trade_nos: List[str]) -> int:
+        for out_trade_no in out_trade_nos:
+            self.orders[out_trade_no]["reconciled_at"] = datetime.now(timezone.utc).isoformat()
+        return len(out_trade_nos)
+
+
+class FakeZPay:
+    """query_order 替身：paid 中的订单已支付，money_missing 中的订单已支付但缺少金额"""
+
+    def __init__(self, paid=(), money_missing=(), failing=()):
+        self.paid = set(paid)
+        self.money_missing = set(money_missing)
+        self.failing = set(failing)
+        self.queries: List[str] = []
+
+    async def query_order(self, out_trade_no: str) -> Dict[str, Any]:
+        self.queries.append(out_trade_no)
+        if out_trade_no in self.failing:
+            raise Exception("ZPay 请求超时")
+        if out_trade_no in self.money_missing:
+            return {"found": True, "paid": True, "trade_no": "t", "money": None}
+        if out_trade_no in self.paid:
+            return {"found": True, "paid": True, "trade_no": "t", "money": 9.9}
+        return {"found": True, "paid": False, "trade_no": None, "money": None}
+
+
+def _run(database, zpay, **kwargs) -> Dict[str, Any]:
+    reconciler = OrderReconciler(database, zpay, qps=0)
+    return asyncio.run(reconciler.run(
+        min_age=timedelta(minutes=10),
+        expire_after=timedelta(minutes=30),
+        expired_lookback=kwargs.pop("expired_lookback", timedelta(hours=24)),
+        **kwargs
+    ))
+
+
+def test_pending_orders_are_settled_or_expired():
+    database = InMemoryOrders({"paid": "pending", "unpaid": "pending", "no-money": "pending"})
+    zpay = FakeZPay(paid=["paid"], money_missing=["no-money"])
+
+    summary = _run(database, zpay)
+
+    assert database.settled == ["paid"]
+    assert database.orders["unpaid"]["status"] == "expired"
+    # 缺少实付金额时不结算，留给人工核对
+    assert database.orders["no-money"]["status"] == "pending"
+    assert summary["errors"] == 1
+    # 刚确认未支付并标记过期的订单不会在同一轮回查中再次查询
+    assert zpay.queries.count("unpaid") == 1
+
+
+def test_expired_orders_are_checked_once():
+    database = InMemoryOrders({"lost-notify": "expired", "abandoned": "expired", "flaky": "expired"})
+    zpay = FakeZPay(paid=["lost-notify"], failing=["flaky"])
+
+    _run(database, zpay)
+    assert database.settled == ["lost-notify"]
+    assert database.orders["abandoned"]["status"] == "expired"
+    assert database.orders["abandoned"]["reconciled_at"] is not None
+    assert database.orders["flaky"]["reconciled_at"] is None
+
+    zpay.queries.clear()
+    zpay.failing.clear()
+    _run(database, zpay)
+    # 已确认未支付的订单不再查询，查询失败的订单重试
+    assert zpay.queries == ["flaky"]
+
+
+def test_limit_counts_every_examined_order():
+    database = InMemoryOrders({f"o{index}": "pending" for index in range(5)})
+    zpay = FakeZPay(failing=["o0", "o1"])
+
+    summary = _run(database, zpay, limit=3, page_size=2)
+
+    assert summary["examined"] == 3
+    assert summary["checked"] == 1
+    assert len(zpay.queries) == 3
@@ -0,0 +1,81 @@
+"""
+订单结算测试 - settle_order RPC 的结果解析和重复通知缓存
+
+运行：
+    python -m pytest test_settle_order.py -q
+"""
+import asyncio
+from types import SimpleNamespace
+from typing import Any, Dict, List, Optional
+
+import pytest
+
+from database_service import DatabaseService
+
+
+class FakeRpcClient:
+    """只实现 rpc() 的 Supabase 客户端替身：settle_order 返回一行 JSONB 结果集"""
+
+    def __init__(self, outcomes: Dict[str, Optional[Dict[str, Any]]]):
+        """
+        Args:
+            outcomes: 商户订单号 → 数据库函数返回的结算结果（None 表示返回空结果集）
+        """
+        self.outcomes = outcomes
+        self.calls: List[Dict[str, Any]] = []
+
+    def rpc(self, name: str, params: Dict[str, Any]):
+        assert name == "settle_order"
+        self.calls.append(params)
+        settlement = self.outcomes[params["p_out_trade_no"]]
+        data = [settlement] if settlement is not None else []
+        return SimpleNamespace(execute=lambda: SimpleNamespace(data=data))
+
+
+def _settlement(outcome: str) -> Dict[str, Any]:
+    return {
+        "outcome": outcome,
+        "order_id": "order-1",
+        "user_id": "user-1",
+        "order_type": "subscription",
+        "subscription_type": "monthly_3",
+        "membership_pending": outcome == "paid"
+    }
+
+
+def test_paid_settlement_answers_repeated_notify_from_cache():
+    client = FakeRpcClient({"A1": _settlement("paid")})
+    service = DatabaseService(client=client)
+
+    async def scenario():
+        first = await service.settle_order("A1", 29.99, "Z1")
+        repeated = await service.settle_order("A1", 29.99, "Z1")
+        return first, repeated
+
+    first, repeated = asyncio.run(scenario())
+
+    assert first["outcome"] == "paid"
+    assert client.calls == [{"p_out_trade_no": "A1", "p_amount": 29.99, "p_zpay_trade_no": "Z1"}]
+    assert repeated["outcome"] == "already_paid"
+    assert repeated["cached"] is True
+    assert repeated["user_id"] == "user-1"
+
+
+def test_rejected_settlement_is_not_cached():
+    client = FakeRpcClient({"A2": _settlement("amount_mismatch")})
+    service = DatabaseService(client=client)
+
+    async def scenario():
+        return [await service.settle_order("A2", 0.01, "Z2") for _ in range(2)]
+
+    results = asyncio.run(scenario())
+
+    assert [result["outcome"] for result in results] == ["amount_mismatch", "amount_mismatch"]
+    assert len(client.calls) == 2
+
+
+def test_empty_result_set_raises():
+    service = DatabaseService(client=FakeRpcClient({"A3": None}))
+
+    with pytest.raises(Exception, match="结算订单失败"):
+        asyncio.run(service.settle_order("A3", 29.99))
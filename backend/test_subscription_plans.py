@@ -0,0 +1,68 @@
+"""
+订阅套餐注册表测试 - 快照加载前的默认定价和快照的 ETag
+
+运行：
+    python -m pytest test_subscription_plans.py -q
+"""
+import asyncio
+import json
+from typing import Any, Dict, List
+
+from subscription_plans import DEFAULT_PLAN_ROWS, PlanRegistry
+
+
+def _rows(price: float) -> List[Dict[str, Any]]:
+    rows = [dict(row) for row in DEFAULT_PLAN_ROWS]
+    rows[0]["price"] = price
+    rows[0]["updated_at"] = "2025-06-28T00:00:00+00:00"
+    return rows
+
+
+def test_get_nowait_loads_in_background():
+    loads: List[int] = []
+
+    async def loader() -> List[Dict[str, Any]]:
+        loads.append(1)
+        return _rows(19.99)
+
+    async def scenario() -> None:
+        registry = PlanRegistry(loader)
+        # 冷启动：不等待数据库，返回 None 并在后台加载
+        assert registry.get_nowait() is None
+        for _ in range(10):
+            await asyncio.sleep(0)
+        plans = registry.get_nowait()
+        assert plans is not None
+        assert plans.get("monthly_3").price == 19.99
+
+    asyncio.run(scenario())
+    assert len(loads) == 1
+
+
+def test_default_snapshot_matches_seed_plans():
+    async def loader() -> List[Dict[str, Any]]:
+        raise AssertionError("默认定价不应访问数据库")
+
+    body = json.loads(PlanRegistry(loader).default_snapshot.pricing_body)
+
+    assert list(body["pricing"]) == ["monthly_3", "yearly", "lifetime"]
+    assert body["pricing"]["yearly"]["price"] == 99.99
+    assert body["currency"] == "CNY"
+
+
+def test_etag_changes_with_price():
+    prices = [29.99]
+
+    async def loader() -> List[Dict[str, Any]]:
+        return _rows(prices[0])
+
+    async def scenario() -> None:
+        registry = PlanRegistry(loader)
+        first = await registry.refresh()
+        prices[0] = 24.99
+        second = await registry.refresh()
+        assert second.version == first.version + 1
+        assert second.etag != first.etag
+        assert json.loads(second.pricing_body)["pricing"]["monthly_3"]["price"] == 24.99
+
+    asyncio.run(scenario())
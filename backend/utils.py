@@ -1,9 +1,12 @@
 """
 支付系统工具函数
 """
+import os
+import base64
 import hashlib
+import json
 import uuid
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 from datetime import datetime
 from urllib.parse import urlencode
 
@@ -65,9 +68,52 @@ def generate_order_number() -> str:
     return f"{date_part}-{time_part}-{uuid_part}"
 
 
+def encode_order_cursor(created_at: str, order_id: str) -> str:
+    """
+    生成订单列表的分页游标
+    
+    Args:
+        created_at: 当前页最后一条订单的创建时间（数据库原样返回的字符串）
+        order_id: 当前页最后一条订单的ID
+        
+    Returns:
+        str: URL 安全的游标字符串
+    """
+    raw = json.dumps([created_at, order_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_order_cursor(cursor: str) -> Tuple[str, str]:
+    """
+    解析订单列表的分页游标
+    
+    Args:
+        cursor: encode_order_cursor 生成的游标
+        
+    Returns:
+        Tuple[str, str]: (created_at, order_id)
+        
+    Raises:
+        ValueError: 游标格式无效
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, order_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        # 校验格式，防止拼接进过滤条件的值被篡改
+        datetime.fromisoformat(created_at.replace("Z", "+00:00"))
+        uuid.UUID(order_id)
+    except Exception:
+        raise ValueError("无效的分页游标")
+    return created_at, order_id
+
+
 def get_client_ip(request) -> str:
     """
-    获取客户端真实IP地址
+    获取客户端真实IP地址（按 IP 限流使用，不能信任客户端自己填写的请求头）
+    
+    - 部署在 Vercel（设置了 VERCEL 环境变量）时使用边缘网络覆盖写入的 x-vercel-forwarded-for / X-Real-IP
+    - 其他部署按 TRUSTED_PROXY_COUNT（前面的可信反向代理层数，默认 1）取 X-Forwarded-For
+      从右数第 N 个地址：更靠左的地址由客户端提供，可以伪造；为 0 时只使用直接连接的IP
     
     Args:
         request: FastAPI Request 对象
@@ -75,19 +121,40 @@ def get_client_ip(request) -> str:
     Returns:
         str: 客户端IP地址
     """
-    # 优先获取代理服务器转发的真实IP
-    forwarded_for = request.headers.get("X-Forwarded-For")
-    if forwarded_for:
-        return forwarded_for.split(",")[0].strip()
-    
-    real_ip = request.headers.get("X-Real-IP")
-    if real_ip:
-        return real_ip
+    if os.getenv("VERCEL"):
+        for header in ("x-vercel-forwarded-for", "X-Real-IP"):
+            value = request.headers.get(header)
+            if value:
+                return value.split(",")[0].strip()
+    
+    trusted_proxies = int(os.getenv("TRUSTED_PROXY_COUNT", "1"))
+    if trusted_proxies > 0:
+        hops = [hop.strip() for hop in request.headers.get("X-Forwarded-For", "").split(",") if hop.strip()]
+        if len(hops) >= trusted_proxies:
+            return hops[-trusted_proxies]
+        
+        real_ip = request.headers.get("X-Real-IP")
+        if real_ip:
+            return real_ip.strip()
     
     # 回退到直接连接的IP
     return request.client.host if request.client else "127.0.0.1"
 
 
+def detect_device(request) -> str:
+    """
+    根据 User-Agent 判断客户端设备类型
+    
+    Args:
+        request: FastAPI Request 对象
+        
+    Returns:
+        str: mobile 或 pc
+    """
+    user_agent = request.headers.get("user-agent", "").lower()
+    return "mobile" if any(keyword in user_agent for keyword in ["mobile", "android", "iphone"]) else "pc"
+
+
 def validate_amount(amount: float) -> bool:
     """
     验证金额格式（最多两位小数，大于0）
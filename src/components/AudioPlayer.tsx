@@ -2,10 +2,11 @@ import React, { useState, useRef, useEffect } from "react";
 import { Play, Pause, Volume2 } from "lucide-react";
 import { cn } from "@/lib/utils";
 import { Button } from "@/components/ui/button";
+import { getSignedAudioUrl } from "@/lib/subscription";
 
 interface AudioPlayerProps {
   title: string;
-  audioSrc: string;
+  audioSrc: string; // 音频文件名或 /audio/<文件名>，播放时换成签名链接
   className?: string;
   sleepDuration?: number; // 新增：睡眠时长（分钟）
 }
@@ -48,13 +49,37 @@ const AudioPlayer = ({ title, audioSrc, className, sleepDuration }: AudioPlayerP
     }, durationMs);
   };
 
-  const togglePlay = () => {
+  // 音频不在前端静态目录中，第一次播放时获取签名链接
+  const loadSignedSrc = async (audio: HTMLAudioElement): Promise<boolean> => {
+    if (audio.getAttribute("src")) {
+      return true;
+    }
+    const audioName = audioSrc.split("/").pop() || audioSrc;
+    try {
+      const signedUrl = await getSignedAudioUrl(audioName);
+      if (!signedUrl) {
+        console.error("No access to audio:", audioName);
+        return false;
+      }
+      audio.src = signedUrl;
+      return true;
+    } catch (error) {
+      console.error("Failed to get signed audio URL:", error);
+      return false;
+    }
+  };
+
+  const togglePlay = async () => {
     if (audioRef.current) {
       if (isPlaying) {
         stopPlaying();
       } else {
-        audioRef.current.volume = volume;
-        audioRef.current.play().catch(error => {
+        const audio = audioRef.current;
+        if (!(await loadSignedSrc(audio))) {
+          return;
+        }
+        audio.volume = volume;
+        audio.play().catch(error => {
           console.error("Playback failed:", error);
         });
         setIsPlaying(true);
@@ -75,6 +100,12 @@ const AudioPlayer = ({ title, audioSrc, className, sleepDuration }: AudioPlayerP
     }
   };
 
+  // 切换音频时丢弃旧的签名链接
+  useEffect(() => {
+    stopPlaying();
+    audioRef.current?.removeAttribute("src");
+  }, [audioSrc]);
+
   // 组件卸载时清理定时器
   useEffect(() => {
     return () => {
@@ -84,7 +115,7 @@ const AudioPlayer = ({ title, audioSrc, className, sleepDuration }: AudioPlayerP
 
   return (
     <div className={cn("flex flex-col items-center p-3 rounded-lg backdrop-blur-sm border border-white/20", className)}>
-      <audio ref={audioRef} src={audioSrc} loop />
+      <audio ref={audioRef} loop />
       <div className="flex items-center justify-between w-full mb-2">
         <span className="text-sm font-medium text-white">{title}</span>
         <Button 
@@ -17,7 +17,8 @@ import { Slider } from '@/components/ui/slider'
 import { 
   getUserAudioAccess, 
   checkAudioAccess,
-  checkUserMembershipValid
+  checkUserMembershipValid,
+  getSignedAudioUrls
 } from '@/lib/subscription'
 import { useAuth } from '@/hooks/useAuth'
 import { toast } from '@/hooks/use-toast'
@@ -47,6 +48,8 @@ export default function AudioPlayerWithAccess({ currentCyclePhase }: AudioPlayer
   const [isMuted, setIsMuted] = useState(false)
   const [isLoading, setIsLoading] = useState(true)
   const [isVipUser, setIsVipUser] = useState(false)
+  // 音频文件名 → 签名链接（音频不在前端静态目录中）
+  const [signedUrls, setSignedUrls] = useState<Record<string, string>>({})
 
   // 加载音频列表和用户权限
   useEffect(() => {
@@ -174,6 +177,12 @@ export default function AudioPlayerWithAccess({ currentCyclePhase }: AudioPlayer
       
       // 使用模拟数据而不是从数据库获取
       setAudioList(mockAudioData)
+
+      try {
+        setSignedUrls(await getSignedAudioUrls())
+      } catch (error) {
+        console.error('获取音频链接失败:', error)
+      }
       
       // 如果有当前周期阶段，优先选择对应的免费音频
       if (currentCyclePhase) {
@@ -496,10 +505,10 @@ export default function AudioPlayerWithAccess({ currentCyclePhase }: AudioPlayer
       </div>
 
       {/* 隐藏的音频元素 */}
-      {selectedAudio && (
+      {selectedAudio && signedUrls[selectedAudio.audio_name] && (
         <audio
           ref={audioRef}
-          src={`/audio/${selectedAudio.audio_name}`}
+          src={signedUrls[selectedAudio.audio_name]}
           preload="metadata"
         />
       )}
@@ -6,6 +6,7 @@ import { cn } from "@/lib/utils";
 import { useAuth } from '@/hooks/useAuth';
 import { checkUserMembershipValid } from '@/lib/subscription';
 import { toast } from '@/hooks/use-toast';
+import AudioPlayer from './AudioPlayer';
 
 interface SoundInfo {
   name: string;
@@ -243,8 +244,9 @@ const CycleInfo = () => {
               
               {hasAccess ? (
                 // 可访问的音频显示播放器
+                // 音频不在前端静态目录中，AudioPlayer 播放时获取签名链接
                 sound.audioSrc && (
-                  <audio controls src={sound.audioSrc} className="w-full mt-2 opacity-80" />
+                  <AudioPlayer title={sound.name} audioSrc={sound.audioSrc} className="w-full mt-2 opacity-80" />
                 )
                              ) : (
                  // 锁定的音频显示升级提示
@@ -18,7 +18,10 @@ import { toast } from '@/hooks/use-toast'
 import { API_CONFIG, buildApiUrl, createApiConfig } from '@/config/api'
 
 // 订单状态类型
-type OrderStatus = 'pending' | 'paid' | 'failed' | 'cancelled'
+type OrderStatus = 'pending' | 'paid' | 'failed' | 'cancelled' | 'expired'
+
+// 终态：订单不会再变化，停止轮询
+const TERMINAL_STATUSES: OrderStatus[] = ['paid', 'failed', 'cancelled', 'expired']
 
 // 订单信息接口
 interface OrderInfo {
@@ -55,7 +58,7 @@ interface QRCodePaymentProps {
   
   // 配置选项
   autoCreateOrder?: boolean // 是否自动创建订单
-  pollInterval?: number     // 轮询间隔（毫秒），默认5秒
+  pollInterval?: number     // 长轮询出错后的重试间隔（毫秒），默认5秒
   maxPollTime?: number      // 最大轮询时间（毫秒），默认10分钟
 }
 
@@ -82,7 +85,7 @@ export default function QRCodePayment({
   const [remainingTime, setRemainingTime] = useState(maxPollTime)
   
   // 轮询相关的 ref
-  const pollIntervalRef = useRef<NodeJS.Timeout | null>(null)
+  const pollAbortRef = useRef<AbortController | null>(null)
   const pollStartTimeRef = useRef<number | null>(null)
   const countdownIntervalRef = useRef<NodeJS.Timeout | null>(null)
 
@@ -90,9 +93,9 @@ export default function QRCodePayment({
 
   // 清理所有定时器
   const cleanupTimers = () => {
-    if (pollIntervalRef.current) {
-      clearInterval(pollIntervalRef.current)
-      pollIntervalRef.current = null
+    if (pollAbortRef.current) {
+      pollAbortRef.current.abort()
+      pollAbortRef.current = null
     }
     if (countdownIntervalRef.current) {
       clearInterval(countdownIntervalRef.current)
@@ -206,13 +209,30 @@ export default function QRCodePayment({
       }
     }, 1000)
 
-    // 轮询订单状态
-    pollIntervalRef.current = setInterval(async () => {
-      await checkOrderStatus(outTradeNo)
-    }, pollInterval)
+    // 长轮询订单状态：服务端在支付回调到达时立即返回，超时后再发起下一次
+    const controller = new AbortController()
+    pollAbortRef.current = controller
+    waitForOrderStatus(outTradeNo, controller.signal)
+  }
+
+  // 长轮询循环
+  const waitForOrderStatus = async (outTradeNo: string, signal: AbortSignal) => {
+    let knownStatus: OrderStatus = 'pending'
+
+    while (!signal.aborted) {
+      const orderData = await checkOrderStatus(outTradeNo, knownStatus, signal)
 
-    // 立即检查一次
-    checkOrderStatus(outTradeNo)
+      if (!orderData) {
+        // 请求失败，稍后重试
+        await new Promise(resolve => setTimeout(resolve, pollInterval))
+        continue
+      }
+
+      knownStatus = orderData.status
+      if (TERMINAL_STATUSES.includes(knownStatus)) {
+        return
+      }
+    }
   }
 
   // 停止轮询
@@ -222,21 +242,30 @@ export default function QRCodePayment({
     pollStartTimeRef.current = null
   }
 
-  // 检查订单状态
-  const checkOrderStatus = async (outTradeNo: string) => {
+  // 检查订单状态（传入 waitSince 时使用长轮询接口，等待状态离开 waitSince）
+  const checkOrderStatus = async (
+    outTradeNo: string,
+    waitSince?: OrderStatus,
+    signal?: AbortSignal
+  ) => {
     try {
       const token = await getAccessToken()
       
-      const response = await fetch(buildApiUrl(`${API_CONFIG.ENDPOINTS.GET_ORDER_STATUS}/${outTradeNo}`), {
+      const url = waitSince
+        ? buildApiUrl(`${API_CONFIG.ENDPOINTS.WAIT_ORDER_STATUS}/${outTradeNo}?since=${waitSince}`)
+        : buildApiUrl(`${API_CONFIG.ENDPOINTS.GET_ORDER_STATUS}/${outTradeNo}`)
+
+      const response = await fetch(url, {
         method: 'GET',
         headers: {
           'Authorization': `Bearer ${token}`
-        }
+        },
+        signal
       })
 
       if (!response.ok) {
         console.error('查询订单状态失败:', response.status)
-        return
+        return null
       }
 
       const orderData = await response.json()
@@ -258,10 +287,20 @@ export default function QRCodePayment({
         stopPolling()
         setError('支付失败，请重新尝试')
         onPaymentError?.('支付失败')
+      } else if (orderData.status === 'expired' || orderData.status === 'cancelled') {
+        stopPolling()
+        setError('订单已失效，请重新创建订单')
+        onPaymentError?.('订单已失效')
       }
 
+      return orderData
+
     } catch (error) {
+      if (signal?.aborted) {
+        return null
+      }
       console.error('查询订单状态出错:', error)
+      return null
     }
   }
 
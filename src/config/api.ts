@@ -40,12 +40,14 @@ export const API_CONFIG = {
     CREATE_SUBSCRIPTION_ORDER: '/api/create_subscription_qr_order',
     GET_ORDERS: '/api/orders',
     GET_ORDER_STATUS: '/api/get_order_status',
+    WAIT_ORDER_STATUS: '/api/wait_order_status',
     
     // 支付相关
     PAYMENT_NOTIFY: '/notify_url',
     
     // 音频相关
     CHECK_AUDIO_ACCESS: '/api/audio',
+    AUDIO_SIGNED_URLS: '/api/audio/signed-urls',
     
     // 订阅相关
     SUBSCRIPTION_PRICING: '/api/subscription/pricing',
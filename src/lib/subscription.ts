@@ -579,6 +579,48 @@ export async function checkAudioAccess(audioName: string): Promise<boolean> {
   }
 }
 
+// 签名音频链接缓存（后端一次签发当前用户可访问的全部音频，链接到期前复用；登录状态变化后重新签发）
+let signedAudioUrls: { userId: string | null; expiresAt: number; urls: Record<string, string> } | null = null
+
+// 链接剩余有效期不足该秒数时重新签发
+const SIGNED_AUDIO_URL_REFRESH_SECONDS = 60
+
+// 获取音频签名链接（音频文件名 → 链接），只包含当前用户可访问的音频；未登录时只包含免费音频
+export async function getSignedAudioUrls(): Promise<Record<string, string>> {
+  const { data: { session } } = await supabase.auth.getSession()
+  const userId = session?.user?.id ?? null
+
+  const now = Math.floor(Date.now() / 1000)
+  if (signedAudioUrls && signedAudioUrls.userId === userId
+      && signedAudioUrls.expiresAt - now > SIGNED_AUDIO_URL_REFRESH_SECONDS) {
+    return signedAudioUrls.urls
+  }
+
+  const headers: Record<string, string> = {}
+  if (session?.access_token) {
+    headers['Authorization'] = `Bearer ${session.access_token}`
+  }
+  const response = await fetch(buildApiUrl(API_CONFIG.ENDPOINTS.AUDIO_SIGNED_URLS), { headers })
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}))
+    throw new Error(errorData.detail || `后端API错误: ${response.status}`)
+  }
+
+  const result: { expires_at: number; urls: Record<string, string> } = await response.json()
+  // 后端未配置 AUDIO_URL_BASE 时返回相对路径
+  const urls = Object.fromEntries(
+    Object.entries(result.urls).map(([audioName, url]) => [audioName, url.startsWith('/') ? buildApiUrl(url) : url])
+  )
+  signedAudioUrls = { userId, expiresAt: result.expires_at, urls }
+  return urls
+}
+
+// 获取单个音频的签名链接，无权访问或音频不存在时返回 null
+export async function getSignedAudioUrl(audioName: string): Promise<string | null> {
+  const urls = await getSignedAudioUrls()
+  return urls[audioName] ?? null
+}
+
 // 检查订单支付状态
 export async function checkOrderPaymentStatus(outTradeNo: string): Promise<{
   status: 'pending' | 'paid' | 'failed' | 'cancelled'